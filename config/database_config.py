@@ -10,7 +10,16 @@ MONGODB_CONFIG = {
         'climate_raw': 'climate_data_raw',
         'economic_raw': 'economic_data_raw',
         'renewable_raw': 'renewable_data_raw'
-    }
+    },
+    'raw_layout': os.getenv('MONGODB_RAW_LAYOUT', 'document'),
+    'raw_key_fields': ['indicator.id', 'countryiso3code', 'date'],
+    'bucket_key_fields': ['indicator.id', 'countryiso3code'],
+    'read_batch_size': int(os.getenv('MONGODB_READ_BATCH_SIZE', '5000')),
+    'write_batch_size': int(os.getenv('MONGODB_WRITE_BATCH_SIZE', '250')),
+    'write_workers': int(os.getenv('MONGODB_WRITE_WORKERS', '4')),
+    'max_pool_size': int(os.getenv('MONGODB_MAX_POOL_SIZE', '50')),
+    'min_pool_size': int(os.getenv('MONGODB_MIN_POOL_SIZE', '0')),
+    'max_idle_time_ms': int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', '300000'))
 }
 
 POSTGRES_CONFIG = {
@@ -20,14 +29,68 @@ POSTGRES_CONFIG = {
         'climate_indicators': 'climate_indicators',
         'economic_indicators': 'economic_indicators',
         'renewable_energy': 'renewable_energy',
-        'combined_analysis': 'combined_analysis'
-    }
+        'combined_analysis': 'combined_analysis',
+        'indicators': 'indicators',
+        'indicator_values': 'indicator_values',
+        'combined_attributes': 'combined_attributes'
+    },
+    'combined_layout': os.getenv('POSTGRES_COMBINED_LAYOUT', 'wide'),
+    'view_indicators': [name for name in os.getenv('POSTGRES_VIEW_INDICATORS', '').split(',') if name] or None,
+    'view_max_indicators': int(os.getenv('POSTGRES_VIEW_MAX_INDICATORS', '1000')),
+    'pool_size': int(os.getenv('POSTGRES_POOL_SIZE', '5')),
+    'max_overflow': int(os.getenv('POSTGRES_MAX_OVERFLOW', '10')),
+    'pool_timeout': int(os.getenv('POSTGRES_POOL_TIMEOUT', '30')),
+    'pool_recycle': int(os.getenv('POSTGRES_POOL_RECYCLE', '1800')),
+    'pool_pre_ping': os.getenv('POSTGRES_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+    'load_method': os.getenv('POSTGRES_LOAD_METHOD', 'copy'),
+    'load_mode': os.getenv('POSTGRES_LOAD_MODE', 'swap'),
+    'swap_lock_timeout': os.getenv('POSTGRES_SWAP_LOCK_TIMEOUT', '5s'),
+    'copy_chunk_rows': int(os.getenv('POSTGRES_COPY_CHUNK_ROWS', '50000')),
+    'load_workers': int(os.getenv('POSTGRES_LOAD_WORKERS', '4')),
+    'manage_schema': os.getenv('POSTGRES_MANAGE_SCHEMA', 'true').lower() in ('1', 'true', 'yes'),
+    'migrations_table': os.getenv('POSTGRES_MIGRATIONS_TABLE', 'schema_migrations'),
+    'partition_by_year': os.getenv('POSTGRES_PARTITION_BY_YEAR', 'false').lower() in ('1', 'true', 'yes'),
+    'partition_span_years': int(os.getenv('POSTGRES_PARTITION_SPAN_YEARS', '10'))
 }
 
 API_CONFIG = {
     'world_bank_base': os.getenv('WORLD_BANK_API_BASE', 'https://api.worldbank.org/v2/'),
     'timeout': 30,
-    'retry_attempts': 3
+    'retry_attempts': 3,
+    'start_year': int(os.getenv('WORLD_BANK_START_YEAR', '2000')),
+    'end_year': int(os.getenv('WORLD_BANK_END_YEAR', '2023')),
+    'incremental': os.getenv('FETCH_INCREMENTAL', 'false').lower() in ('1', 'true', 'yes'),
+    'lookback_years': int(os.getenv('FETCH_LOOKBACK_YEARS', '2')),
+    'page_size': int(os.getenv('WORLD_BANK_PAGE_SIZE', '1000')),
+    'requests_per_second': float(os.getenv('WORLD_BANK_RATE_LIMIT', '2')),
+    'burst_size': int(os.getenv('WORLD_BANK_BURST_SIZE', '4')),
+    'max_concurrency': int(os.getenv('FETCH_MAX_CONCURRENCY', '8')),
+    'concurrent_fetch': os.getenv('FETCH_CONCURRENT', 'false').lower() in ('1', 'true', 'yes'),
+    'cache_enabled': os.getenv('WORLD_BANK_CACHE', 'true').lower() in ('1', 'true', 'yes'),
+    'cache_dir': os.getenv('WORLD_BANK_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                        'data', 'cache', 'world_bank')),
+    'cache_ttl': int(os.getenv('WORLD_BANK_CACHE_TTL', str(24 * 3600))),
+    'historical_cache_ttl': int(os.getenv('WORLD_BANK_HISTORICAL_CACHE_TTL', str(30 * 24 * 3600))),
+    'offline': os.getenv('WORLD_BANK_OFFLINE', 'false').lower() in ('1', 'true', 'yes')
 }
 
-
+ETL_CONFIG = {
+    'columnar_extract': os.getenv('ETL_COLUMNAR_EXTRACT', 'false').lower() in ('1', 'true', 'yes'),
+    'extract_workers': int(os.getenv('ETL_EXTRACT_WORKERS', '4')),
+    'extract_partition_threshold': int(os.getenv('ETL_EXTRACT_PARTITION_THRESHOLD', '100000')),
+    'fill_method': os.getenv('ETL_FILL_METHOD', 'ffill_bfill'),
+    'fill_max_gap': int(os.getenv('ETL_FILL_MAX_GAP')) if os.getenv('ETL_FILL_MAX_GAP') else None,
+    'parallel_transform': os.getenv('ETL_PARALLEL_TRANSFORM', 'false').lower() in ('1', 'true', 'yes'),
+    'transform_workers': int(os.getenv('ETL_TRANSFORM_WORKERS', str(os.cpu_count() or 1))),
+    'transform_partition_size': int(os.getenv('ETL_TRANSFORM_PARTITION_SIZE', '25')),
+    'profile_memory': os.getenv('ETL_PROFILE_MEMORY', 'false').lower() in ('1', 'true', 'yes'),
+    'run_report_dir': os.getenv('ETL_RUN_REPORT_DIR',
+                                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                             'data', 'run_reports')),
+    'run_report_table': os.getenv('ETL_RUN_REPORT_TABLE', ''),
+    'transform_backend': os.getenv('ETL_TRANSFORM_BACKEND', 'pandas'),
+    'duckdb_threads': int(os.getenv('ETL_DUCKDB_THREADS', '0')),
+    'duckdb_memory_limit': os.getenv('ETL_DUCKDB_MEMORY_LIMIT', ''),
+    'duckdb_temp_dir': os.getenv('ETL_DUCKDB_TEMP_DIR', '')
+}
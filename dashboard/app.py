@@ -10,20 +10,21 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.database.postgres_handler import PostgresHandler
+from src.database.indicator_store import read_combined_analysis
+from src.etl.schema import enforce_schema
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 app.title = "Climate Analytics Dashboard"
 
-postgres_handler = PostgresHandler()
-
 @app.callback(
     Output('data-store', 'data'),
     Input('interval-component', 'n_intervals')
 )
 def load_data(n):
+    postgres_handler = PostgresHandler()
     if postgres_handler.connect():
         try:
-            df = postgres_handler.read_table('combined_analysis')
+            df = enforce_schema(read_combined_analysis(postgres_handler))
             return df.to_json(date_format='iso', orient='split')
         finally:
             postgres_handler.disconnect()
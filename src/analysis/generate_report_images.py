@@ -9,6 +9,7 @@ import logging
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
 from src.database.postgres_handler import PostgresHandler
+from src.database.indicator_store import read_combined_analysis
 from src.analysis.ml_models import MachineLearningAnalyzer
 
 logging.basicConfig(level=logging.INFO)
@@ -33,7 +34,7 @@ def generate_visualizations():
         return
 
     try:
-        df = pg.read_table('combined_analysis')
+        df = read_combined_analysis(pg)
         logger.info(f"Loaded {len(df)} records")
         
         # 1. Trend Line: Energy Use
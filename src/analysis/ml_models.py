@@ -14,6 +14,8 @@ from typing import Dict, Tuple, List
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
 from src.database.postgres_handler import PostgresHandler
+from src.database.indicator_store import read_combined_analysis
+from src.etl.schema import enforce_schema
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,7 +32,7 @@ class MachineLearningAnalyzer:
             raise ConnectionError("Failed to connect to PostgreSQL")
             
         try:
-            df = self.postgres_handler.read_table('combined_analysis')
+            df = enforce_schema(read_combined_analysis(self.postgres_handler))
             logger.info(f"Loaded {len(df)} records for ML analysis")
             return df
         finally:
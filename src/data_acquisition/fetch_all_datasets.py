@@ -1,17 +1,83 @@
 import logging
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
-from src.data_acquisition.fetch_climate_data import main as fetch_climate
-from src.data_acquisition.fetch_economic_data import main as fetch_economic
-from src.data_acquisition.fetch_renewable_data import main as fetch_renewable
+from config.database_config import API_CONFIG, MONGODB_CONFIG
+from src.database.mongodb_handler import MongoDBHandler
+from src.data_acquisition.rate_limiter import TokenBucketRateLimiter
+from src.data_acquisition.response_cache import ResponseCache
+from src.data_acquisition.world_bank_fetcher import WorldBankFetcher, DEFAULT_COUNTRIES
+from src.data_acquisition.fetch_climate_data import ClimateDataFetcher, main as fetch_climate
+from src.data_acquisition.fetch_economic_data import EconomicDataFetcher, main as fetch_economic
+from src.data_acquisition.fetch_renewable_data import RenewableEnergyDataFetcher, main as fetch_renewable
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def main():
+def build_fetchers(rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                   cache: Optional[ResponseCache] = None) -> Dict[str, WorldBankFetcher]:
+    return {
+        'climate_raw': ClimateDataFetcher(rate_limiter, cache),
+        'economic_raw': EconomicDataFetcher(rate_limiter, cache),
+        'renewable_raw': RenewableEnergyDataFetcher(rate_limiter, cache)
+    }
+
+def stream_all_concurrently(countries: List[str], fetchers: Dict[str, WorldBankFetcher],
+                            max_concurrency: int = None, incremental: bool = False) -> Dict[str, int]:
+    if max_concurrency is None:
+        max_concurrency = API_CONFIG['max_concurrency']
+        
+    mongo_handler = MongoDBHandler()
+    if not mongo_handler.connect():
+        raise ConnectionError("Failed to connect to MongoDB")
+        
+    try:
+        saved = {data_type: 0 for data_type in fetchers}
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {}
+            for data_type, fetcher in fetchers.items():
+                collection_name = MONGODB_CONFIG['collections'][data_type]
+                fetcher.ensure_raw_index(mongo_handler, collection_name)
+                
+                for name, code in fetcher.INDICATORS.items():
+                    future = executor.submit(
+                        fetcher.refresh_indicator,
+                        mongo_handler, collection_name, name, code, countries, incremental
+                    )
+                    futures[future] = data_type
+                    
+            logger.info(f"Streaming {len(futures)} indicators with up to {max_concurrency} concurrent requests")
+            
+            for future in as_completed(futures):
+                saved[futures[future]] += future.result()
+                
+        return saved
+        
+    finally:
+        mongo_handler.disconnect()
+
+def run_concurrent_acquisition(countries: List[str] = None, incremental: bool = False) -> bool:
+    countries = countries or DEFAULT_COUNTRIES
+    fetchers = build_fetchers(TokenBucketRateLimiter.from_config())
+    
+    saved = stream_all_concurrently(countries, fetchers, incremental=incremental)
+    
+    for data_type, total_records in saved.items():
+        logger.info(f"{data_type}: {total_records} records saved to MongoDB")
+        
+    return incremental or all(saved.values())
+
+def main(concurrent: bool = None, incremental: bool = None):
+    if concurrent is None:
+        concurrent = API_CONFIG['concurrent_fetch'] or '--concurrent' in sys.argv[1:]
+    if incremental is None:
+        incremental = API_CONFIG['incremental'] or '--incremental' in sys.argv[1:]
+        
     logger.info("=" * 80)
     logger.info("STARTING DATA ACQUISITION - 2 DATASETS")
     logger.info("Dataset 1: Climate & Energy (Climate + Renewable combined)")
@@ -19,17 +85,22 @@ def main():
     logger.info("=" * 80)
     
     try:
-        logger.info("\n[Dataset 1 - Part 1/2] Fetching Climate Data...")
-        fetch_climate()
-        
-        logger.info("\n[Dataset 1 - Part 2/2] Fetching Renewable Energy Data...")
-        fetch_renewable()
-        logger.info("✓ Dataset 1 (Climate & Energy) complete: Combined ~5,760 records")
-        
-        logger.info("\n[Dataset 2] Fetching Economic Development Data...")
-        fetch_economic()
-        logger.info("✓ Dataset 2 (Economic Development) complete: ~5,760 records")
-        
+        if concurrent:
+            logger.info("\nFetching all datasets concurrently...")
+            if not run_concurrent_acquisition(incremental=incremental):
+                raise Exception("One or more datasets could not be saved")
+        else:
+            logger.info("\n[Dataset 1 - Part 1/2] Fetching Climate Data...")
+            fetch_climate(incremental)
+            
+            logger.info("\n[Dataset 1 - Part 2/2] Fetching Renewable Energy Data...")
+            fetch_renewable(incremental)
+            logger.info("✓ Dataset 1 (Climate & Energy) complete: Combined ~5,760 records")
+            
+            logger.info("\n[Dataset 2] Fetching Economic Development Data...")
+            fetch_economic(incremental)
+            logger.info("✓ Dataset 2 (Economic Development) complete: ~5,760 records")
+            
         logger.info("\n" + "=" * 80)
         logger.info("DATA ACQUISITION COMPLETED SUCCESSFULLY")
         logger.info("Total: 2 datasets with 11,520 raw records")
@@ -41,5 +112,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
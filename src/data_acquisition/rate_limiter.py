@@ -0,0 +1,58 @@
+import threading
+import time
+import logging
+from typing import Optional
+from config.database_config import API_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TokenBucketRateLimiter:
+    
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+        
+    @classmethod
+    def from_config(cls) -> 'TokenBucketRateLimiter':
+        return cls(API_CONFIG['requests_per_second'], API_CONFIG['burst_size'])
+        
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+        
+    def try_acquire(self) -> bool:
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+            
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_shared_limiter: Optional[TokenBucketRateLimiter] = None
+_shared_lock = threading.Lock()
+
+def get_shared_rate_limiter() -> TokenBucketRateLimiter:
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = TokenBucketRateLimiter.from_config()
+            logger.info(f"Rate limiter: {_shared_limiter.rate} req/s, burst {_shared_limiter.capacity}")
+        return _shared_limiter
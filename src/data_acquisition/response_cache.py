@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import logging
+from typing import Dict, Any, Optional
+from config.database_config import API_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    
+    def __init__(self, cache_dir: str, default_ttl: int = 86400, offline: bool = False):
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.offline = offline
+        os.makedirs(self.cache_dir, exist_ok=True)
+        
+    @classmethod
+    def from_config(cls) -> Optional['ResponseCache']:
+        if not API_CONFIG['cache_enabled'] and not API_CONFIG['offline']:
+            return None
+        return cls(API_CONFIG['cache_dir'], API_CONFIG['cache_ttl'], API_CONFIG['offline'])
+        
+    @staticmethod
+    def make_key(url: str, params: Dict[str, Any] = None) -> str:
+        payload = json.dumps({'url': url, 'params': params or {}}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+        
+    def get(self, url: str, params: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        path = self._path(self.make_key(url, params))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+            
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return entry.get('expires_at', 0) > time.time()
+        
+    def conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+        
+    def _write(self, key: str, entry: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+                
+    def store(self, url: str, params: Dict[str, Any], body: Any,
+              headers: Dict[str, str] = None, ttl: int = None):
+        headers = headers or {}
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        entry = {
+            'url': url,
+            'params': dict(params or {}),
+            'body': body,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': now,
+            'ttl': ttl,
+            'expires_at': now + ttl
+        }
+        self._write(self.make_key(url, params), entry)
+        
+    def revalidated(self, entry: Dict[str, Any], ttl: int = None):
+        now = time.time()
+        ttl = entry.get('ttl', self.default_ttl) if ttl is None else ttl
+        entry['ttl'] = ttl
+        entry['expires_at'] = now + ttl
+        self._write(self.make_key(entry['url'], entry['params']), entry)
@@ -0,0 +1,304 @@
+import requests
+import time
+from datetime import datetime
+import logging
+from typing import List, Dict, Any, Optional, Iterator
+from config.database_config import API_CONFIG, MONGODB_CONFIG
+from src.database.mongodb_handler import MongoDBHandler
+from src.database.bucket_layout import build_buckets, merge_bucket, series_key, latest_observed_year
+from src.data_acquisition.rate_limiter import TokenBucketRateLimiter, get_shared_rate_limiter
+from src.data_acquisition.response_cache import ResponseCache
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNTRIES = ['USA', 'CHN', 'IND', 'DEU', 'GBR', 'FRA', 'JPN', 'CAN', 'AUS', 'BRA',
+                     'RUS', 'MEX', 'IDN', 'NLD', 'SAU', 'TUR', 'POL', 'BEL', 'SWE', 'NOR',
+                     'DNK', 'FIN', 'ITA', 'ESP', 'KOR', 'ZAF', 'ARG', 'CHL', 'NZL', 'SGP']
+
+class WorldBankFetcher:
+    
+    INDICATORS: Dict[str, str] = {}
+    DATASET_LABEL = 'World Bank'
+    
+    def __init__(self, rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                 cache: Optional[ResponseCache] = None):
+        self.base_url = API_CONFIG['world_bank_base']
+        self.timeout = API_CONFIG['timeout']
+        self.retry_attempts = API_CONFIG['retry_attempts']
+        self.page_size = API_CONFIG['page_size']
+        self.layout = MONGODB_CONFIG['raw_layout']
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.cache = cache if cache is not None else ResponseCache.from_config()
+        
+    def cache_ttl(self, end_year: int) -> int:
+        # Values more than a couple of years old are rarely revised by the World Bank
+        if end_year < datetime.now().year - 2:
+            return API_CONFIG['historical_cache_ttl']
+        return API_CONFIG['cache_ttl']
+        
+    def _request_json(self, url: str, params: Dict[str, Any], indicator_code: str,
+                      ttl: int = None) -> Optional[Any]:
+        entry = self.cache.get(url, params) if self.cache else None
+        
+        if entry is not None and (self.cache.offline or self.cache.is_fresh(entry)):
+            logger.info(f"Using cached {indicator_code} page {params.get('page', 1)}")
+            return entry['body']
+            
+        if self.cache and self.cache.offline:
+            logger.warning(f"No cached response for {indicator_code} page {params.get('page', 1)} in offline mode")
+            return None
+            
+        headers = self.cache.conditional_headers(entry) if self.cache else {}
+        
+        for attempt in range(self.retry_attempts):
+            try:
+                self.rate_limiter.acquire()
+                logger.info(f"Fetching {indicator_code} page {params.get('page', 1)} (attempt {attempt + 1})")
+                response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
+                
+                if response.status_code == 304 and entry is not None:
+                    logger.info(f"{indicator_code} page {params.get('page', 1)} not modified")
+                    self.cache.revalidated(entry, ttl)
+                    return entry['body']
+                    
+                response.raise_for_status()
+                body = response.json()
+                
+                if self.cache:
+                    self.cache.store(url, params, body, response.headers, ttl)
+                return body
+                
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.error(f"Request failed for {indicator_code}: {e}")
+                if attempt < self.retry_attempts - 1:
+                    time.sleep(2 ** attempt)
+                    
+        return None
+        
+    def iter_indicator_pages(self, indicator_code: str, countries: List[str],
+                             start_year: int = None, end_year: int = None,
+                             per_page: int = None) -> Iterator[List[Dict[str, Any]]]:
+        start_year = start_year or API_CONFIG['start_year']
+        end_year = end_year or API_CONFIG['end_year']
+        country_str = ';'.join(countries)
+        url = f"{self.base_url}country/{country_str}/indicator/{indicator_code}"
+        params = {
+            'date': f'{start_year}:{end_year}',
+            'format': 'json',
+            'per_page': per_page or self.page_size,
+            'page': 1
+        }
+        
+        total_pages = 1
+        while params['page'] <= total_pages:
+            data = self._request_json(url, params, indicator_code, self.cache_ttl(end_year))
+            
+            if data is None:
+                if params['page'] == 1 and self.cache and self.cache.offline:
+                    return
+                # A partial indicator must not be stored as if it were complete (or move
+                # the incremental high-water mark past the pages that were never fetched)
+                raise ConnectionError(f"Giving up on {indicator_code} at page {params['page']} of {total_pages}")
+                
+            if not isinstance(data, list) or len(data) < 2 or not data[1]:
+                if params['page'] == 1:
+                    logger.warning(f"No data returned for {indicator_code}")
+                return
+                
+            metadata = data[0]
+            total_pages = int(metadata.get('pages', 1))
+            records = data[1]
+            logger.info(f"Retrieved {len(records)} records for {indicator_code} "
+                        f"(page {params['page']}/{total_pages}, total {metadata.get('total', '?')})")
+            yield records
+            
+            params['page'] += 1
+            
+    def fetch_indicator_data(self, indicator_code: str, countries: List[str], 
+                            start_year: int = None, end_year: int = None) -> List[Dict[str, Any]]:
+        all_data = []
+        
+        for records in self.iter_indicator_pages(indicator_code, countries, start_year, end_year):
+            all_data.extend(records)
+            
+        return all_data
+        
+    def fetch_indicators(self, countries: List[str]) -> Dict[str, List]:
+        indicator_data = {}
+        
+        for name, code in self.INDICATORS.items():
+            logger.info(f"Fetching {name}...")
+            indicator_data[name] = self.fetch_indicator_data(code, countries)
+            
+        return indicator_data
+        
+    def raw_key_fields(self) -> List[str]:
+        if self.layout == 'bucket':
+            return MONGODB_CONFIG['bucket_key_fields']
+        return MONGODB_CONFIG['raw_key_fields']
+        
+    def ensure_raw_index(self, mongo_handler: MongoDBHandler, collection_name: str) -> bool:
+        keys = [(field, 1) for field in self.raw_key_fields()]
+        if not mongo_handler.create_index(collection_name, keys, unique=True):
+            logger.warning(f"Unique series index missing on {collection_name}; "
+                           f"drop the collection once if it holds duplicates from older loads")
+            return False
+        return True
+        
+    def upsert_records(self, mongo_handler: MongoDBHandler, collection_name: str,
+                       records: List[Dict[str, Any]]) -> int:
+        if self.layout == 'bucket':
+            return self.upsert_buckets(mongo_handler, collection_name, records)
+        return mongo_handler.bulk_upsert(collection_name, records, self.raw_key_fields())
+        
+    def upsert_buckets(self, mongo_handler: MongoDBHandler, collection_name: str,
+                       records: List[Dict[str, Any]]) -> int:
+        buckets = build_buckets(records)
+        if not buckets:
+            return 0
+            
+        # A series can span several pages, so merge with what is already stored
+        existing = {
+            series_key(doc): doc
+            for doc in mongo_handler.find_all(collection_name, {
+                'indicator.id': {'$in': list({key[0] for key in buckets})},
+                'countryiso3code': {'$in': list({key[1] for key in buckets})}
+            })
+        }
+        documents = [merge_bucket(bucket, existing.get(key)) for key, bucket in buckets.items()]
+        
+        written = mongo_handler.bulk_upsert(collection_name, documents, self.raw_key_fields())
+        return len(records) if written == len(documents) else 0
+        
+    def save_to_mongodb(self, data: Dict[str, List], collection_name: str) -> bool:
+        mongo_handler = MongoDBHandler()
+        
+        if not mongo_handler.connect():
+            return False
+            
+        try:
+            self.ensure_raw_index(mongo_handler, collection_name)
+            
+            all_records = []
+            for indicator_name, records in data.items():
+                for record in records:
+                    record['indicator_name'] = indicator_name
+                    all_records.append(record)
+                    
+            if all_records:
+                saved = self.upsert_records(mongo_handler, collection_name, all_records)
+                logger.info(f"Saved {saved} {self.DATASET_LABEL} records to MongoDB")
+                return True
+            else:
+                logger.warning(f"No {self.DATASET_LABEL} records to save")
+                return False
+                
+        finally:
+            mongo_handler.disconnect()
+            
+    def stream_indicator_to_mongodb(self, mongo_handler: MongoDBHandler, collection_name: str,
+                                    indicator_name: str, indicator_code: str,
+                                    countries: List[str], start_year: int = None,
+                                    end_year: int = None) -> int:
+        saved = 0
+        
+        for records in self.iter_indicator_pages(indicator_code, countries, start_year, end_year):
+            for record in records:
+                record['indicator_name'] = indicator_name
+            saved += self.upsert_records(mongo_handler, collection_name, records)
+            
+        return saved
+        
+    def get_high_water_marks(self, mongo_handler: MongoDBHandler, collection_name: str,
+                             indicator_name: str) -> Dict[str, int]:
+        if self.layout == 'bucket':
+            marks = {
+                bucket['countryiso3code']: latest_observed_year(bucket)
+                for bucket in mongo_handler.find_all(collection_name, {'indicator_name': indicator_name})
+            }
+            return {country: year for country, year in marks.items() if country and year is not None}
+            
+        pipeline = [
+            {'$match': {'indicator_name': indicator_name, 'value': {'$ne': None}}},
+            {'$group': {'_id': '$countryiso3code', 'latest': {'$max': '$date'}}}
+        ]
+        return {
+            doc['_id']: int(doc['latest'])
+            for doc in mongo_handler.aggregate(collection_name, pipeline)
+            if doc['_id'] and doc.get('latest')
+        }
+        
+    def plan_incremental_requests(self, high_water_marks: Dict[str, int], countries: List[str],
+                                  lookback_years: int = None) -> Dict[int, List[str]]:
+        if lookback_years is None:
+            lookback_years = API_CONFIG['lookback_years']
+            
+        plan = {}
+        for country in countries:
+            start_year = API_CONFIG['start_year']
+            if country in high_water_marks:
+                # Re-request a few already-stored years so revisions are picked up
+                start_year = max(start_year, high_water_marks[country] - lookback_years + 1)
+            plan.setdefault(start_year, []).append(country)
+            
+        return dict(sorted(plan.items()))
+        
+    def refresh_indicator(self, mongo_handler: MongoDBHandler, collection_name: str,
+                          indicator_name: str, indicator_code: str, countries: List[str],
+                          incremental: bool = False) -> int:
+        if not incremental:
+            return self.stream_indicator_to_mongodb(
+                mongo_handler, collection_name, indicator_name, indicator_code, countries
+            )
+            
+        high_water_marks = self.get_high_water_marks(mongo_handler, collection_name, indicator_name)
+        plan = self.plan_incremental_requests(high_water_marks, countries)
+        end_year = API_CONFIG['end_year']
+        
+        saved = 0
+        for start_year, group in plan.items():
+            if start_year > end_year:
+                continue
+                
+            logger.info(f"Refreshing {indicator_name} from {start_year} for {len(group)} countries")
+            saved += self.stream_indicator_to_mongodb(
+                mongo_handler, collection_name, indicator_name, indicator_code,
+                group, start_year, end_year
+            )
+            
+        return saved
+        
+    def stream_to_mongodb(self, countries: List[str], collection_name: str,
+                          incremental: bool = False) -> bool:
+        mongo_handler = MongoDBHandler()
+        
+        if not mongo_handler.connect():
+            return False
+            
+        try:
+            self.ensure_raw_index(mongo_handler, collection_name)
+            
+            total_saved = 0
+            for name, code in self.INDICATORS.items():
+                logger.info(f"Fetching {name}...")
+                try:
+                    total_saved += self.refresh_indicator(
+                        mongo_handler, collection_name, name, code, countries, incremental
+                    )
+                except ConnectionError as e:
+                    logger.error(f"Failed to fetch {name}: {e}")
+                    return False
+                    
+            if total_saved:
+                logger.info(f"Saved {total_saved} {self.DATASET_LABEL} records to MongoDB")
+                return True
+            elif incremental:
+                logger.info(f"No new {self.DATASET_LABEL} records since the last refresh")
+                return True
+            else:
+                logger.warning(f"No {self.DATASET_LABEL} records to save")
+                return False
+                
+        finally:
+            mongo_handler.disconnect()
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from typing import List, Dict, Any, Tuple, Iterable
+
+DECODED_COLUMNS = ['year', 'country_code', 'country_name', 'indicator_name',
+                   'indicator_id', 'metric_value']
+
+def series_key(record: Dict[str, Any]) -> Tuple[str, str]:
+    indicator = record.get('indicator') or {}
+    return indicator.get('id'), record.get('countryiso3code')
+
+def build_buckets(records: Iterable[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    buckets = {}
+    
+    for record in records:
+        key = series_key(record)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = {
+                'indicator': record.get('indicator'),
+                'indicator_name': record.get('indicator_name'),
+                'countryiso3code': record.get('countryiso3code'),
+                'country': record.get('country'),
+                'unit': record.get('unit'),
+                'decimal': record.get('decimal'),
+                'observations': {}
+            }
+            buckets[key] = bucket
+        bucket['observations'][int(record['date'])] = record.get('value')
+        
+    return buckets
+
+def merge_bucket(new_bucket: Dict[str, Any], existing: Dict[str, Any] = None) -> Dict[str, Any]:
+    observations = {}
+    if existing:
+        observations.update(zip(existing.get('years', []), existing.get('values', [])))
+    observations.update(new_bucket['observations'])
+    
+    years = sorted(observations)
+    document = {k: v for k, v in new_bucket.items() if k != 'observations'}
+    document['years'] = years
+    document['values'] = [observations[year] for year in years]
+    return document
+
+def latest_observed_year(bucket: Dict[str, Any]) -> int:
+    observed = [year for year, value in zip(bucket.get('years', []), bucket.get('values', []))
+                if value is not None]
+    return max(observed) if observed else None
+
+def _repeat_categorical(values: List[Any], lengths: np.ndarray) -> pd.Categorical:
+    codes, categories = pd.factorize(np.array(values, dtype=object), sort=True)
+    return pd.Categorical.from_codes(np.repeat(codes, lengths), categories=categories)
+    
+def decode_buckets(documents: List[Dict[str, Any]], compact: bool = False) -> pd.DataFrame:
+    if not documents:
+        return pd.DataFrame(columns=DECODED_COLUMNS)
+        
+    lengths = np.fromiter((len(doc.get('years', [])) for doc in documents), dtype=np.int64,
+                          count=len(documents))
+    total = int(lengths.sum())
+    
+    if compact:
+        repeated = lambda values: _repeat_categorical(values, lengths)
+    else:
+        repeated = lambda values: np.repeat(np.array(values, dtype=object), lengths)
+        
+    years = np.fromiter((year for doc in documents for year in doc.get('years', [])),
+                        dtype=np.int16 if compact else np.int64, count=total)
+    values = np.fromiter(
+        (np.nan if value is None else value for doc in documents for value in doc.get('values', [])),
+        dtype=np.float64, count=total
+    )
+    
+    return pd.DataFrame({
+        'year': years,
+        'country_code': repeated([doc.get('countryiso3code') for doc in documents]),
+        'country_name': repeated([(doc.get('country') or {}).get('value') for doc in documents]),
+        'indicator_name': repeated([doc.get('indicator_name') for doc in documents]),
+        'indicator_id': repeated([(doc.get('indicator') or {}).get('id') for doc in documents]),
+        'metric_value': values
+    })
+    
+def concat_decoded(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    if len(chunks) == 1:
+        return chunks[0]
+        
+    columns = {}
+    for column in chunks[0].columns:
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals([chunk[column] for chunk in chunks], sort_categories=True)
+        else:
+            columns[column] = np.concatenate([chunk[column].to_numpy() for chunk in chunks])
+    return pd.DataFrame(columns)
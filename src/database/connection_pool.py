@@ -0,0 +1,109 @@
+from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.exc import SQLAlchemyError
+from contextlib import contextmanager
+import os
+import threading
+import logging
+from typing import Dict, Iterator
+from config.database_config import MONGODB_CONFIG, POSTGRES_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_pid = os.getpid()
+_mongo_clients: Dict[str, MongoClient] = {}
+_postgres_engines: Dict[str, Engine] = {}
+
+def _reset_after_fork():
+    global _lock, _pid
+    # Sockets inherited from the parent must not be reused or closed by the child
+    for engine in _postgres_engines.values():
+        engine.dispose(close=False)
+    _mongo_clients.clear()
+    _postgres_engines.clear()
+    _lock = threading.RLock()
+    _pid = os.getpid()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _ensure_current_process():
+    if os.getpid() != _pid:
+        _reset_after_fork()
+
+def get_mongo_client(uri: str = None) -> MongoClient:
+    uri = uri or MONGODB_CONFIG['uri']
+    _ensure_current_process()
+    
+    with _lock:
+        client = _mongo_clients.get(uri)
+        if client is None:
+            client = MongoClient(
+                uri,
+                maxPoolSize=MONGODB_CONFIG['max_pool_size'],
+                minPoolSize=MONGODB_CONFIG['min_pool_size'],
+                maxIdleTimeMS=MONGODB_CONFIG['max_idle_time_ms'],
+                serverSelectionTimeoutMS=5000
+            )
+            try:
+                client.admin.command('ping')
+            except ConnectionFailure:
+                client.close()
+                raise
+            _mongo_clients[uri] = client
+            logger.info(f"Opened pooled MongoDB client (maxPoolSize={MONGODB_CONFIG['max_pool_size']})")
+        return client
+
+def get_postgres_engine(uri: str = None) -> Engine:
+    uri = uri or POSTGRES_CONFIG['uri']
+    _ensure_current_process()
+    
+    with _lock:
+        engine = _postgres_engines.get(uri)
+        if engine is None:
+            engine = create_engine(
+                uri,
+                pool_size=POSTGRES_CONFIG['pool_size'],
+                max_overflow=POSTGRES_CONFIG['max_overflow'],
+                pool_timeout=POSTGRES_CONFIG['pool_timeout'],
+                pool_recycle=POSTGRES_CONFIG['pool_recycle'],
+                pool_pre_ping=POSTGRES_CONFIG['pool_pre_ping']
+            )
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except SQLAlchemyError:
+                engine.dispose()
+                raise
+            _postgres_engines[uri] = engine
+            logger.info(f"Opened pooled PostgreSQL engine (pool_size={POSTGRES_CONFIG['pool_size']})")
+        return engine
+
+@contextmanager
+def mongo_database(database: str = None, uri: str = None) -> Iterator:
+    client = get_mongo_client(uri)
+    yield client[database or MONGODB_CONFIG['database']]
+
+@contextmanager
+def postgres_connection(uri: str = None) -> Iterator[Connection]:
+    with get_postgres_engine(uri).connect() as conn:
+        yield conn
+
+@contextmanager
+def postgres_transaction(uri: str = None) -> Iterator[Connection]:
+    with get_postgres_engine(uri).begin() as conn:
+        yield conn
+
+def close_all():
+    with _lock:
+        for client in _mongo_clients.values():
+            client.close()
+        for engine in _postgres_engines.values():
+            engine.dispose()
+        _mongo_clients.clear()
+        _postgres_engines.clear()
+    logger.info("Closed all pooled database clients")
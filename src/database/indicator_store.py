@@ -0,0 +1,334 @@
+from sqlalchemy import text, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+from psycopg2 import Error as Psycopg2Error
+import numpy as np
+import pandas as pd
+import logging
+from typing import Dict, List, Optional, Tuple
+from src.database.postgres_handler import PostgresHandler, SHADOW_SUFFIX, PREVIOUS_SUFFIX
+from src.database.schema_manager import SchemaManager, LONG_COLUMN_TYPES, table_keys
+from src.etl.schema import enforce_schema, sql_types
+from config.database_config import POSTGRES_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class IndicatorStore:
+    
+    def __init__(self, postgres_handler: PostgresHandler = None, schema_manager: SchemaManager = None):
+        self.postgres_handler = postgres_handler or PostgresHandler()
+        self.schema_manager = schema_manager or SchemaManager(self.postgres_handler)
+        tables = self.schema_manager.tables
+        self.view_name = tables['combined_analysis']
+        self.indicators_table = tables['indicators']
+        self.values_table = tables['indicator_values']
+        self.attributes_table = tables['combined_attributes']
+        
+    @staticmethod
+    def indicator_columns(df: pd.DataFrame) -> List[str]:
+        # Every numeric column but the year is an observation; the rest are attributes
+        return [col for col in df.select_dtypes(include=[np.number]).columns if col != 'year']
+        
+    def register_indicators(self, conn: Connection, names: List[str]) -> Dict[str, int]:
+        # Only new names are inserted: ON CONFLICT alone would draw an identity value
+        # for every name on every load (it stays as a guard against a concurrent load)
+        indicators = self._quote(conn, self.indicators_table)
+        conn.execute(text(
+            f"INSERT INTO {indicators} (indicator_name) "
+            f"SELECT DISTINCT name FROM unnest(CAST(:names AS text[])) AS name "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {indicators} i WHERE i.indicator_name = name) "
+            f"ORDER BY name ON CONFLICT (indicator_name) DO NOTHING"
+        ), {'names': list(names)})
+        return self._indicator_ids(conn, names)
+        
+    def _indicator_ids(self, conn: Connection, names: List[str] = None) -> Dict[str, int]:
+        query = f"SELECT indicator_name, indicator_id FROM {self._quote(conn, self.indicators_table)}"
+        if names is not None:
+            query += " WHERE indicator_name = ANY(:names)"
+        rows = conn.execute(text(query + " ORDER BY indicator_name"), {'names': list(names or [])})
+        return {name: indicator_id for name, indicator_id in rows}
+        
+    @staticmethod
+    def _quote(conn: Connection, name: str) -> str:
+        return conn.dialect.identifier_preparer.quote(name)
+        
+    def to_long(self, df: pd.DataFrame, indicator_ids: Dict[str, int]) -> pd.DataFrame:
+        # One row per observed value; missing values are simply absent
+        columns = self.indicator_columns(df)
+        values = df[columns].to_numpy(dtype=np.float64)
+        rows, cols = np.nonzero(~np.isnan(values))
+        ids = np.array([indicator_ids[col] for col in columns], dtype=np.int32)
+        return pd.DataFrame({
+            'country_code': df['country_code'].take(rows).to_numpy(),
+            'year': df['year'].to_numpy(dtype=np.int16)[rows],
+            'indicator_id': ids[cols],
+            'metric_value': values[rows, cols]
+        })
+        
+    def attributes(self, df: pd.DataFrame) -> pd.DataFrame:
+        columns = set(self.indicator_columns(df))
+        return df[[col for col in df.columns if col not in columns]]
+        
+    def write(self, conn: Connection, df: pd.DataFrame, countries: List[str] = None,
+              refresh: bool = True) -> bool:
+        # Merges a wide combined frame into the long tables on the caller's
+        # transaction: changed values are updated, new ones inserted, and values
+        # gone from the frame deleted (within countries, when given)
+        scope = {'country_code': list(countries)} if countries is not None else None
+        try:
+            long_df = self.to_long(df, self.register_indicators(conn, self.indicator_columns(df)))
+            attributes = self.attributes(df)
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error registering indicators: {e}")
+            return False
+            
+        if not (self.postgres_handler.upsert_dataframe(
+                    attributes, self.attributes_table, table_keys('combined_attributes'),
+                    dtype=sql_types(attributes), scope=scope, conn=conn,
+                    create_table=self.schema_manager.table_creator('combined_attributes', attributes.columns))
+                and self.postgres_handler.upsert_dataframe(
+                    long_df, self.values_table, table_keys('indicator_values'),
+                    dtype={**sql_types(long_df), **LONG_COLUMN_TYPES}, scope=scope, conn=conn,
+                    create_table=self.schema_manager.table_creator('indicator_values'))):
+            return False
+            
+        logger.info(f"Stored {len(long_df)} observations of {len(self.indicator_columns(df))} indicators "
+                    f"for {len(attributes)} country-years")
+        return self.refresh(conn) if refresh else True
+        
+    def stage(self, df: pd.DataFrame) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        # The concurrent half of a load: indicators are registered in their own short
+        # transaction (an unused registration is harmless) and both frames staged
+        # for merge_staged; returns the staged (attributes, observations)
+        try:
+            with self.postgres_handler.transaction() as conn:
+                indicator_ids = self.register_indicators(conn, self.indicator_columns(df))
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error registering indicators: {e}")
+            return None
+            
+        long_df = self.to_long(df, indicator_ids)
+        attributes = self.attributes(df)
+        if not (self.postgres_handler.stage_dataframe(attributes, self.attributes_table, sql_types(attributes))
+                and self.postgres_handler.stage_dataframe(long_df, self.values_table,
+                                                          {**sql_types(long_df), **LONG_COLUMN_TYPES})):
+            return None
+        return attributes, long_df
+        
+    def merge_staged(self, conn: Connection, staged: Tuple[pd.DataFrame, pd.DataFrame],
+                     countries: List[str] = None) -> bool:
+        attributes, long_df = staged
+        scope = {'country_code': list(countries)} if countries is not None else None
+        if not (self.postgres_handler.merge_staged(
+                    conn, attributes, self.attributes_table, table_keys('combined_attributes'),
+                    dtype=sql_types(attributes), scope=scope,
+                    create_table=self.schema_manager.table_creator('combined_attributes', attributes.columns))
+                and self.postgres_handler.merge_staged(
+                    conn, long_df, self.values_table, table_keys('indicator_values'),
+                    dtype={**sql_types(long_df), **LONG_COLUMN_TYPES}, scope=scope,
+                    create_table=self.schema_manager.table_creator('indicator_values'))):
+            return False
+        return self.refresh(conn)
+        
+    def staged_tables(self) -> List[str]:
+        return [self.attributes_table, self.values_table]
+        
+    def prune(self, conn: Connection, countries: List[str]) -> bool:
+        # After a full partitioned load: drops countries none of the partitions carried
+        try:
+            for table_name in (self.values_table, self.attributes_table):
+                conn.execute(text(f"DELETE FROM {self._quote(conn, table_name)} "
+                                  f"WHERE country_code <> ALL(:countries)"), {'countries': list(countries)})
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error pruning {self.values_table}: {e}")
+            return False
+            
+    def snapshot(self, conn: Connection, keep: bool = True) -> bool:
+        # The long tables are merged in place, so a swap load copies them to
+        # <table>__previous first for rollback to swap back (replace drops the copies);
+        # indicators only ever grow, so the copies' ids stay valid
+        quote = lambda name: self._quote(conn, name)
+        try:
+            existing = set(inspect(conn).get_table_names())
+            for table_type in self.previous_table_types():
+                table_name = self.schema_manager.tables[table_type]
+                previous = table_name + PREVIOUS_SUFFIX
+                conn.execute(text(f"DROP TABLE IF EXISTS {quote(previous)}"))
+                if not keep or table_name not in existing:
+                    continue
+                    
+                columns = inspect(conn).get_columns(table_name)
+                self.schema_manager.create_table(conn, table_type, previous, [column['name'] for column in columns])
+                self.postgres_handler.add_missing_columns(
+                    conn, previous, pd.DataFrame(columns=[column['name'] for column in columns]),
+                    dtype={column['name']: column['type'] for column in columns})
+                names = ', '.join(quote(column['name']) for column in columns)
+                conn.execute(text(f"INSERT INTO {quote(previous)} ({names}) SELECT {names} FROM {quote(table_name)}"))
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error keeping the previous version of {self.values_table}: {e}")
+            return False
+            
+    @staticmethod
+    def previous_table_types() -> List[str]:
+        return ['combined_attributes', 'indicator_values']
+        
+    def rebuild_view(self, conn: Connection) -> bool:
+        # The view is bound to the tables it was created over rather than their
+        # names, so it is recreated once a rollback has renamed others into place
+        try:
+            conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {self._quote(conn, self.view_name)}"))
+            self.ensure_view(conn)
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error rebuilding {self.view_name}: {e}")
+            return False
+            
+    def pivot_query(self, conn: Connection, indicators: List[Tuple[str, int]]) -> str:
+        # Conditional aggregation over the attributes (which fix the row set) and
+        # their observations
+        quote = lambda name: self._quote(conn, name)
+        attributes = [column['name'] for column in inspect(conn).get_columns(self.attributes_table)]
+        keys = ['year', 'country_code', 'country_name']
+        pivots = [f"max(v.metric_value) FILTER (WHERE v.indicator_id = {int(indicator_id)}) AS {quote(name)}"
+                  for name, indicator_id in indicators]
+        columns = [f"a.{quote(col)}" for col in keys if col in attributes]
+        others = [f"a.{quote(col)}" for col in attributes if col not in keys]
+        select = columns + pivots + others
+        return (f"SELECT {', '.join(select)} FROM {quote(self.attributes_table)} a "
+                f"LEFT JOIN {quote(self.values_table)} v ON v.country_code = a.country_code AND v.year = a.year "
+                f"GROUP BY {', '.join(columns + others)} ORDER BY a.country_code, a.year")
+                
+    def view_indicators(self, conn: Connection) -> Optional[List[Tuple[str, int]]]:
+        # The configured indicators, or every registered one, as long as they fit
+        # within view_max_indicators; beyond that there is no view (a row is capped
+        # at 1600 columns) and wide reads go through read_indicators
+        names = POSTGRES_CONFIG['view_indicators']
+        indicator_ids = self._indicator_ids(conn, names)
+        if len(indicator_ids) > POSTGRES_CONFIG['view_max_indicators']:
+            return None
+        return list(indicator_ids.items())
+        
+    def _view_columns(self, conn: Connection) -> List[str]:
+        return list(conn.execute(text(
+            "SELECT attname FROM pg_attribute WHERE attrelid = to_regclass(:view) "
+            "AND attnum > 0 AND NOT attisdropped ORDER BY attnum"
+        ), {'view': self._quote(conn, self.view_name)}).scalars())
+        
+    def ensure_view(self, conn: Connection) -> bool:
+        # The view's columns are fixed when it is created, so a new indicator (or
+        # attribute) rebuilds it; otherwise it is left for a concurrent refresh.
+        # Returns whether the view needs no refresh
+        quote = lambda name: self._quote(conn, name)
+        indicators = self.view_indicators(conn)
+        if indicators is None:
+            if self._view_columns(conn):
+                conn.execute(text(f"DROP MATERIALIZED VIEW {quote(self.view_name)}"))
+            logger.warning(f"More than {POSTGRES_CONFIG['view_max_indicators']} indicators, not keeping "
+                           f"{self.view_name}; wide reads are pivoted from {self.values_table}")
+            return True
+            
+        query = self.pivot_query(conn, indicators)
+        expected = list(conn.execute(text(query + " LIMIT 0")).keys())
+        if self._view_columns(conn) == expected:
+            return False
+            
+        conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {quote(self.view_name)}"))
+        conn.execute(text(f"CREATE MATERIALIZED VIEW {quote(self.view_name)} AS {query}"))
+        # REFRESH ... CONCURRENTLY needs a unique index covering every row
+        conn.execute(text(f"CREATE UNIQUE INDEX {quote(self.view_name + '_key')} "
+                          f"ON {quote(self.view_name)} (country_code, year)"))
+        logger.info(f"Created materialized view {self.view_name} with {len(expected)} columns")
+        return True
+        
+    def refresh(self, conn: Connection) -> bool:
+        try:
+            if not self.ensure_view(conn):
+                # Readers keep querying the old contents while the refresh runs
+                conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {self._quote(conn, self.view_name)}"))
+                logger.info(f"Refreshed materialized view {self.view_name}")
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error refreshing {self.view_name}: {e}")
+            return False
+            
+    def convert_wide_table(self, conn: Connection):
+        # Migration from the wide combined_analysis table: its values and attributes
+        # move to the long tables and the table is replaced by the view
+        quote = lambda name: self._quote(conn, name)
+        inspector = inspect(conn)
+        if self.view_name in inspector.get_table_names():
+            columns = inspector.get_columns(self.view_name)
+            numeric = [column['name'] for column in columns if column['name'] != 'year'
+                       and column['type'].python_type in (int, float)]
+            indicator_ids = self.register_indicators(conn, numeric)
+            for name in numeric:
+                conn.execute(text(
+                    f"INSERT INTO {quote(self.values_table)} (country_code, year, indicator_id, metric_value) "
+                    f"SELECT country_code, year, {int(indicator_ids[name])}, {quote(name)} "
+                    f"FROM {quote(self.view_name)} WHERE {quote(name)} IS NOT NULL ON CONFLICT DO NOTHING"
+                ))
+                
+            targets = {column['name'] for column in inspector.get_columns(self.attributes_table)}
+            shared = [quote(column['name']) for column in columns
+                      if column['name'] in targets and column['name'] not in numeric]
+            conn.execute(text(
+                f"INSERT INTO {quote(self.attributes_table)} ({', '.join(shared)}) "
+                f"SELECT {', '.join(shared)} FROM {quote(self.view_name)} ON CONFLICT DO NOTHING"
+            ))
+            for suffix in (SHADOW_SUFFIX, PREVIOUS_SUFFIX, ''):
+                conn.execute(text(f"DROP TABLE IF EXISTS {quote(self.view_name + suffix)}"))
+            logger.info(f"Moved {self.view_name} ({len(numeric)} indicators) to the long tables")
+            
+        self.ensure_view(conn)
+        
+    def read_indicators(self, indicators: List[str] = None, countries: List[str] = None,
+                        years: Tuple[int, int] = None) -> Optional[pd.DataFrame]:
+        # On-demand pivot of just the requested indicators (every one by default),
+        # straight from the long tables, so readers neither wait for a refresh nor
+        # fetch every column. The pivot happens here rather than in SQL, whose rows
+        # are capped at 1664 columns
+        try:
+            with self.postgres_handler.engine.connect() as conn:
+                quote = lambda name: self._quote(conn, name)
+                indicator_ids = self._indicator_ids(conn, indicators)
+                missing = [name for name in indicators or [] if name not in indicator_ids]
+                if missing:
+                    logger.warning(f"Unknown indicators: {missing}")
+                start_year, end_year = years or (-32768, 32767)
+                params = {'ids': list(indicator_ids.values()),
+                          'countries': list(countries) if countries else None,
+                          'start_year': start_year, 'end_year': end_year}
+                where = ("(CAST(:countries AS text[]) IS NULL OR country_code = ANY(:countries)) "
+                         "AND year BETWEEN :start_year AND :end_year")
+                attributes = pd.read_sql(text(
+                    f"SELECT * FROM {quote(self.attributes_table)} WHERE {where} ORDER BY country_code, year"
+                ), conn, params=params)
+                values = pd.read_sql(text(
+                    f"SELECT country_code, year, indicator_id, metric_value FROM {quote(self.values_table)} "
+                    f"WHERE indicator_id = ANY(:ids) AND {where}"
+                ), conn, params=params)
+                
+            names = {indicator_id: name for name, indicator_id in indicator_ids.items()}
+            selected = [name for name in (indicators or list(indicator_ids)) if name in indicator_ids]
+            wide = (values.pivot(index=['country_code', 'year'], columns='indicator_id', values='metric_value')
+                    .rename(columns=names).reindex(columns=selected))
+            keys = [col for col in ('year', 'country_code', 'country_name') if col in attributes.columns]
+            df = attributes.join(wide, on=['country_code', 'year'])
+            df = df[keys + selected + [col for col in attributes.columns if col not in keys]]
+            logger.info(f"Pivoted {len(selected)} indicators for {len(df)} country-years")
+            return enforce_schema(df)
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error reading indicators {indicators}: {e}")
+            return None
+
+def read_combined_analysis(postgres_handler: PostgresHandler, countries: List[str] = None) -> Optional[pd.DataFrame]:
+    # Wide reads of combined_analysis (of just countries, when given): the table, or
+    # the long layout's view, when there is one; otherwise the long tables are
+    # pivoted on demand
+    store = IndicatorStore(postgres_handler)
+    if not postgres_handler.table_exists(store.view_name):
+        return store.read_indicators(countries=countries) if store.schema_manager.long_layout else None
+    return postgres_handler.read_countries(store.view_name, countries)
@@ -1,8 +1,10 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, PyMongoError
+from pymongo import ReplaceOne
+from pymongo.errors import ConnectionFailure, PyMongoError, BulkWriteError
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union, Tuple, Iterator
 from config.database_config import MONGODB_CONFIG
+from src.database.connection_pool import get_mongo_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,20 +19,27 @@ class MongoDBHandler:
         
     def connect(self):
         try:
-            self.client = MongoClient(self.uri, serverSelectionTimeoutMS=5000)
-            self.client.admin.command('ping')
+            self.client = get_mongo_client(self.uri)
             self.db = self.client[self.db_name]
-            logger.info(f"Successfully connected to MongoDB database: {self.db_name}")
+            logger.debug(f"Using pooled MongoDB client for database: {self.db_name}")
             return True
         except ConnectionFailure as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
             return False
             
     def disconnect(self):
-        if self.client:
-            self.client.close()
-            logger.info("Disconnected from MongoDB")
-            
+        # The pooled client is shared by the whole process and stays open
+        self.client = None
+        self.db = None
+        
+    def __enter__(self):
+        if not self.connect():
+            raise ConnectionError("Failed to connect to MongoDB")
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disconnect()
+        
     def insert_many(self, collection_name: str, documents: List[Dict[str, Any]]) -> Optional[List]:
         try:
             collection = self.db[collection_name]
@@ -41,6 +50,52 @@ class MongoDBHandler:
             logger.error(f"Error inserting documents into {collection_name}: {e}")
             return None
             
+    @staticmethod
+    def _get_field(document: Dict[str, Any], field: str) -> Any:
+        value = document
+        for part in field.split('.'):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+        
+    def _upsert_batch(self, collection_name: str, documents: List[Dict[str, Any]],
+                      key_fields: List[str]) -> int:
+        requests = [
+            ReplaceOne({field: self._get_field(doc, field) for field in key_fields}, doc, upsert=True)
+            for doc in documents
+        ]
+        try:
+            result = self.db[collection_name].bulk_write(requests, ordered=False)
+            return result.upserted_count + result.matched_count
+        except BulkWriteError as e:
+            details = e.details
+            logger.error(f"Bulk upsert into {collection_name} had {len(details.get('writeErrors', []))} errors")
+            return details.get('nUpserted', 0) + details.get('nMatched', 0)
+            
+    def bulk_upsert(self, collection_name: str, documents: List[Dict[str, Any]],
+                    key_fields: List[str], batch_size: int = None, max_workers: int = None) -> int:
+        if not documents:
+            return 0
+            
+        batch_size = batch_size or MONGODB_CONFIG['write_batch_size']
+        max_workers = max_workers or MONGODB_CONFIG['write_workers']
+        batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+        
+        try:
+            if len(batches) == 1 or max_workers == 1:
+                written = sum(self._upsert_batch(collection_name, batch, key_fields) for batch in batches)
+            else:
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+                    written = sum(executor.map(
+                        lambda batch: self._upsert_batch(collection_name, batch, key_fields), batches
+                    ))
+            logger.info(f"Upserted {written} documents into {collection_name}")
+            return written
+        except PyMongoError as e:
+            logger.error(f"Error upserting documents into {collection_name}: {e}")
+            return 0
+            
     def insert_one(self, collection_name: str, document: Dict[str, Any]) -> Optional[str]:
         try:
             collection = self.db[collection_name]
@@ -51,18 +106,55 @@ class MongoDBHandler:
             logger.error(f"Error inserting document into {collection_name}: {e}")
             return None
             
-    def find_all(self, collection_name: str, filter_query: Dict = None) -> List[Dict[str, Any]]:
+    def find_all(self, collection_name: str, filter_query: Dict = None,
+                 projection: Dict = None) -> List[Dict[str, Any]]:
         try:
             collection = self.db[collection_name]
             if filter_query is None:
                 filter_query = {}
-            documents = list(collection.find(filter_query))
+            documents = list(collection.find(filter_query, projection))
             logger.info(f"Retrieved {len(documents)} documents from {collection_name}")
             return documents
         except PyMongoError as e:
             logger.error(f"Error retrieving documents from {collection_name}: {e}")
             return []
             
+    def iter_batches(self, collection_name: str, filter_query: Dict = None,
+                     projection: Dict = None, batch_size: int = None) -> Iterator[List[Dict[str, Any]]]:
+        batch_size = batch_size or MONGODB_CONFIG['read_batch_size']
+        collection = self.db[collection_name]
+        cursor = collection.find(filter_query or {}, projection).batch_size(batch_size)
+        
+        try:
+            batch = []
+            for document in cursor:
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            cursor.close()
+            
+    def iter_aggregate(self, collection_name: str, pipeline: List[Dict],
+                       batch_size: int = None) -> Iterator[List[Dict[str, Any]]]:
+        batch_size = batch_size or MONGODB_CONFIG['read_batch_size']
+        collection = self.db[collection_name]
+        cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+        
+        try:
+            batch = []
+            for document in cursor:
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            cursor.close()
+            
     def count_documents(self, collection_name: str, filter_query: Dict = None) -> int:
         try:
             collection = self.db[collection_name]
@@ -75,6 +167,31 @@ class MongoDBHandler:
             logger.error(f"Error counting documents in {collection_name}: {e}")
             return 0
             
+    def aggregate(self, collection_name: str, pipeline: List[Dict]) -> List[Dict[str, Any]]:
+        try:
+            collection = self.db[collection_name]
+            return list(collection.aggregate(pipeline))
+        except PyMongoError as e:
+            logger.error(f"Error running aggregation on {collection_name}: {e}")
+            return []
+            
+    def delete_many(self, collection_name: str, filter_query: Dict) -> int:
+        try:
+            collection = self.db[collection_name]
+            result = collection.delete_many(filter_query)
+            logger.info(f"Deleted {result.deleted_count} documents from {collection_name}")
+            return result.deleted_count
+        except PyMongoError as e:
+            logger.error(f"Error deleting documents from {collection_name}: {e}")
+            return 0
+            
+    def distinct(self, collection_name: str, field: str, filter_query: Dict = None) -> List[Any]:
+        try:
+            return self.db[collection_name].distinct(field, filter_query or {})
+        except PyMongoError as e:
+            logger.error(f"Error reading distinct {field} from {collection_name}: {e}")
+            return []
+            
     def delete_collection(self, collection_name: str) -> bool:
         try:
             self.db[collection_name].drop()
@@ -84,10 +201,11 @@ class MongoDBHandler:
             logger.error(f"Error dropping collection {collection_name}: {e}")
             return False
             
-    def create_index(self, collection_name: str, field: str) -> bool:
+    def create_index(self, collection_name: str, field: Union[str, List[Tuple[str, int]]],
+                     unique: bool = False) -> bool:
         try:
             collection = self.db[collection_name]
-            collection.create_index(field)
+            collection.create_index(field, unique=unique)
             logger.info(f"Created index on {field} in {collection_name}")
             return True
         except PyMongoError as e:
@@ -1,13 +1,23 @@
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import text, inspect
+from sqlalchemy.engine import Connection
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.types import Boolean, Double, Text
+from psycopg2 import Error as Psycopg2Error
+from contextlib import contextmanager
+import io
 import pandas as pd
 import logging
-from typing import Optional, List
+from typing import Callable, Iterator, Optional, List, Dict
 from config.database_config import POSTGRES_CONFIG
+from src.database.connection_pool import get_postgres_engine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SHADOW_SUFFIX = '__shadow'
+PREVIOUS_SUFFIX = '__previous'
+STAGE_SUFFIX = '__stage'
+
 class PostgresHandler:
     
     def __init__(self):
@@ -16,20 +26,25 @@ class PostgresHandler:
         
     def connect(self):
         try:
-            self.engine = create_engine(self.uri)
-            with self.engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-            logger.info("Successfully connected to PostgreSQL database")
+            self.engine = get_postgres_engine(self.uri)
+            logger.debug("Using pooled PostgreSQL engine")
             return True
         except SQLAlchemyError as e:
             logger.error(f"Failed to connect to PostgreSQL: {e}")
             return False
             
     def disconnect(self):
-        if self.engine:
-            self.engine.dispose()
-            logger.info("Disconnected from PostgreSQL")
-            
+        # The pooled engine is shared by the whole process and stays open
+        self.engine = None
+        
+    def __enter__(self):
+        if not self.connect():
+            raise ConnectionError("Failed to connect to PostgreSQL")
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disconnect()
+        
     def execute_query(self, query: str, params: dict = None) -> bool:
         try:
             with self.engine.connect() as conn:
@@ -41,39 +56,395 @@ class PostgresHandler:
             logger.error(f"Error executing query: {e}")
             return False
             
+    @contextmanager
+    def transaction(self, conn: Connection = None) -> Iterator[Connection]:
+        # Writes join the caller's transaction when given a connection, leaving the
+        # commit or rollback to the caller (see DataLoader's all-or-nothing loads)
+        if conn is not None:
+            yield conn
+            return
+        with self.engine.begin() as conn:
+            yield conn
+            
+    def copy_dataframe(self, conn: Connection, df: pd.DataFrame, table_name: str,
+                       chunk_rows: int = None) -> int:
+        # Streams the frame through COPY FROM STDIN one CSV chunk at a time, on the
+        # caller's connection so it joins the caller's transaction
+        chunk_rows = chunk_rows or POSTGRES_CONFIG['copy_chunk_rows']
+        preparer = conn.dialect.identifier_preparer
+        columns = ', '.join(preparer.quote(str(col)) for col in df.columns)
+        statement = (f"COPY {preparer.quote(table_name)} ({columns}) "
+                     f"FROM STDIN WITH (FORMAT csv, NULL '\\N')")
+        
+        cursor = conn.connection.cursor()
+        try:
+            for start in range(0, len(df), chunk_rows):
+                buffer = io.StringIO()
+                df.iloc[start:start + chunk_rows].to_csv(buffer, index=False, header=False, na_rep='\\N')
+                buffer.seek(0)
+                cursor.copy_expert(statement, buffer)
+        finally:
+            cursor.close()
+        return len(df)
+        
     def create_table_from_dataframe(self, df: pd.DataFrame, table_name: str, 
-                                   if_exists: str = 'replace') -> bool:
+                                   if_exists: str = 'replace', dtype: dict = None,
+                                   method: str = None, conn: Connection = None) -> bool:
+        method = method or POSTGRES_CONFIG['load_method']
         try:
-            df.to_sql(table_name, self.engine, if_exists=if_exists, index=False)
+            if method == 'copy' and self.engine.dialect.name == 'postgresql':
+                with self.transaction(conn) as conn:
+                    # to_sql on the empty frame only issues the DDL with the declared types
+                    df.head(0).to_sql(table_name, conn, if_exists=if_exists, index=False, dtype=dtype)
+                    self.copy_dataframe(conn, df, table_name)
+            else:
+                df.to_sql(table_name, conn or self.engine, if_exists=if_exists, index=False, dtype=dtype)
             logger.info(f"Created/updated table {table_name} with {len(df)} records")
             return True
-        except SQLAlchemyError as e:
+        except (SQLAlchemyError, Psycopg2Error) as e:
             logger.error(f"Error creating table {table_name}: {e}")
             return False
             
-    def read_table(self, table_name: str, query: str = None) -> Optional[pd.DataFrame]:
+    def has_unique_key(self, conn: Connection, table_name: str, key_columns: List[str]) -> bool:
+        # True when a unique index (e.g. the managed schema's primary key) already covers the key
+        return conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_index i JOIN pg_class t ON t.oid = i.indrelid "
+            "WHERE t.relnamespace = current_schema()::regnamespace AND t.relname = :table "
+            "AND i.indisunique AND i.indnkeyatts = :count AND ARRAY(SELECT a.attname::text FROM pg_attribute a "
+            "WHERE a.attrelid = t.oid AND a.attnum = ANY(i.indkey) ORDER BY a.attname) = :columns)"
+        ), {'table': table_name, 'count': len(key_columns), 'columns': sorted(key_columns)}).scalar()
+        
+    def ensure_unique_key(self, conn: Connection, table_name: str, key_columns: List[str]):
+        if self.has_unique_key(conn, table_name, key_columns):
+            return
+        preparer = conn.dialect.identifier_preparer
+        index_name = f"{table_name}_{'_'.join(key_columns)}_key"
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {preparer.quote(index_name)} ON {preparer.quote(table_name)} "
+            f"({', '.join(preparer.quote(col) for col in key_columns)})"
+        ))
+        
+    @staticmethod
+    def _inferred_type(series: pd.Series):
+        if pd.api.types.is_bool_dtype(series):
+            return Boolean()
+        if pd.api.types.is_numeric_dtype(series):
+            return Double()
+        return Text()
+        
+    def add_missing_columns(self, conn: Connection, table_name: str, df: pd.DataFrame,
+                            dtype: dict = None) -> List[str]:
+        # Columns the frame brings that the table lacks (e.g. a newly fetched indicator)
+        # are added with their declared type, or one inferred from the frame
+        dtype = dtype or {}
+        preparer = conn.dialect.identifier_preparer
+        existing = {column['name'] for column in inspect(conn).get_columns(table_name)}
+        for col in df.columns:
+            if col not in existing:
+                sql_type = dtype.get(col, self._inferred_type(df[col]))
+                conn.execute(text(f"ALTER TABLE {preparer.quote(table_name)} ADD COLUMN {preparer.quote(col)} "
+                                  f"{sql_type.compile(dialect=conn.dialect)}"))
+                existing.add(col)
+        return [col for col in df.columns if col in existing]
+        
+    def write_managed_table(self, df: pd.DataFrame, table_name: str,
+                            create_table: Callable[[Connection, str], None],
+                            dtype: dict = None, recreate: bool = True, conn: Connection = None) -> bool:
+        # Like create_table_from_dataframe, but the table comes from create_table's
+        # declared DDL (keys, indexes, partitions) instead of types inferred by to_sql
+        try:
+            with self.transaction(conn) as conn:
+                if recreate:
+                    conn.execute(text(f"DROP TABLE IF EXISTS {conn.dialect.identifier_preparer.quote(table_name)}"))
+                    create_table(conn, table_name)
+                columns = self.add_missing_columns(conn, table_name, df, dtype)
+                self.copy_dataframe(conn, df[columns], table_name)
+            logger.info(f"Created/updated table {table_name} with {len(df)} records")
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error creating table {table_name}: {e}")
+            return False
+            
+    def upsert_dataframe(self, df: pd.DataFrame, table_name: str, key_columns: List[str],
+                         dtype: dict = None, delete_missing: bool = True,
+                         scope: Dict[str, List] = None,
+                         create_table: Callable[[Connection, str], None] = None,
+                         conn: Connection = None) -> bool:
+        # Stages the rows with COPY and merges them with ON CONFLICT ... DO UPDATE, so
+        # the live table (and its indexes and grants) is never dropped. With
+        # delete_missing, live rows absent from the stage are removed, limited to
+        # the scope values (e.g. {'country_code': [...]}) when one is given.
+        if not self.table_exists(table_name, conn):
+            if create_table is not None:
+                return self.write_managed_table(df, table_name, create_table, dtype=dtype, conn=conn)
+            if not self.create_table_from_dataframe(df, table_name, if_exists='fail', dtype=dtype, conn=conn):
+                return False
+            with self.transaction(conn) as conn:
+                self.ensure_unique_key(conn, table_name, key_columns)
+            return True
+            
+        try:
+            with self.transaction(conn) as conn:
+                preparer = conn.dialect.identifier_preparer
+                stage = table_name + STAGE_SUFFIX
+                
+                columns = self.add_missing_columns(conn, table_name, df, dtype)
+                self.ensure_unique_key(conn, table_name, key_columns)
+                conn.execute(text(f"CREATE TEMP TABLE {preparer.quote(stage)} "
+                                  f"(LIKE {preparer.quote(table_name)} INCLUDING DEFAULTS) ON COMMIT DROP"))
+                self.copy_dataframe(conn, df[columns], stage)
+                counts = self._merge_stage(conn, table_name, stage, columns, key_columns, delete_missing, scope)
+                # Dropped now rather than at commit, so one transaction can upsert a table repeatedly
+                conn.execute(text(f"DROP TABLE {preparer.quote(stage)}"))
+                
+            self._log_merge(table_name, len(df), *counts)
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error upserting into {table_name}: {e}")
+            return False
+            
+    def stage_dataframe(self, df: pd.DataFrame, table_name: str, dtype: dict = None) -> bool:
+        # Copies the rows into an unlogged <name>__stage table committed on its own
+        # connection, so several tables can be staged concurrently and then merged
+        # together by merge_staged in one transaction
+        stage = table_name + STAGE_SUFFIX
+        try:
+            with self.engine.begin() as conn:
+                quoted = conn.dialect.identifier_preparer.quote(stage)
+                conn.execute(text(f"DROP TABLE IF EXISTS {quoted}"))
+                df.head(0).to_sql(stage, conn, index=False, dtype=dtype)
+                conn.execute(text(f"ALTER TABLE {quoted} SET UNLOGGED"))
+                self.copy_dataframe(conn, df, stage)
+            logger.info(f"Staged {len(df)} records for {table_name}")
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error staging rows for {table_name}: {e}")
+            return False
+            
+    def merge_staged(self, conn: Connection, df: pd.DataFrame, table_name: str, key_columns: List[str],
+                     dtype: dict = None, delete_missing: bool = True, scope: Dict[str, List] = None,
+                     create_table: Callable[[Connection, str], None] = None) -> bool:
+        # The upsert merge of rows staged by stage_dataframe, on the caller's
+        # transaction; the frame only supplies the columns and their types
+        stage = table_name + STAGE_SUFFIX
+        try:
+            preparer = conn.dialect.identifier_preparer
+            if table_name not in inspect(conn).get_table_names():
+                if create_table is not None:
+                    create_table(conn, table_name)
+                else:
+                    df.head(0).to_sql(table_name, conn, index=False, dtype=dtype)
+                    
+            columns = self.add_missing_columns(conn, table_name, df, dtype)
+            self.ensure_unique_key(conn, table_name, key_columns)
+            counts = self._merge_stage(conn, table_name, stage, columns, key_columns, delete_missing, scope)
+            conn.execute(text(f"DROP TABLE {preparer.quote(stage)}"))
+            
+            self._log_merge(table_name, len(df), *counts)
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error upserting into {table_name}: {e}")
+            return False
+            
+    def _merge_stage(self, conn: Connection, table_name: str, stage_name: str, columns: List[str],
+                     key_columns: List[str], delete_missing: bool, scope: Dict[str, List]) -> tuple:
+        preparer = conn.dialect.identifier_preparer
+        target, stage = preparer.quote(table_name), preparer.quote(stage_name)
+        
+        # Every live column is rewritten; the ones the stage lacks become NULL
+        quoted = [preparer.quote(col) for col in columns]
+        keys = [preparer.quote(col) for col in key_columns]
+        values = [preparer.quote(column['name']) for column in inspect(conn).get_columns(table_name)
+                  if column['name'] not in key_columns]
+        
+        # Counted up front because partitioned tables can't return xmax
+        inserted = conn.execute(text(
+            f"SELECT count(*) FROM {stage} s WHERE NOT EXISTS (SELECT 1 FROM {target} WHERE "
+            + ' AND '.join(f"s.{key} = {target}.{key}" for key in keys) + ")"
+        )).scalar()
+        written = conn.execute(text(
+            f"INSERT INTO {target} ({', '.join(quoted)}) SELECT {', '.join(quoted)} FROM {stage} "
+            f"ON CONFLICT ({', '.join(keys)}) DO "
+            + (f"UPDATE SET {', '.join(f'{col} = EXCLUDED.{col}' for col in values)} "
+               f"WHERE ({', '.join(f'{target}.{col}' for col in values)}) IS DISTINCT FROM "
+               f"({', '.join(f'EXCLUDED.{col}' for col in values)}) " if values else "NOTHING ")
+        )).rowcount
+        
+        deleted = 0
+        if delete_missing:
+            conditions = [f"NOT EXISTS (SELECT 1 FROM {stage} s WHERE "
+                          + ' AND '.join(f"s.{key} = {target}.{key}" for key in keys) + ")"]
+            params = {}
+            for i, (col, scope_values) in enumerate((scope or {}).items()):
+                conditions.append(f"{target}.{preparer.quote(col)} = ANY(:scope_{i})")
+                params[f"scope_{i}"] = list(scope_values)
+            deleted = conn.execute(text(
+                f"DELETE FROM {target} WHERE {' AND '.join(conditions)}"
+            ), params).rowcount
+        return inserted, written, deleted
+        
+    @staticmethod
+    def _log_merge(table_name: str, rows: int, inserted: int, written: int, deleted: int):
+        logger.info(f"Upserted {table_name}: {inserted} inserted, {written - inserted} updated, "
+                    f"{rows - written} unchanged, {deleted} deleted")
+                    
+    def _index_names(self, conn: Connection, table_name: str) -> List[str]:
+        return list(conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table"
+        ), {'table': table_name}).scalars())
+        
+    def _partition_names(self, conn: Connection, table_name: str) -> List[str]:
+        return list(conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relnamespace = current_schema()::regnamespace AND p.relname = :table"
+        ), {'table': table_name}).scalars())
+        
+    def _rename_table(self, conn: Connection, old_name: str, new_name: str):
+        # Indexes and partitions are named after their table, so they move with it
+        preparer = conn.dialect.identifier_preparer
+        conn.execute(text(f"ALTER TABLE {preparer.quote(old_name)} RENAME TO {preparer.quote(new_name)}"))
+        for index_name in self._index_names(conn, new_name):
+            if index_name.startswith(old_name):
+                conn.execute(text(f"ALTER INDEX {preparer.quote(index_name)} RENAME TO "
+                                  f"{preparer.quote(new_name + index_name[len(old_name):])}"))
+        for partition_name in self._partition_names(conn, new_name):
+            if partition_name.startswith(old_name):
+                self._rename_table(conn, partition_name, new_name + partition_name[len(old_name):])
+                
+    def _copy_grants(self, conn: Connection, source: str, target: str):
+        preparer = conn.dialect.identifier_preparer
+        grants = conn.execute(text(
+            "SELECT grantee, privilege_type FROM information_schema.role_table_grants "
+            "WHERE table_schema = current_schema() AND table_name = :table AND grantee <> current_user"
+        ), {'table': source}).fetchall()
+        for grantee, privilege in grants:
+            grantee = 'PUBLIC' if grantee == 'PUBLIC' else preparer.quote(grantee)
+            conn.execute(text(f"GRANT {privilege} ON {preparer.quote(target)} TO {grantee}"))
+            
+    def finalize_shadow_table(self, table_name: str, key_columns: List[str] = None) -> bool:
+        shadow = table_name + SHADOW_SUFFIX
+        try:
+            with self.engine.begin() as conn:
+                if key_columns:
+                    self.ensure_unique_key(conn, shadow, key_columns)
+                if self.table_exists(table_name, conn):
+                    self._copy_grants(conn, table_name, shadow)
+                conn.execute(text(f"ANALYZE {conn.dialect.identifier_preparer.quote(shadow)}"))
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Error preparing shadow table {shadow}: {e}")
+            return False
+            
+    def prepare_shadow_table(self, df: pd.DataFrame, table_name: str, key_columns: List[str] = None,
+                             dtype: dict = None,
+                             create_table: Callable[[Connection, str], None] = None) -> bool:
+        # The bulk load, index build and ANALYZE all happen on the shadow, so
+        # readers of the live table never wait on them
+        shadow = table_name + SHADOW_SUFFIX
+        if create_table is not None:
+            if not self.write_managed_table(df, shadow, create_table, dtype=dtype):
+                return False
+        elif not self.create_table_from_dataframe(df, shadow, if_exists='replace', dtype=dtype):
+            return False
+        return self.finalize_shadow_table(table_name, key_columns)
+        
+    def swap_tables(self, table_names: List[str], conn: Connection = None,
+                    keep_previous: bool = True) -> bool:
+        # One short transaction renames every shadow into place; the replaced
+        # tables are kept as <name>__previous for rollback_tables, or dropped
+        try:
+            with self.transaction(conn) as conn:
+                preparer = conn.dialect.identifier_preparer
+                conn.execute(text(f"SET LOCAL lock_timeout = '{POSTGRES_CONFIG['swap_lock_timeout']}'"))
+                existing = set(inspect(conn).get_table_names())
+                
+                for table_name in table_names:
+                    previous = table_name + PREVIOUS_SUFFIX
+                    if table_name + SHADOW_SUFFIX not in existing:
+                        raise ValueError(f"No shadow table to swap in for {table_name}")
+                    if previous in existing:
+                        conn.execute(text(f"DROP TABLE {preparer.quote(previous)}"))
+                    if table_name in existing:
+                        self._rename_table(conn, table_name, previous)
+                        if not keep_previous:
+                            conn.execute(text(f"DROP TABLE {preparer.quote(previous)}"))
+                    self._rename_table(conn, table_name + SHADOW_SUFFIX, table_name)
+                    
+            logger.info(f"Swapped in new versions of {', '.join(table_names)}")
+            return True
+        except (SQLAlchemyError, Psycopg2Error, ValueError) as e:
+            logger.error(f"Error swapping tables {table_names}: {e}")
+            return False
+            
+    def rollback_tables(self, table_names: List[str], conn: Connection = None) -> bool:
+        try:
+            with self.transaction(conn) as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{POSTGRES_CONFIG['swap_lock_timeout']}'"))
+                existing = set(inspect(conn).get_table_names())
+                
+                for table_name in table_names:
+                    previous = table_name + PREVIOUS_SUFFIX
+                    if previous not in existing:
+                        raise ValueError(f"No previous version of {table_name} to roll back to")
+                    swap = table_name + '__rollback'
+                    self._rename_table(conn, table_name, swap)
+                    self._rename_table(conn, previous, table_name)
+                    self._rename_table(conn, swap, previous)
+                    
+            logger.info(f"Rolled back {', '.join(table_names)} to their previous versions")
+            return True
+        except (SQLAlchemyError, Psycopg2Error, ValueError) as e:
+            logger.error(f"Error rolling back tables {table_names}: {e}")
+            return False
+            
+    def read_table(self, table_name: str, query: str = None, params: dict = None) -> Optional[pd.DataFrame]:
         try:
             if query is None:
                 query = f"SELECT * FROM {table_name}"
-            df = pd.read_sql(query, self.engine)
+            df = pd.read_sql(text(query) if params else query, self.engine, params=params)
             logger.info(f"Retrieved {len(df)} records from {table_name}")
             return df
         except SQLAlchemyError as e:
             logger.error(f"Error reading table {table_name}: {e}")
             return None
             
-    def table_exists(self, table_name: str) -> bool:
-        inspector = inspect(self.engine)
-        return table_name in inspector.get_table_names()
+    def read_countries(self, table_name: str, countries: List[str] = None) -> Optional[pd.DataFrame]:
+        # Just the rows of countries (all of them when None)
+        if countries is None:
+            return self.read_table(table_name)
+        quoted = self.engine.dialect.identifier_preparer.quote(table_name)
+        return self.read_table(table_name, f"SELECT * FROM {quoted} WHERE country_code = ANY(:countries)",
+                               params={'countries': list(countries)})
+    
+    def table_exists(self, table_name: str, conn: Connection = None) -> bool:
+        # On the caller's connection, a table created earlier in its transaction counts
+        if conn is not None:
+            return inspect(conn).has_table(table_name)
+        return table_name in self.get_table_names()
         
     def get_table_names(self) -> List[str]:
         inspector = inspect(self.engine)
-        return inspector.get_table_names()
-        
+        table_names = inspector.get_table_names()
+        if self.engine.dialect.name != 'postgresql':
+            return table_names
+        # Year partitions are reached through their parent table; materialized
+        # views (e.g. the long layout's combined_analysis) are read like tables
+        with self.engine.connect() as conn:
+            partitions = set(conn.execute(text(
+                "SELECT relname FROM pg_class WHERE relnamespace = current_schema()::regnamespace "
+                "AND relispartition"
+            )).scalars())
+        return ([name for name in table_names if name not in partitions]
+                + inspector.get_materialized_view_names())
+                
     def drop_table(self, table_name: str) -> bool:
         try:
             with self.engine.connect() as conn:
-                conn.execute(text(f"DROP TABLE IF EXISTS {table_name} CASCADE"))
+                kind = 'TABLE'
+                if conn.dialect.name == 'postgresql' and table_name in inspect(conn).get_materialized_view_names():
+                    kind = 'MATERIALIZED VIEW'
+                conn.execute(text(f"DROP {kind} IF EXISTS {table_name} CASCADE"))
                 conn.commit()
             logger.info(f"Dropped table: {table_name}")
             return True
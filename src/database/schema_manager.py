@@ -0,0 +1,304 @@
+from sqlalchemy import text, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+from psycopg2 import Error as Psycopg2Error
+import logging
+import pandas as pd
+from sqlalchemy.types import Integer, Double, TypeEngine
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config.database_config import POSTGRES_CONFIG, API_CONFIG
+from src.database.postgres_handler import PostgresHandler
+from src.etl.schema import COLUMN_SCHEMA
+from src.etl.features import FEATURE_REGISTRY, DEFAULT_FEATURES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TABLE_PREFIXES = {
+    'climate_indicators': 'climate',
+    'economic_indicators': 'economic',
+    'renewable_energy': 'renewable'
+}
+
+TABLE_KEYS = {
+    'countries': ['country_code'],
+    'indicators': ['indicator_id'],
+    'indicator_values': ['country_code', 'year', 'indicator_id']
+}
+
+# The long layout of combined_analysis: observations, the row attributes
+# (names and categories) and the indicator dimension; the wide shape is a
+# materialized view over them
+LONG_TABLE_TYPES = ('indicators', 'indicator_values', 'combined_attributes')
+
+# Only the long tables' columns; indicator_id here is a surrogate key, not the
+# World Bank code the transform's cleaned frames carry under the same name
+LONG_COLUMN_TYPES = {
+    'indicator_id': Integer(),
+    'indicator_name': COLUMN_SCHEMA['country_name']['sql_type'],
+    'metric_value': Double()
+}
+
+# On top of the primary key, which already serves country lookups and
+# country + year ranges; fact tables also get a year index
+SECONDARY_INDEXES = {
+    'indicator_values': {'indicator_idx': ['indicator_id', 'year']}
+}
+
+UNIQUE_COLUMNS = {
+    'indicators': ['indicator_name']
+}
+
+IDENTITY_COLUMNS = {
+    'indicators': 'indicator_id'
+}
+
+def indicator_columns(prefix: str) -> List[str]:
+    # Declared indicator columns of a dataset, without the derived features sharing its prefix
+    return [col for col in COLUMN_SCHEMA
+            if col.startswith(prefix + '_') and FEATURE_REGISTRY.get(col) is None]
+
+def attribute_columns() -> List[str]:
+    # Non-numeric features, kept beside the names rather than as observations
+    return [col for col in DEFAULT_FEATURES
+            if isinstance(COLUMN_SCHEMA.get(col, {}).get('dtype'), pd.CategoricalDtype)]
+
+def table_columns(table_type: str) -> List[str]:
+    if table_type == 'countries':
+        return ['country_code', 'country_name']
+    if table_type == 'indicators':
+        return ['indicator_id', 'indicator_name']
+    if table_type == 'indicator_values':
+        return ['country_code', 'year', 'indicator_id', 'metric_value']
+    if table_type == 'combined_attributes':
+        return ['year', 'country_code', 'country_name'] + attribute_columns()
+    columns = ['year', 'country_code', 'country_name']
+    if table_type in TABLE_PREFIXES:
+        return columns + indicator_columns(TABLE_PREFIXES[table_type])
+    for prefix in TABLE_PREFIXES.values():
+        columns += indicator_columns(prefix)
+    return columns + [col for col in DEFAULT_FEATURES if col in COLUMN_SCHEMA]
+
+def table_keys(table_type: str) -> List[str]:
+    return TABLE_KEYS.get(table_type, ['country_code', 'year'])
+
+def column_type(col: str) -> TypeEngine:
+    return LONG_COLUMN_TYPES[col] if col in LONG_COLUMN_TYPES else COLUMN_SCHEMA[col]['sql_type']
+
+def secondary_indexes(table_type: str) -> Dict[str, List[str]]:
+    indexes = {'year_idx': ['year']} if 'year' in table_keys(table_type) else {}
+    indexes.update(SECONDARY_INDEXES.get(table_type, {}))
+    return indexes
+
+class SchemaManager:
+    
+    def __init__(self, postgres_handler: PostgresHandler = None, tables: Dict[str, str] = None,
+                 migrations_table: str = None, partition_by_year: bool = None,
+                 combined_layout: str = None):
+        self.postgres_handler = postgres_handler or PostgresHandler()
+        self.tables = tables or POSTGRES_CONFIG['tables']
+        self.combined_layout = combined_layout or POSTGRES_CONFIG['combined_layout']
+        self.migrations_table = migrations_table or POSTGRES_CONFIG['migrations_table']
+        self.partition_by_year = (POSTGRES_CONFIG['partition_by_year'] if partition_by_year is None
+                                  else partition_by_year)
+        self.partition_span = POSTGRES_CONFIG['partition_span_years']
+        
+    @property
+    def engine(self):
+        return self.postgres_handler.engine
+        
+    @property
+    def long_layout(self) -> bool:
+        # The long tables' keys are what the merges and the view's concurrent refresh
+        # rely on, so without managed schemas combined_analysis stays a wide table
+        return (self.combined_layout == 'long' and POSTGRES_CONFIG['manage_schema']
+                and all(table_type in self.tables for table_type in LONG_TABLE_TYPES + ('combined_analysis',)))
+                
+    def table_types(self) -> List[str]:
+        # The table types that exist as tables in the current layout
+        if self.long_layout:
+            return [table_type for table_type in self.tables if table_type != 'combined_analysis']
+        return [table_type for table_type in self.tables if table_type not in LONG_TABLE_TYPES]
+        
+    def swapped_table_types(self) -> List[str]:
+        # The long tables are merged in place rather than swapped
+        return [table_type for table_type in self.table_types() if table_type not in LONG_TABLE_TYPES]
+        
+    def is_wide_table(self, table_type: str) -> bool:
+        return table_type in TABLE_PREFIXES or table_type == 'combined_analysis'
+        
+    def is_fact_table(self, table_type: str) -> bool:
+        return 'year' in table_keys(table_type)
+        
+    def year_ranges(self) -> List[Tuple[int, int]]:
+        first = API_CONFIG['start_year'] // self.partition_span * self.partition_span
+        return [(start, start + self.partition_span)
+                for start in range(first, API_CONFIG['end_year'] + 1, self.partition_span)]
+                
+    def create_table(self, conn: Connection, table_type: str, table_name: str = None,
+                     columns: Iterable[str] = None):
+        # Also used for shadow tables, so every object it creates is named with
+        # the table name as prefix and follows the table through a swap. With
+        # columns (the frame's), declared columns it lacks are left out, keys aside
+        table_name = table_name or self.tables[table_type]
+        preparer = conn.dialect.identifier_preparer
+        quote = preparer.quote
+        keys = table_keys(table_type)
+        columns = None if columns is None else set(columns)
+        
+        definitions = [
+            f"{quote(col)} {column_type(col).compile(dialect=conn.dialect)}"
+            + (" GENERATED BY DEFAULT AS IDENTITY" if IDENTITY_COLUMNS.get(table_type) == col else "")
+            + (" NOT NULL" if col in keys else "")
+            for col in table_columns(table_type)
+            if columns is None or col in keys or col in columns
+        ]
+        definitions.append(f"CONSTRAINT {quote(table_name + '_pkey')} PRIMARY KEY "
+                           f"({', '.join(quote(col) for col in keys)})")
+        if table_type in UNIQUE_COLUMNS:
+            unique = UNIQUE_COLUMNS[table_type]
+            constraint_name = f"{table_name}_{'_'.join(unique)}_key"
+            definitions.append(f"CONSTRAINT {quote(constraint_name)} UNIQUE "
+                               f"({', '.join(quote(col) for col in unique)})")
+        partitioned = self.partition_by_year and self.is_fact_table(table_type)
+        conn.execute(text(
+            f"CREATE TABLE {quote(table_name)} ({', '.join(definitions)})"
+            + (" PARTITION BY RANGE (year)" if partitioned else "")
+        ))
+        
+        if partitioned:
+            for start, end in self.year_ranges():
+                conn.execute(text(f"CREATE TABLE {quote(f'{table_name}_y{start}')} PARTITION OF "
+                                  f"{quote(table_name)} FOR VALUES FROM ({start}) TO ({end})"))
+            # Years outside the configured range still load, just unpruned
+            conn.execute(text(f"CREATE TABLE {quote(table_name + '_ydefault')} PARTITION OF "
+                              f"{quote(table_name)} DEFAULT"))
+        
+        self._create_secondary_indexes(conn, table_type, table_name)
+        
+    def _create_secondary_indexes(self, conn: Connection, table_type: str, table_name: str):
+        quote = conn.dialect.identifier_preparer.quote
+        for suffix, columns in secondary_indexes(table_type).items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {quote(f'{table_name}_{suffix}')} ON "
+                              f"{quote(table_name)} ({', '.join(quote(col) for col in columns)})"))
+    
+    def table_creator(self, table_type: str, columns: Iterable[str] = None) -> Optional[Callable[[Connection, str], None]]:
+        # What the loader passes to PostgresHandler so shadows, replaced and newly
+        # upserted tables are built from the declared DDL, limited to the columns
+        # of the frame being written
+        if not POSTGRES_CONFIG['manage_schema'] or table_type not in self.table_types():
+            return None
+        columns = None if columns is None else list(columns)
+        return lambda conn, table_name: self.create_table(conn, table_type, table_name, columns)
+        
+    def _create_missing_tables(self, conn: Connection):
+        existing = set(inspect(conn).get_table_names())
+        for table_type in self.table_types():
+            table_name = self.tables[table_type]
+            if table_name not in existing:
+                # Without a frame, wide tables start with just their keys; loads add
+                # the indicator columns they actually carry
+                self.create_table(conn, table_type, table_name, [] if self.is_wide_table(table_type) else None)
+                logger.info(f"Created managed table {table_name}")
+                
+    def _add_primary_keys(self, conn: Connection):
+        # Tables written by to_sql before the schema was managed get their key in
+        # place; duplicated or null keys are left for the next swap load to rebuild
+        quote = conn.dialect.identifier_preparer.quote
+        existing = set(inspect(conn).get_table_names())
+        for table_type in self.table_types():
+            table_name = self.tables[table_type]
+            if table_name not in existing or inspect(conn).get_pk_constraint(table_name)['constrained_columns']:
+                continue
+            keys = ', '.join(quote(col) for col in table_keys(table_type))
+            invalid = conn.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM {quote(table_name)} GROUP BY {keys} HAVING count(*) > 1) "
+                f"OR EXISTS (SELECT 1 FROM {quote(table_name)} WHERE NOT (({keys}) IS NOT NULL))"
+            )).scalar()
+            if invalid:
+                logger.warning(f"Not adding a primary key to {table_name}: duplicate or null keys")
+                continue
+                
+            conn.execute(text(f"ALTER TABLE {quote(table_name)} ADD CONSTRAINT "
+                              f"{quote(table_name + '_pkey')} PRIMARY KEY ({keys})"))
+            # The unique index upsert loads used to create is now redundant
+            legacy_index = f"{table_name}_{'_'.join(table_keys(table_type))}_key"
+            conn.execute(text(f"DROP INDEX IF EXISTS {quote(legacy_index)}"))
+            logger.info(f"Added primary key to {table_name}")
+            
+    def _add_secondary_indexes(self, conn: Connection):
+        existing = set(inspect(conn).get_table_names())
+        for table_type in self.table_types():
+            if self.tables[table_type] in existing:
+                self._create_secondary_indexes(conn, table_type, self.tables[table_type])
+                
+    def _long_combined_analysis(self, conn: Connection):
+        from src.database.indicator_store import IndicatorStore
+        self._create_missing_tables(conn)
+        IndicatorStore(self.postgres_handler, self).convert_wide_table(conn)
+        
+    def migrations(self) -> List[Tuple[str, str, Callable[[Connection], None]]]:
+        # Append only: applied versions are recorded and never run again
+        migrations = [
+            ('001_managed_tables', 'Create missing tables with declared types and primary keys',
+             self._create_missing_tables),
+            ('002_primary_keys', 'Add primary keys to tables created without one',
+             self._add_primary_keys),
+            ('003_secondary_indexes', 'Index the year column of the fact tables',
+             self._add_secondary_indexes)
+        ]
+        if self.long_layout:
+            migrations.append(('004_long_combined_analysis',
+                               'Move combined_analysis to long tables behind a materialized view',
+                               self._long_combined_analysis))
+        return migrations
+        
+    def applied_migrations(self) -> List[str]:
+        if not self.postgres_handler.table_exists(self.migrations_table):
+            return []
+        with self.engine.connect() as conn:
+            return list(conn.execute(text(
+                f"SELECT version FROM {conn.dialect.identifier_preparer.quote(self.migrations_table)} "
+                f"ORDER BY version"
+            )).scalars())
+            
+    def migrate(self) -> bool:
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {conn.dialect.identifier_preparer.quote(self.migrations_table)} "
+                    f"(version VARCHAR(64) PRIMARY KEY, description TEXT, "
+                    f"applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+                ))
+                
+            for version, description, apply in self.migrations():
+                with self.engine.begin() as conn:
+                    migrations_table = conn.dialect.identifier_preparer.quote(self.migrations_table)
+                    # Concurrent loaders wait here instead of applying a migration twice
+                    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+                                 {'name': self.migrations_table})
+                    if conn.execute(text(f"SELECT 1 FROM {migrations_table} WHERE version = :version"),
+                                    {'version': version}).first():
+                        continue
+                    apply(conn)
+                    conn.execute(text(f"INSERT INTO {migrations_table} (version, description) "
+                                      f"VALUES (:version, :description)"),
+                                 {'version': version, 'description': description})
+                logger.info(f"Applied schema migration {version}: {description}")
+            return True
+        except (SQLAlchemyError, Psycopg2Error) as e:
+            logger.error(f"Schema migration failed: {e}")
+            return False
+
+def main():
+    with PostgresHandler() as postgres_handler:
+        schema_manager = SchemaManager(postgres_handler)
+        success = schema_manager.migrate()
+        
+        for version in schema_manager.applied_migrations():
+            logger.info(f"  applied: {version}")
+            
+    return success
+
+if __name__ == "__main__":
+    main()
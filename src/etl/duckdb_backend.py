@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+import logging
+from pandas.api.types import union_categoricals
+from typing import Dict, List, Tuple, Any
+from src.etl.transform import DataTransformer
+from src.etl.instrumentation import instrumented
+from config.database_config import ETL_CONFIG
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+class DuckDBTransformer(DataTransformer):
+    
+    def __init__(self, fill_strategies: Dict[str, Dict[str, Any]] = None):
+        if duckdb is None:
+            raise ImportError("The duckdb transform backend needs the duckdb package: pip install duckdb")
+        super().__init__(fill_strategies)
+        
+        config = {}
+        if ETL_CONFIG['duckdb_threads']:
+            config['threads'] = ETL_CONFIG['duckdb_threads']
+        if ETL_CONFIG['duckdb_memory_limit']:
+            config['memory_limit'] = ETL_CONFIG['duckdb_memory_limit']
+        if ETL_CONFIG['duckdb_temp_dir']:
+            # Lets large pivots spill to disk instead of failing
+            config['temp_directory'] = ETL_CONFIG['duckdb_temp_dir']
+        self.con = duckdb.connect(database=':memory:', config=config)
+        
+    def close(self):
+        self.con.close()
+        
+    def _long_view(self, cleaned: Dict[str, pd.DataFrame], prefixes: List[str]) -> str:
+        selects = []
+        for prefix in prefixes:
+            view = f"clean_{prefix}"
+            self.con.register(view, cleaned[prefix][['year', 'country_code', 'indicator_name', 'metric_value']])
+            selects.append(
+                f"SELECT CAST(country_code AS VARCHAR) AS country_code, CAST(year AS INTEGER) AS year, "
+                f"{_literal(prefix + '_')} || CAST(indicator_name AS VARCHAR) AS column_name, "
+                f"CAST(metric_value AS DOUBLE) AS metric_value FROM {view}"
+            )
+        return ' UNION ALL '.join(selects)
+        
+    def _pivot(self, long_query: str, columns: List[str], order_by: str) -> pd.DataFrame:
+        aggregates = ', '.join(
+            f"first(metric_value) FILTER (WHERE column_name = {_literal(col)}) AS {_identifier(col)}"
+            for col in columns
+        )
+        return self.con.execute(
+            f"SELECT country_code, year, {aggregates} FROM ({long_query}) "
+            f"GROUP BY country_code, year ORDER BY {order_by}"
+        ).df()
+        
+    @staticmethod
+    def _keys_frame(pivot: pd.DataFrame, country, country_name, names: np.ndarray) -> pd.DataFrame:
+        codes = pd.Categorical(pivot['country_code'], categories=country.categories).codes
+        return pd.DataFrame({
+            'year': pivot['year'].to_numpy(dtype=np.int16),
+            'country_code': pd.Categorical.from_codes(codes, categories=country.categories),
+            'country_name': pd.Categorical.from_codes(names[codes], categories=country_name.categories)
+        })
+        
+    @instrumented('transform.assemble_wide_tables')
+    def assemble_wide_tables(self, cleaned: Dict[str, pd.DataFrame],
+                             catalog: Dict[str, List[str]] = None) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        catalog = catalog or {}
+        parts = [(prefix, df) for prefix, df in cleaned.items() if not df.empty]
+        tables = {prefix: pd.DataFrame() for prefix in cleaned}
+        if not parts:
+            return pd.DataFrame(), tables
+            
+        dataset_columns = {}
+        for prefix, df in parts:
+            names = sorted(set(pd.unique(np.asarray(df['indicator_name'], dtype=object)))
+                           | set(catalog.get(prefix, [])))
+            dataset_columns[prefix] = [f"{prefix}_{name}" for name in names]
+        columns = [col for prefix, _ in parts for col in dataset_columns[prefix]]
+        
+        # Country keys and names follow the pandas path: sorted categories, and the
+        # name from the first row of each code across the datasets in order
+        country = union_categoricals([pd.Categorical(df['country_code']) for _, df in parts],
+                                     sort_categories=True)
+        country_name = union_categoricals([pd.Categorical(df['country_name']) for _, df in parts],
+                                          sort_categories=True)
+        codes, first_rows = np.unique(country.codes, return_index=True)
+        names = np.full(len(country.categories), -1, dtype=country_name.codes.dtype)
+        names[codes] = country_name.codes[first_rows]
+        
+        prefixes = [prefix for prefix, _ in parts]
+        try:
+            wide = self._pivot(self._long_view(cleaned, prefixes), columns, 'country_code, year')
+            combined = pd.concat([self._keys_frame(wide, country, country_name, names),
+                                  wide[columns].astype(np.float64)], axis=1)
+            
+            for prefix, names_for_prefix in catalog.items():
+                if prefix not in dataset_columns:
+                    for name in names_for_prefix:
+                        combined[f"{prefix}_{name}"] = np.nan
+                        
+            for prefix in prefixes:
+                pivot = self._pivot(self._long_view(cleaned, [prefix]), dataset_columns[prefix],
+                                    'year, country_code')
+                tables[prefix] = pd.concat([self._keys_frame(pivot, country, country_name, names),
+                                            pivot[dataset_columns[prefix]].astype(np.float64)], axis=1)
+                logger.info(f"Pivoted {prefix} data: {tables[prefix].shape}")
+        finally:
+            for prefix in prefixes:
+                self.con.unregister(f"clean_{prefix}")
+                
+        logger.info(f"Merged dataset: {combined.shape}")
+        return combined, tables
+        
+    def _fill_expression(self, col: str, method: str, max_gap: int) -> str:
+        # Mirrors MissingValueFiller._fill_group: the nearest observed value (and its
+        # year) before and after each row within the country, with year-based gaps
+        c = _identifier(col)
+        group, order = _identifier(self.filler.group_col), _identifier(self.filler.order_col)
+        before = f"OVER (PARTITION BY {group} ORDER BY {order} ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)"
+        after = f"OVER (PARTITION BY {group} ORDER BY {order} ROWS BETWEEN CURRENT ROW AND UNBOUNDED FOLLOWING)"
+        observed_year = f"CASE WHEN {c} IS NOT NULL THEN {order} END"
+        prev_value = f"last_value({c} IGNORE NULLS) {before}"
+        prev_year = f"last_value({observed_year} IGNORE NULLS) {before}"
+        next_value = f"first_value({c} IGNORE NULLS) {after}"
+        next_year = f"first_value({observed_year} IGNORE NULLS) {after}"
+        within = lambda distance: 'TRUE' if max_gap is None else f"({distance}) <= {int(max_gap)}"
+        
+        if method == 'none':
+            return c
+        if method == 'linear':
+            span = f"({next_year} - {prev_year})"
+            return (f"CASE WHEN {c} IS NULL AND {prev_value} IS NOT NULL AND {next_value} IS NOT NULL "
+                    f"AND {within(span + ' - 1')} THEN {prev_value} + ({next_value} - {prev_value}) * "
+                    f"({order} - {prev_year}) / {span} ELSE {c} END")
+                    
+        expression = c
+        if method in ('ffill', 'ffill_bfill'):
+            expression = (f"CASE WHEN {c} IS NULL AND {prev_value} IS NOT NULL "
+                          f"AND {within(f'{order} - {prev_year}')} THEN {prev_value} ELSE {c} END")
+        if method in ('bfill', 'ffill_bfill'):
+            expression = (f"CASE WHEN ({expression}) IS NULL AND {next_value} IS NOT NULL "
+                          f"AND {within(f'{next_year} - {order}')} THEN {next_value} ELSE ({expression}) END")
+        return expression
+        
+    def _missing_counts(self, table: str, columns: List[str]) -> pd.Series:
+        counts = ', '.join(f"count(*) - count({_identifier(col)}) AS {_identifier(col)}" for col in columns)
+        return self.con.execute(f"SELECT {counts} FROM {table}").df().iloc[0]
+        
+    @instrumented('transform.handle_missing_values')
+    def handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
+        group_col, order_col = self.filler.group_col, self.filler.order_col
+        columns = [col for col in df.select_dtypes(include=[np.number]).columns if col != order_col]
+        threshold = int(0.5 * len(df.columns))
+        
+        df = df.reset_index(drop=True)
+        if not columns:
+            return df.dropna(thresh=threshold)
+            
+        source = df[[group_col, order_col] + columns].copy(deep=False)
+        # float64 years keep the interpolation arithmetic identical to the pandas filler
+        source[order_col] = source[order_col].astype(np.float64)
+        source.insert(0, '_row', np.arange(len(df), dtype=np.int64))
+        
+        fill_columns = ', '.join(
+            f"CAST({self._fill_expression(col, *self.filler.strategy_for(col))} AS DOUBLE) AS {_identifier(col)}"
+            for col in columns
+        )
+        # Only the indicator columns can be missing, so a row keeps dropna(thresh=...)'s
+        # count as the other columns plus its non-null indicators
+        non_null = ' + '.join([str(len(df.columns) - len(columns))] + [
+            f"CAST({_identifier(col)} IS NOT NULL AS INTEGER)" for col in columns
+        ])
+        
+        self.con.register('wide_input', source)
+        try:
+            missing_before = self._missing_counts('wide_input', columns)
+            self.con.execute(f"CREATE OR REPLACE TEMP TABLE wide_filled AS "
+                             f"SELECT _row, {fill_columns} FROM wide_input")
+            missing_after = self._missing_counts('wide_filled', columns)
+            filled = self.con.execute(
+                f"SELECT * FROM wide_filled WHERE {non_null} >= {threshold} ORDER BY _row"
+            ).df()
+        finally:
+            self.con.execute("DROP TABLE IF EXISTS wide_filled")
+            self.con.unregister('wide_input')
+            
+        self.fill_report = {}
+        for col in columns:
+            method, max_gap = self.filler.strategy_for(col)
+            before, after = int(missing_before[col]), int(missing_after[col])
+            if before:
+                logger.info(f"{col}: {before / len(df) * 100:.2f}% missing")
+            if before - after:
+                logger.info(f"{col}: filled {before - after} of {before} missing "
+                            f"({method}, max_gap={max_gap})")
+            self.fill_report[col] = {
+                'method': method,
+                'max_gap': max_gap,
+                'missing_before': before,
+                'filled': before - after,
+                'missing_after': after
+            }
+            
+        # Keep the surviving rows' original positions as the index, like dropna does
+        df_filled = df.iloc[filled['_row'].to_numpy()].copy(deep=False)
+        for col in columns:
+            df_filled[col] = filled[col].to_numpy(dtype=np.float64)
+            
+        logger.info(f"After handling missing values: {df_filled.shape}")
+        return df_filled
@@ -1,48 +1,216 @@
 import pandas as pd
 import logging
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple, Optional
 from src.database.mongodb_handler import MongoDBHandler
-from config.database_config import MONGODB_CONFIG
+from src.database.bucket_layout import decode_buckets, concat_decoded
+from src.etl.instrumentation import instrumented
+from config.database_config import MONGODB_CONFIG, ETL_CONFIG
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Only the fields DataTransformer.clean_world_bank_data reads
+DOCUMENT_PROJECTION = {
+    '_id': 0, 'date': 1, 'countryiso3code': 1, 'country.value': 1,
+    'indicator.id': 1, 'indicator_name': 1, 'value': 1
+}
+
+DOCUMENT_COLUMNS = ['date', 'countryiso3code', 'country', 'indicator', 'indicator_name', 'value']
+
+BUCKET_PROJECTION = {
+    '_id': 0, 'countryiso3code': 1, 'country.value': 1, 'indicator.id': 1,
+    'indicator_name': 1, 'years': 1, 'values': 1
+}
+
 class DataExtractor:
     
     def __init__(self):
-        self.mongo_handler = MongoDBHandler()
+        self.layout = MONGODB_CONFIG['raw_layout']
         
-    def extract_from_mongodb(self, collection_name: str) -> pd.DataFrame:
-        if not self.mongo_handler.connect():
-            raise ConnectionError("Failed to connect to MongoDB")
-            
-        try:
-            documents = self.mongo_handler.find_all(collection_name)
+    def build_filter(self, years: Tuple[int, int] = None, countries: List[str] = None,
+                     indicators: List[str] = None) -> Dict:
+        filter_query = {}
+        
+        if countries:
+            filter_query['countryiso3code'] = {'$in': list(countries)}
+        if indicators:
+            filter_query['indicator_name'] = {'$in': list(indicators)}
+        if years:
+            start_year, end_year = years
+            if self.layout == 'bucket':
+                filter_query['years'] = {'$elemMatch': {'$gte': start_year, '$lte': end_year}}
+            else:
+                filter_query['date'] = {'$gte': str(start_year), '$lte': str(end_year)}
+                
+        return filter_query
+        
+    def _decode_chunk(self, documents: List[Dict], years: Tuple[int, int] = None) -> pd.DataFrame:
+        # Chunks are compacted as they arrive (repeated strings as categoricals,
+        # values as floats), so the ones held until the final concat stay small
+        if self.layout != 'bucket':
+            df = pd.DataFrame(documents).reindex(columns=DOCUMENT_COLUMNS)
+            for col in ('countryiso3code', 'indicator_name'):
+                df[col] = pd.Categorical(df[col])
+            df['value'] = pd.to_numeric(df['value'], errors='coerce')
+            return df
             
-            if not documents:
-                logger.warning(f"No documents found in {collection_name}")
-                return pd.DataFrame()
+        df = decode_buckets(documents, compact=True)
+        if years:
+            df = df[df['year'].between(years[0], years[1])].reset_index(drop=True)
+        return df
+        
+    def iter_chunks(self, collection_name: str, chunk_size: int = None,
+                    years: Tuple[int, int] = None, countries: List[str] = None,
+                    indicators: List[str] = None) -> Iterator[pd.DataFrame]:
+        projection = BUCKET_PROJECTION if self.layout == 'bucket' else DOCUMENT_PROJECTION
+        filter_query = self.build_filter(years, countries, indicators)
+        
+        # A handler per call keeps concurrent extractions off each other's state
+        with MongoDBHandler() as mongo_handler:
+            for documents in mongo_handler.iter_batches(
+                collection_name, filter_query, projection, chunk_size
+            ):
+                yield self._decode_chunk(documents, years)
                 
-            df = pd.DataFrame(documents)
+    def extract_from_mongodb(self, collection_name: str, years: Tuple[int, int] = None,
+                             countries: List[str] = None, indicators: List[str] = None) -> pd.DataFrame:
+        chunks = [chunk for chunk in self.iter_chunks(collection_name, years=years, countries=countries,
+                                                      indicators=indicators) if not chunk.empty]
+        
+        if not chunks:
+            logger.warning(f"No documents found in {collection_name}")
+            return pd.DataFrame()
             
-            if '_id' in df.columns:
-                df = df.drop('_id', axis=1)
+        df = concat_decoded(chunks)
+        
+        logger.info(f"Extracted {len(df)} records from {collection_name}")
+        return df
+        
+    def series_pipeline(self, filter_query: Dict) -> List[Dict]:
+        # MongoDB gathers each series into parallel arrays, so the client never
+        # materialises a dict per observation
+        return [
+            {'$match': filter_query},
+            {'$group': {
+                '_id': {'indicator': '$indicator.id', 'country': '$countryiso3code'},
+                'indicator_name': {'$first': '$indicator_name'},
+                'country_name': {'$first': '$country.value'},
+                'years': {'$push': {'$toInt': '$date'}},
+                'values': {'$push': {'$ifNull': ['$value', None]}}
+            }},
+            {'$project': {
+                '_id': 0,
+                'countryiso3code': '$_id.country',
+                'indicator': {'id': '$_id.indicator'},
+                'indicator_name': 1,
+                'country': {'value': '$country_name'},
+                'years': 1,
+                'values': 1
+            }}
+        ]
+        
+    def iter_column_chunks(self, collection_name: str, chunk_size: int = None,
+                           years: Tuple[int, int] = None, countries: List[str] = None,
+                           indicators: List[str] = None) -> Iterator[pd.DataFrame]:
+        filter_query = self.build_filter(years, countries, indicators)
+        
+        with MongoDBHandler() as mongo_handler:
+            if self.layout == 'bucket':
+                batches = mongo_handler.iter_batches(
+                    collection_name, filter_query, BUCKET_PROJECTION, chunk_size
+                )
+            else:
+                batches = mongo_handler.iter_aggregate(
+                    collection_name, self.series_pipeline(filter_query), chunk_size
+                )
                 
-            logger.info(f"Extracted {len(df)} records from {collection_name}")
-            return df
+            for series_documents in batches:
+                df = decode_buckets(series_documents, compact=True)
+                if years:
+                    df = df[df['year'].between(years[0], years[1])]
+                yield df
+                
+    def extract_columns(self, collection_name: str, years: Tuple[int, int] = None,
+                        countries: List[str] = None, indicators: List[str] = None) -> pd.DataFrame:
+        chunks = list(self.iter_column_chunks(collection_name, years=years, countries=countries,
+                                              indicators=indicators))
+        
+        if not chunks:
+            logger.warning(f"No documents found in {collection_name}")
+            return pd.DataFrame()
+            
+        df = concat_decoded(chunks).reset_index(drop=True)
+        
+        logger.info(f"Extracted {len(df)} records from {collection_name} "
+                    f"({df.memory_usage(deep=True).sum() / 1e6:.1f} MB columnar)")
+        return df
+        
+    def plan_partitions(self, collection_name: str, countries: List[str] = None) -> List[Optional[List[str]]]:
+        filter_query = self.build_filter(countries=countries)
+        with MongoDBHandler() as mongo_handler:
+            count = mongo_handler.count_documents(collection_name, filter_query)
+            if count < ETL_CONFIG['extract_partition_threshold']:
+                return [None]
+            indicator_names = sorted(mongo_handler.distinct(collection_name, 'indicator_name', filter_query))
             
-        finally:
-            self.mongo_handler.disconnect()
+        logger.info(f"Splitting {collection_name} into {len(indicator_names)} indicator partitions")
+        return [[name] for name in indicator_names] or [None]
+        
+    def observed_filter(self) -> Dict:
+        # Matches only raw records with a value, the ones that survive cleaning
+        if self.layout == 'bucket':
+            return {'values': {'$elemMatch': {'$ne': None}}}
+        return {'value': {'$ne': None}}
+        
+    def list_countries(self) -> List[str]:
+        countries = set()
+        with MongoDBHandler() as mongo_handler:
+            for collection_name in MONGODB_CONFIG['collections'].values():
+                countries.update(mongo_handler.distinct(collection_name, 'countryiso3code',
+                                                        self.observed_filter()))
+        return sorted(country for country in countries if country is not None)
+        
+    def indicator_catalog(self) -> Dict[str, List[str]]:
+        with MongoDBHandler() as mongo_handler:
+            return {
+                data_type: sorted(mongo_handler.distinct(collection_name, 'indicator_name',
+                                                         self.observed_filter()))
+                for data_type, collection_name in MONGODB_CONFIG['collections'].items()
+            }
             
-    def extract_all_raw_data(self) -> Dict[str, pd.DataFrame]:
+    @instrumented('extract.extract_all_raw_data')
+    def extract_all_raw_data(self, columnar: bool = None, max_workers: int = None,
+                             countries: List[str] = None) -> Dict[str, pd.DataFrame]:
         collections = MONGODB_CONFIG['collections']
+        if columnar is None:
+            columnar = ETL_CONFIG['columnar_extract']
+        if max_workers is None:
+            max_workers = ETL_CONFIG['extract_workers']
+            
+        extract = self.extract_columns if columnar else self.extract_from_mongodb
         
+        tasks = [
+            (data_type, collection_name, partition)
+            for data_type, collection_name in collections.items()
+            for partition in self.plan_partitions(collection_name, countries)
+        ]
+        logger.info(f"Extracting {len(collections)} collections as {len(tasks)} tasks "
+                    f"on {max_workers} workers...")
+                    
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(extract, collection_name, countries=countries, indicators=partition)
+                for _, collection_name, partition in tasks
+            ]
+            results = [future.result() for future in futures]
+            
         raw_data = {}
         
-        for data_type, collection_name in collections.items():
-            logger.info(f"Extracting {data_type}...")
-            df = self.extract_from_mongodb(collection_name)
-            raw_data[data_type] = df
+        for data_type in collections:
+            frames = [df for (task_type, _, _), df in zip(tasks, results)
+                      if task_type == data_type and not df.empty]
+            raw_data[data_type] = concat_decoded(frames) if frames else pd.DataFrame()
             
         return raw_data
 
@@ -59,5 +227,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
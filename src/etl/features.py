@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+from src.etl.schema import RENEWABLE_ADOPTION_LEVELS, INCOME_LEVELS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FeatureDefinition:
+    
+    def __init__(self, name: str, inputs: List[str], compute: Callable[..., pd.Series],
+                 grouped: bool = False):
+        # compute receives one Series per input (plus the country keys and years
+        # when grouped) and returns a Series aligned to the frame's index
+        self.name = name
+        self.inputs = list(inputs)
+        self.compute = compute
+        self.grouped = grouped
+
+class FeatureRegistry:
+    
+    def __init__(self):
+        self.features = {}
+        
+    def register(self, feature: FeatureDefinition) -> FeatureDefinition:
+        if feature.name in self.features:
+            raise ValueError(f"Feature {feature.name!r} is already registered")
+        self.features[feature.name] = feature
+        return feature
+        
+    def get(self, name: str) -> Optional[FeatureDefinition]:
+        return self.features.get(name)
+        
+    def names(self) -> List[str]:
+        return list(self.features)
+
+class FeatureEngine:
+    
+    def __init__(self, registry: FeatureRegistry = None, group_col: str = 'country_code',
+                 order_col: str = 'year', max_versions: int = 4):
+        self.registry = registry or FEATURE_REGISTRY
+        self.group_col = group_col
+        self.order_col = order_col
+        self.max_versions = max_versions
+        self._cache = OrderedDict()
+        
+    def resolve(self, names: List[str], columns: List[str]) -> List[str]:
+        # Depth-first topological order over feature inputs; features whose raw
+        # inputs are missing from the frame are skipped along with their dependents
+        order, visiting, available = [], set(), set(columns)
+        
+        def visit(name: str) -> bool:
+            if name in order:
+                return True
+            feature = self.registry.get(name)
+            if feature is None:
+                if name in available:
+                    return True
+                raise ValueError(f"Unknown feature or column {name!r}")
+            if name in visiting:
+                raise ValueError(f"Feature dependency cycle at {name!r}")
+                
+            visiting.add(name)
+            ready = all(
+                visit(dep) if self.registry.get(dep) is not None else dep in available
+                for dep in feature.inputs
+            )
+            visiting.discard(name)
+            if ready:
+                order.append(name)
+            return ready
+            
+        for name in names:
+            if not visit(name):
+                logger.debug(f"Skipping feature {name}: inputs not available")
+        return order
+        
+    def _version_cache(self, version: Hashable) -> Dict[str, pd.Series]:
+        if version is None:
+            return {}
+        if version in self._cache:
+            self._cache.move_to_end(version)
+        else:
+            self._cache[version] = {}
+            while len(self._cache) > self.max_versions:
+                self._cache.popitem(last=False)
+        return self._cache[version]
+        
+    def compute(self, df: pd.DataFrame, names: List[str],
+                version: Hashable = None) -> Dict[str, pd.Series]:
+        # version identifies the dataset (e.g. a load timestamp); results are
+        # reused for repeated requests against the same version
+        cache = self._version_cache(version)
+        results = {}
+        
+        for name in self.resolve(names, list(df.columns)):
+            if name in cache:
+                results[name] = cache[name]
+                continue
+                
+            feature = self.registry.get(name)
+            args = [results[dep] if dep in results else df[dep] for dep in feature.inputs]
+            if feature.grouped:
+                args += [df[self.group_col], df[self.order_col]]
+            results[name] = cache[name] = feature.compute(*args)
+            
+        return {name: results[name] for name in names if name in results}
+        
+    def add_features(self, df: pd.DataFrame, names: List[str] = None,
+                     version: Hashable = None) -> pd.DataFrame:
+        features = self.compute(df, names or DEFAULT_FEATURES, version)
+        
+        # Shallow copy: existing columns are shared, only the new ones are allocated
+        df_features = df.copy(deep=False)
+        for name, values in features.items():
+            df_features[name] = values
+        return df_features
+        
+    def clear_cache(self):
+        self._cache.clear()
+
+def _grouped(values: pd.Series, countries: pd.Series):
+    return values.groupby(countries, observed=True, sort=False)
+
+def ratio(name: str, numerator: str, denominator: str, scale: float = 1.0) -> FeatureDefinition:
+    return FeatureDefinition(name, [numerator, denominator],
+                             lambda num, den: num / (den / scale))
+
+def banded(name: str, column: str, bins: List[float], labels: List[str]) -> FeatureDefinition:
+    return FeatureDefinition(name, [column],
+                             lambda values: pd.cut(values, bins=bins, labels=labels))
+
+def yoy_change(column: str, name: str = None) -> FeatureDefinition:
+    def compute(values, countries, years):
+        previous = _grouped(values, countries).shift(1)
+        previous_year = _grouped(years, countries).shift(1)
+        change = (values - previous) / previous.abs() * 100
+        # Only consecutive years count; a dropped year leaves the change missing
+        return change.where(years.astype(np.float64) - previous_year == 1).replace([np.inf, -np.inf], np.nan)
+    return FeatureDefinition(name or f"{column}_yoy_pct", [column], compute, grouped=True)
+
+def rolling_mean(column: str, window: int, name: str = None) -> FeatureDefinition:
+    def compute(values, countries, years):
+        # Each country is laid out on a continuous year range before rolling, so a
+        # window spans `window` years (like yoy_change, a dropped year is a gap)
+        if values.empty:
+            return values.astype(np.float64)
+        keys = pd.MultiIndex.from_arrays([np.asarray(countries, dtype=object), years.to_numpy(dtype=np.int64)])
+        observed = pd.Series(values.to_numpy(dtype=np.float64), index=keys)
+        bounds = pd.Series(keys.get_level_values(1)).groupby(keys.get_level_values(0)).agg(['min', 'max'])
+        grid = pd.MultiIndex.from_arrays([
+            np.repeat(bounds.index.to_numpy(), bounds['max'] - bounds['min'] + 1),
+            np.concatenate([np.arange(low, high + 1) for low, high in zip(bounds['min'], bounds['max'])])
+        ])
+        rolled = observed.reindex(grid).groupby(level=0, sort=False).rolling(window, min_periods=1).mean()
+        return pd.Series(rolled.droplevel(0).reindex(keys).to_numpy(), index=values.index)
+    return FeatureDefinition(name or f"{column}_rolling_{window}", [column], compute, grouped=True)
+
+def per_capita(column: str, population: str = 'economic_population', name: str = None) -> FeatureDefinition:
+    return FeatureDefinition(name or f"{column}_per_capita", [column, population],
+                             lambda values, people: values / people)
+
+FEATURE_REGISTRY = FeatureRegistry()
+
+FEATURE_REGISTRY.register(ratio('co2_per_gdp', 'climate_co2_emissions', 'economic_gdp_current_usd', scale=1e9))
+FEATURE_REGISTRY.register(banded('renewable_adoption_category', 'renewable_renewable_energy_consumption_pct',
+                                 [0, 20, 40, 60, 100], RENEWABLE_ADOPTION_LEVELS))
+FEATURE_REGISTRY.register(banded('gdp_per_capita_category', 'economic_gdp_per_capita',
+                                 [0, 5000, 15000, 40000, np.inf], INCOME_LEVELS))
+
+FEATURE_REGISTRY.register(yoy_change('climate_co2_emissions'))
+FEATURE_REGISTRY.register(yoy_change('economic_gdp_current_usd'))
+FEATURE_REGISTRY.register(yoy_change('co2_per_gdp'))
+FEATURE_REGISTRY.register(rolling_mean('climate_co2_per_capita', 5))
+FEATURE_REGISTRY.register(rolling_mean('renewable_renewable_energy_consumption_pct', 5))
+FEATURE_REGISTRY.register(per_capita('renewable_electricity_production_renewable'))
+
+# Written to the combined table on every run; the rest are computed on request
+DEFAULT_FEATURES = ['co2_per_gdp', 'renewable_adoption_category', 'gdp_per_capita_category']
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import logging
+import threading
+import tracemalloc
+import functools
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from config.database_config import ETL_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_active_profiler = None
+
+def count_rows(obj: Any) -> Optional[int]:
+    if isinstance(obj, pd.DataFrame):
+        return len(obj)
+    if isinstance(obj, dict):
+        counts = [count_rows(value) for value in obj.values()]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    if isinstance(obj, tuple) and obj:
+        # (combined, tables) results are counted by their combined frame
+        return count_rows(obj[0])
+    return None
+
+class StageRecord:
+    
+    def __init__(self, name: str, depth: int, rows_in: int = None):
+        self.name = name
+        self.depth = depth
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.started_at = datetime.now(timezone.utc)
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_memory_mb = None
+        self.status = 'ok'
+        self._start_memory = 0
+        self._child_peak = 0
+        
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stage': self.name,
+            'depth': self.depth,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'peak_memory_mb': self.peak_memory_mb,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'status': self.status
+        }
+
+class RunProfiler:
+    
+    def __init__(self, name: str, profile_memory: bool = None):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        self.run_id = f"{name}-{self.started_at:%Y%m%dT%H%M%S}-{os.getpid()}"
+        self.profile_memory = ETL_CONFIG['profile_memory'] if profile_memory is None else profile_memory
+        self.status = 'running'
+        self.stages = []
+        self._stack = []
+        self._thread = threading.get_ident()
+        self._lock = threading.Lock()
+        self._worker_stacks = threading.local()
+        self._owns_tracing = False
+        
+    def start(self):
+        if self.profile_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        self._wall_start = time.perf_counter()
+        
+    def stop(self, status: str = 'ok'):
+        self.status = status
+        self.finished_at = datetime.now(timezone.utc)
+        self.total_wall_seconds = time.perf_counter() - self._wall_start
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+            
+    def _tracing(self) -> bool:
+        return self.profile_memory and tracemalloc.is_tracing()
+        
+    @contextmanager
+    def stage(self, name: str, rows_in: int = None) -> Iterator[StageRecord]:
+        # Stages from worker threads (e.g. tables loaded concurrently) nest under the
+        # main thread's current stage; tracemalloc's peak is process-wide, so only
+        # the thread that started the run measures memory
+        main = threading.get_ident() == self._thread
+        if main:
+            stack, depth = self._stack, len(self._stack)
+        else:
+            if not hasattr(self._worker_stacks, 'stack'):
+                self._worker_stacks.stack = []
+            stack = self._worker_stacks.stack
+            depth = len(self._stack) + len(stack)
+            
+        record = StageRecord(name, depth, rows_in)
+        tracing = main and self._tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent._child_peak = max(parent._child_peak, peak)
+            record._start_memory = current
+            tracemalloc.reset_peak()
+            
+        stack.append(record)
+        with self._lock:
+            self.stages.append(record)
+        cpu_clock = time.process_time if main else time.thread_time
+        wall_start, cpu_start = time.perf_counter(), cpu_clock()
+        try:
+            yield record
+        except Exception:
+            record.status = 'failed'
+            raise
+        finally:
+            record.wall_seconds = round(time.perf_counter() - wall_start, 6)
+            record.cpu_seconds = round(cpu_clock() - cpu_start, 6)
+            stack.pop()
+            
+            if tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], record._child_peak)
+                record.peak_memory_mb = round((peak - record._start_memory) / 1e6, 3)
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent._child_peak = max(parent._child_peak, peak)
+                    
+            logger.info(f"[{name}] {record.wall_seconds:.3f}s wall, {record.cpu_seconds:.3f}s CPU"
+                        + (f", peak {record.peak_memory_mb:.1f} MB" if record.peak_memory_mb is not None else "")
+                        + (f", rows {record.rows_in} -> {record.rows_out}" if record.rows_out is not None else ""))
+                        
+    def merge(self, stages: List[Dict[str, Any]]):
+        # Stages recorded in another process (see record_stages), nested under
+        # this thread's current stage
+        base = len(self._stack) if threading.get_ident() == self._thread else 0
+        records = []
+        for stage in stages:
+            record = StageRecord(stage['stage'], base + stage['depth'], stage['rows_in'])
+            record.started_at = datetime.fromisoformat(stage['started_at'])
+            for field in ('rows_out', 'wall_seconds', 'cpu_seconds', 'peak_memory_mb', 'status'):
+                setattr(record, field, stage[field])
+            records.append(record)
+        with self._lock:
+            self.stages.extend(records)
+            
+    def report(self) -> Dict[str, Any]:
+        return {
+            'run_id': self.run_id,
+            'pipeline': self.name,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'status': self.status,
+            'total_wall_seconds': round(getattr(self, 'total_wall_seconds', 0.0), 6),
+            'profile_memory': self.profile_memory,
+            'stages': [record.to_dict() for record in self.stages]
+        }
+        
+    def write_json(self, directory: str = None) -> str:
+        directory = directory or ETL_CONFIG['run_report_dir']
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.run_id}.json")
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info(f"Run report written to {path}")
+        return path
+        
+    def stages_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame([record.to_dict() for record in self.stages])
+        if not df.empty:
+            df.insert(0, 'run_id', self.run_id)
+            df.insert(1, 'pipeline', self.name)
+            df['started_at'] = pd.to_datetime(df['started_at'])
+        return df
+        
+    def write_postgres(self, table_name: str = None) -> bool:
+        table_name = table_name or ETL_CONFIG['run_report_table']
+        if not table_name or not self.stages:
+            return False
+            
+        from src.database.postgres_handler import PostgresHandler
+        with PostgresHandler() as postgres_handler:
+            return postgres_handler.create_table_from_dataframe(
+                self.stages_frame(), table_name, if_exists='append'
+            )
+
+def _reset_after_fork():
+    # Forked workers (e.g. the partitioned transform) must not record into a
+    # copy of the parent's run or pay for its memory tracing
+    global _active_profiler
+    if _active_profiler is not None:
+        if _active_profiler._owns_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        _active_profiler = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_active_profiler() -> Optional[RunProfiler]:
+    return _active_profiler
+
+@contextmanager
+def profile_run(name: str, profile_memory: bool = None, report_dir: str = None,
+                report_table: str = None) -> Iterator[RunProfiler]:
+    global _active_profiler
+    profiler = RunProfiler(name, profile_memory)
+    previous, _active_profiler = _active_profiler, profiler
+    profiler.start()
+    status = 'failed'
+    try:
+        yield profiler
+        status = 'ok'
+    finally:
+        profiler.stop(status)
+        _active_profiler = previous
+        try:
+            profiler.write_json(report_dir)
+            if report_table or ETL_CONFIG['run_report_table']:
+                profiler.write_postgres(report_table)
+        except Exception as e:
+            logger.error(f"Failed to write run report for {profiler.run_id}: {e}")
+
+@contextmanager
+def stage(name: str, rows_in: int = None) -> Iterator[StageRecord]:
+    profiler = _active_profiler
+    if profiler is None:
+        yield StageRecord(name, -1, rows_in)
+        return
+    with profiler.stage(name, rows_in) as record:
+        yield record
+
+def record_stages(func: Callable, *args, **kwargs) -> Tuple[Any, List[Dict[str, Any]]]:
+    # For process pool workers, which fork away from the parent's run: runs func
+    # under a profiler of its own and returns its result with the stages it
+    # recorded, for merge_stages in the parent
+    global _active_profiler
+    profiler = RunProfiler(f"worker-{os.getpid()}", profile_memory=False)
+    previous, _active_profiler = _active_profiler, profiler
+    profiler.start()
+    try:
+        return func(*args, **kwargs), [record.to_dict() for record in profiler.stages]
+    finally:
+        profiler.stop()
+        _active_profiler = previous
+
+def merge_stages(stages: List[Dict[str, Any]]):
+    if _active_profiler is not None:
+        _active_profiler.merge(stages)
+
+def instrumented(name: str):
+    # Method decorator: rows in come from the first argument after self,
+    # rows out from the return value; a no-op when no run is being profiled
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if _active_profiler is None:
+                return func(self, *args, **kwargs)
+            rows_in = count_rows(args[0]) if args else None
+            with stage(name, rows_in) as record:
+                result = func(self, *args, **kwargs)
+                record.rows_out = count_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+def load_run_reports(directory: str = None) -> List[Dict[str, Any]]:
+    directory = directory or ETL_CONFIG['run_report_dir']
+    if not os.path.isdir(directory):
+        return []
+    reports = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename)) as f:
+                reports.append(json.load(f))
+    return reports
@@ -1,70 +1,297 @@
 import pandas as pd
 import logging
-from typing import Dict
-from src.database.postgres_handler import PostgresHandler
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.engine import Connection
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from src.database.postgres_handler import PostgresHandler, SHADOW_SUFFIX, PREVIOUS_SUFFIX, STAGE_SUFFIX
+from src.database.schema_manager import SchemaManager, table_keys
+from src.database.indicator_store import IndicatorStore, read_combined_analysis
 from config.database_config import POSTGRES_CONFIG
+from src.etl.schema import enforce_schema, sql_types
+from src.etl.instrumentation import instrumented, stage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+LOAD_MODES = ('swap', 'replace', 'upsert')
+
 class DataLoader:
     
     def __init__(self):
         self.postgres_handler = PostgresHandler()
+        self.schema_manager = SchemaManager(self.postgres_handler)
+        self.indicator_store = None
+        if self.schema_manager.long_layout:
+            self.indicator_store = IndicatorStore(self.postgres_handler, self.schema_manager)
+        self.schema_ready = False
+        
+    def key_columns(self, table_type: str) -> List[str]:
+        return table_keys(table_type)
+        
+    def prepare_schema(self) -> bool:
+        # Applies pending schema migrations once per loader
+        if POSTGRES_CONFIG['manage_schema'] and not self.schema_ready:
+            self.schema_ready = self.schema_manager.migrate()
+            return self.schema_ready
+        return True
+        
+    def table_name(self, table_type: str) -> str:
+        return POSTGRES_CONFIG['tables'].get(table_type, table_type)
+        
+    def countries_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        return enforce_schema(df[['country_code', 'country_name']].drop_duplicates())
+        
+    def is_long(self, table_type: str) -> bool:
+        # combined_analysis is stored in the long tables behind a materialized view
+        return self.indicator_store is not None and table_type == 'combined_analysis'
+        
+    def _run_tables(self, tasks: List[Callable[[], bool]]) -> List[bool]:
+        # Tables are independent, so each one is written on its own pooled connection;
+        # with a single worker they run in turn on this thread
+        workers = min(POSTGRES_CONFIG['load_workers'], len(tasks))
+        if workers <= 1:
+            return [task() for task in tasks]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda task: task(), tasks))
+            
+    def _stage_table(self, df: pd.DataFrame, table_type: str, mode: str) -> bool:
+        # Swap and replace fill the shadow table, upsert an unlogged stage table;
+        # _publish then puts every table in place in one transaction
+        table_name = self.table_name(table_type)
+        
+        with stage(f"load.{mode}.{table_name}", rows_in=len(df)) as record:
+            if mode == 'upsert':
+                success = self.postgres_handler.stage_dataframe(df, table_name, dtype=sql_types(df))
+            else:
+                success = self.postgres_handler.prepare_shadow_table(
+                    df, table_name, self.key_columns(table_type), dtype=sql_types(df),
+                    create_table=self.schema_manager.table_creator(table_type, df.columns)
+                )
+            record.rows_out = len(df) if success else 0
+            
+        if success:
+            logger.info(f"Staged {len(df)} records for {table_name}")
+        else:
+            logger.error(f"Failed to load {table_type}")
+        return success
+        
+    def _stage_combined(self, df: pd.DataFrame) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        with stage(f"load.long.{self.indicator_store.view_name}", rows_in=len(df)) as record:
+            staged = self.indicator_store.stage(df)
+            record.rows_out = len(df) if staged is not None else 0
+        return staged
+        
+    def _publish(self, conn: Connection, frames: Dict[str, pd.DataFrame], staged_combined: tuple,
+                 mode: str, countries: List[str] = None) -> bool:
+        shadows = [self.table_name(table_type) for table_type in frames
+                   if mode != 'upsert' and not self.is_long(table_type)]
+        if shadows and not self.postgres_handler.swap_tables(shadows, conn=conn,
+                                                             keep_previous=mode == 'swap'):
+            return False
+            
+        for table_type, df in frames.items():
+            if self.is_long(table_type):
+                if mode != 'upsert' and not self.indicator_store.snapshot(conn, keep=mode == 'swap'):
+                    return False
+                # A country-scoped refresh only deletes vanished rows of those countries
+                if not self.indicator_store.merge_staged(conn, staged_combined,
+                                                         countries if mode == 'upsert' else None):
+                    return False
+            elif mode == 'upsert':
+                scope = {'country_code': countries} if countries else None
+                if not self.postgres_handler.merge_staged(
+                    conn, df, self.table_name(table_type), self.key_columns(table_type),
+                    dtype=sql_types(df), scope=scope,
+                    create_table=self.schema_manager.table_creator(table_type, df.columns)
+                ):
+                    return False
+        return True
         
-    def create_countries_table(self, df: pd.DataFrame) -> bool:
+    def _load_tables(self, frames: Dict[str, pd.DataFrame], mode: str,
+                     countries: List[str] = None) -> bool:
+        # Every table is staged concurrently, each on its own pooled connection and
+        # committed as scratch tables; one transaction on one connection then swaps
+        # or merges them all in, so the tables change together or not at all
+        staged_combined = []
+        
+        def stage_table(table_type: str, df: pd.DataFrame) -> bool:
+            if self.is_long(table_type):
+                staged_combined.append(self._stage_combined(df))
+                return staged_combined[-1] is not None
+            return self._stage_table(df, table_type, mode)
+            
+        committed = False
+        try:
+            if not all(self._run_tables([partial(stage_table, table_type, df)
+                                         for table_type, df in frames.items()])):
+                return False
+                
+            with self.postgres_handler.engine.connect() as conn:
+                transaction = conn.begin()
+                if not self._publish(conn, frames, staged_combined[0] if staged_combined else None,
+                                     mode, countries):
+                    transaction.rollback()
+                    return False
+                transaction.commit()
+            committed = True
+            return True
+            
+        finally:
+            if not committed:
+                for table_type in frames:
+                    table_names = ([self.table_name(table_type)] if not self.is_long(table_type)
+                                   else self.indicator_store.staged_tables())
+                    for table_name in table_names:
+                        for suffix in (SHADOW_SUFFIX, STAGE_SUFFIX):
+                            self.postgres_handler.drop_table(table_name + suffix)
+                            
+    @instrumented('load.create_countries_table')
+    def create_countries_table(self, df: pd.DataFrame, mode: str = None) -> bool:
+        countries_df = self.countries_frame(df)
+        success = self.load_to_postgres({'countries': countries_df}, mode)
+        if success:
+            logger.info(f"Created countries table with {len(countries_df)} countries")
+        return success
+        
+    @instrumented('load.load_to_postgres')
+    def load_to_postgres(self, tables: Dict[str, pd.DataFrame], mode: str = None,
+                         countries: List[str] = None) -> bool:
+        # All tables (including 'countries' when given) are committed together or
+        # not at all. mode 'upsert' merges rows into the existing tables; with
+        # countries, only those countries' rows are sent and reconciled
+        mode = mode or POSTGRES_CONFIG['load_mode']
+        if mode not in LOAD_MODES:
+            raise ValueError(f"Unknown load mode {mode!r}, expected one of {LOAD_MODES}")
         if not self.postgres_handler.connect():
             raise ConnectionError("Failed to connect to PostgreSQL")
             
         try:
-            countries_df = df[['country_code', 'country_name']].drop_duplicates()
-            
-            table_name = POSTGRES_CONFIG['tables']['countries']
-            success = self.postgres_handler.create_table_from_dataframe(
-                countries_df, table_name, if_exists='replace'
-            )
+            if not self.prepare_schema():
+                return False
+                
+            frames = {}
+            for table_type, df in tables.items():
+                if mode == 'upsert' and countries and not df.empty:
+                    df = df[df['country_code'].isin(countries)]
+                if df.empty:
+                    logger.warning(f"Skipping empty table: {table_type}")
+                    continue
+                frames[table_type] = enforce_schema(df)
+                
+            if not frames:
+                return True
+            success = self._load_tables(frames, mode, countries)
             
             if success:
-                logger.info(f"Created countries table with {len(countries_df)} countries")
+                logger.info(f"All tables loaded successfully to PostgreSQL: {sorted(frames)}")
+            else:
+                logger.error(f"Load failed, no table was changed: {sorted(frames)}")
             return success
             
         finally:
             self.postgres_handler.disconnect()
             
-    def load_to_postgres(self, tables: Dict[str, pd.DataFrame]) -> bool:
+    def _append_partition(self, df: pd.DataFrame, table_type: str, create: bool) -> bool:
+        shadow = self.table_name(table_type) + SHADOW_SUFFIX
+        df = enforce_schema(df)
+        create_table = self.schema_manager.table_creator(table_type, df.columns)
+        if create_table is not None:
+            return self.postgres_handler.write_managed_table(df, shadow, create_table, dtype=sql_types(df),
+                                                             recreate=create)
+        return self.postgres_handler.create_table_from_dataframe(
+            df, shadow, dtype=sql_types(df), if_exists='replace' if create else 'append'
+        )
+        
+    @instrumented('load.load_partitions')
+    def load_partitions(self, partitions: Iterable[Dict[str, pd.DataFrame]],
+                        country_index: Callable[[], pd.DataFrame] = None) -> bool:
+        # Streams country partitions into shadow tables (the first partition creates
+        # each one, the rest append), so the full tables never sit in memory; the
+        # live tables, plus countries from country_index once every partition has
+        # landed, are swapped together at the end. In the long layout, combined
+        # partitions are merged into the long tables in one open transaction that
+        # also carries the swap
         if not self.postgres_handler.connect():
             raise ConnectionError("Failed to connect to PostgreSQL")
             
+        created = {}
+        success = False
+        conn = transaction = None
         try:
-            for table_type, df in tables.items():
-                if df.empty:
-                    logger.warning(f"Skipping empty table: {table_type}")
-                    continue
+            if not self.prepare_schema():
+                return False
+            if self.indicator_store is not None:
+                conn = self.postgres_handler.engine.connect()
+                transaction = conn.begin()
+                if not self.indicator_store.snapshot(conn):
+                    return False
                     
-                table_name = POSTGRES_CONFIG['tables'].get(table_type, table_type)
-                
-                success = self.postgres_handler.create_table_from_dataframe(
-                    df, table_name, if_exists='replace'
-                )
-                
-                if success:
-                    logger.info(f"Loaded {len(df)} records to {table_name}")
-                else:
-                    logger.error(f"Failed to load {table_type}")
+            loaded_countries = set()
+            for tables in partitions:
+                tasks, table_types = [], []
+                for table_type, df in tables.items():
+                    if df.empty:
+                        continue
+                    if self.is_long(table_type):
+                        partition_countries = sorted(pd.unique(df['country_code']))
+                        loaded_countries.update(partition_countries)
+                        tasks.append(partial(self.indicator_store.write, conn, enforce_schema(df),
+                                             partition_countries, False))
+                    else:
+                        tasks.append(partial(self._append_partition, df, table_type, table_type not in created))
+                        created[table_type] = True
+                    table_types.append(table_type)
+                    
+                for table_type, result in zip(table_types, self._run_tables(tasks)):
+                    if not result:
+                        logger.error(f"Failed to load a partition of {table_type}")
+                        return False
+                        
+            if conn is not None and loaded_countries:
+                if not (self.indicator_store.prune(conn, sorted(loaded_countries))
+                        and self.indicator_store.refresh(conn)):
                     return False
                     
-            logger.info("All tables loaded successfully to PostgreSQL")
+            if country_index is not None:
+                countries_df = country_index()
+                if not countries_df.empty:
+                    created['countries'] = True
+                    if not self._append_partition(countries_df, 'countries', True):
+                        return False
+                        
+            table_names = [self.table_name(table_type) for table_type in created]
+            for table_type in created:
+                if not self.postgres_handler.finalize_shadow_table(self.table_name(table_type),
+                                                                   self.key_columns(table_type)):
+                    return False
+            if created and not self.postgres_handler.swap_tables(table_names, conn=conn):
+                return False
+            if transaction is not None:
+                transaction.commit()
+                
+            success = True
+            logger.info(f"All partitions loaded to PostgreSQL: {sorted(table_names)}")
             return True
             
         finally:
+            if conn is not None:
+                if transaction.is_active:
+                    transaction.rollback()
+                conn.close()
+            if not success:
+                for table_type in created:
+                    self.postgres_handler.drop_table(self.table_name(table_type) + SHADOW_SUFFIX)
             self.postgres_handler.disconnect()
             
+    @instrumented('load.verify_load')
     def verify_load(self) -> Dict[str, int]:
         if not self.postgres_handler.connect():
             raise ConnectionError("Failed to connect to PostgreSQL")
             
         try:
-            table_names = self.postgres_handler.get_table_names()
+            table_names = [name for name in self.postgres_handler.get_table_names()
+                           if not name.endswith((SHADOW_SUFFIX, PREVIOUS_SUFFIX))]
             logger.info(f"Tables in database: {table_names}")
             
             record_counts = {}
@@ -77,26 +304,73 @@ class DataLoader:
             
         finally:
             self.postgres_handler.disconnect()
+            
+    def rollback(self, table_types: List[str] = None) -> bool:
+        # Puts back the versions replaced by the last swap load. In the long layout,
+        # combined_analysis stands for the long tables' snapshots, and the view is
+        # rebuilt over them in the same transaction
+        if not table_types:
+            table_types = self.schema_manager.swapped_table_types()
+            if self.indicator_store is not None:
+                table_types.append('combined_analysis')
+        long_rollback = self.indicator_store is not None and 'combined_analysis' in table_types
+        if long_rollback:
+            table_types = ([table_type for table_type in table_types if table_type != 'combined_analysis']
+                           + self.indicator_store.previous_table_types())
+        if not self.postgres_handler.connect():
+            raise ConnectionError("Failed to connect to PostgreSQL")
+            
+        try:
+            with self.postgres_handler.engine.connect() as conn:
+                transaction = conn.begin()
+                if not (self.postgres_handler.rollback_tables(
+                            [POSTGRES_CONFIG['tables'].get(table_type, table_type) for table_type in table_types],
+                            conn=conn)
+                        and (not long_rollback or self.indicator_store.rebuild_view(conn))):
+                    transaction.rollback()
+                    return False
+                transaction.commit()
+            return True
+        finally:
+            self.postgres_handler.disconnect()
+            
+    def read_loaded_tables(self, table_types: List[str], countries: List[str] = None) -> Dict[str, pd.DataFrame]:
+        # With countries, only their rows are read; the frames still carry every
+        # column, which is all an incremental transform needs of the rest
+        if not self.postgres_handler.connect():
+            raise ConnectionError("Failed to connect to PostgreSQL")
+            
+        try:
+            tables = {}
+            for table_type in table_types:
+                table_name = POSTGRES_CONFIG['tables'].get(table_type, table_type)
+                df = None
+                if table_type == 'combined_analysis':
+                    df = read_combined_analysis(self.postgres_handler, countries)
+                elif self.postgres_handler.table_exists(table_name):
+                    df = self.postgres_handler.read_countries(table_name, countries)
+                tables[table_type] = enforce_schema(df) if df is not None else pd.DataFrame()
+            return tables
+            
+        finally:
+            self.postgres_handler.disconnect()
 
 def main():
     from src.etl.extract import DataExtractor
-    from src.etl.transform import DataTransformer
+    from src.etl.transform import create_transformer
     
     extractor = DataExtractor()
     raw_data = extractor.extract_all_raw_data()
     
-    transformer = DataTransformer()
+    transformer = create_transformer()
     combined_df, separate_tables = transformer.transform_all_data(raw_data)
     
     loader = DataLoader()
     
-    logger.info("Loading data to PostgreSQL...")
-    success = loader.load_to_postgres(separate_tables)
+    logger.info("Loading data and the countries reference table to PostgreSQL...")
+    success = loader.load_to_postgres({**separate_tables, 'countries': loader.countries_frame(combined_df)})
     
     if success:
-        logger.info("Creating countries reference table...")
-        loader.create_countries_table(combined_df)
-        
         logger.info("Verifying data load...")
         record_counts = loader.verify_load()
         
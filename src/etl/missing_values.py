@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import logging
+from typing import Dict, List, Tuple, Any
+from config.database_config import ETL_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FILL_METHODS = ('ffill_bfill', 'ffill', 'bfill', 'linear', 'none')
+
+class MissingValueFiller:
+    
+    def __init__(self, strategies: Dict[str, Dict[str, Any]] = None, default: Dict[str, Any] = None,
+                 group_col: str = 'country_code', order_col: str = 'year'):
+        self.default = default or {'method': ETL_CONFIG['fill_method'],
+                                   'max_gap': ETL_CONFIG['fill_max_gap']}
+        self.strategies = strategies or {}
+        self.group_col = group_col
+        self.order_col = order_col
+        
+        for strategy in [self.default] + list(self.strategies.values()):
+            if strategy.get('method') not in FILL_METHODS:
+                raise ValueError(f"Unknown fill method {strategy.get('method')!r}, expected one of {FILL_METHODS}")
+                
+    def strategy_for(self, column: str) -> Tuple[str, Any]:
+        strategy = {**self.default, **self.strategies.get(column, {})}
+        return strategy['method'], strategy.get('max_gap')
+        
+    def _fill_group(self, df: pd.DataFrame, columns: List[str], method: str, max_gap: int) -> pd.DataFrame:
+        values = df[columns]
+        missing = values.isna()
+        
+        years = df[self.order_col].to_numpy(dtype=np.float64)
+        year_frame = pd.DataFrame(np.broadcast_to(years[:, None], values.shape),
+                                  index=values.index, columns=columns)
+        valid_years = year_frame.where(~missing)
+        
+        keys = df[self.group_col]
+        grouped = lambda frame: frame.groupby(keys, observed=True, sort=False)
+        
+        forward = method in ('ffill', 'ffill_bfill', 'linear')
+        backward = method in ('bfill', 'ffill_bfill', 'linear')
+        if forward:
+            prev_values = grouped(values).ffill()
+            prev_years = grouped(valid_years).ffill()
+        if backward:
+            next_values = grouped(values).bfill()
+            next_years = grouped(valid_years).bfill()
+            
+        if method == 'linear':
+            span = next_years - prev_years
+            interpolated = prev_values + (next_values - prev_values) * (year_frame - prev_years) / span
+            fillable = missing & interpolated.notna()
+            if max_gap is not None:
+                fillable &= (span - 1) <= max_gap
+            return values.mask(fillable, interpolated)
+            
+        result = values
+        if forward:
+            fillable = missing & prev_values.notna()
+            if max_gap is not None:
+                fillable &= (year_frame - prev_years) <= max_gap
+            result = result.mask(fillable, prev_values)
+        if backward:
+            fillable = result.isna() & next_values.notna()
+            if max_gap is not None:
+                fillable &= (next_years - year_frame) <= max_gap
+            result = result.mask(fillable, next_values)
+        return result
+        
+    def fill(self, df: pd.DataFrame, columns: List[str] = None) -> Tuple[pd.DataFrame, Dict[str, Dict[str, Any]]]:
+        if columns is None:
+            columns = [col for col in df.select_dtypes(include=[np.number]).columns
+                       if col != self.order_col]
+        
+        # Shallow copy: filled columns are swapped in without copying the others
+        df_filled = df.copy(deep=False)
+        report = {}
+        
+        by_strategy = {}
+        for col in columns:
+            by_strategy.setdefault(self.strategy_for(col), []).append(col)
+            
+        for (method, max_gap), cols in by_strategy.items():
+            missing_before = df[cols].isna().sum()
+            
+            if method != 'none' and missing_before.any():
+                df_filled[cols] = self._fill_group(df, cols, method, max_gap)
+                
+            missing_after = df_filled[cols].isna().sum()
+            for col in cols:
+                report[col] = {
+                    'method': method,
+                    'max_gap': max_gap,
+                    'missing_before': int(missing_before[col]),
+                    'filled': int(missing_before[col] - missing_after[col]),
+                    'missing_after': int(missing_after[col])
+                }
+                
+        return df_filled, report
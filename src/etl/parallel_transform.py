@@ -0,0 +1,162 @@
+import pandas as pd
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple, Any
+from src.etl.transform import DataTransformer, create_transformer
+from src.etl.schema import enforce_schema
+from src.etl.instrumentation import record_stages, merge_stages
+from config.database_config import ETL_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def transform_country_group(countries: List[str], catalog: Dict[str, List[str]],
+                            fill_strategies: Dict[str, Dict[str, Any]] = None,
+                            raw_data: Dict[str, pd.DataFrame] = None) -> Tuple[Dict[str, pd.DataFrame], List[Dict[str, Any]]]:
+    # Runs in a worker process; without raw_data the worker reads its own
+    # countries from MongoDB so only one partition is ever held per process.
+    # The worker's stages come back with its tables for the parent's run report
+    return record_stages(_transform_country_group, countries, catalog, fill_strategies, raw_data)
+
+def _transform_country_group(countries: List[str], catalog: Dict[str, List[str]],
+                             fill_strategies: Dict[str, Dict[str, Any]],
+                             raw_data: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    if raw_data is None:
+        from src.etl.extract import DataExtractor
+        raw_data = DataExtractor().extract_all_raw_data(countries=countries)
+        
+    transformer = create_transformer(fill_strategies=fill_strategies)
+    _, tables = transformer.transform_partition(raw_data, catalog, countries)
+    return tables
+
+class PartitionedTransformer:
+    
+    def __init__(self, fill_strategies: Dict[str, Dict[str, Any]] = None, max_workers: int = None,
+                 partition_size: int = None):
+        self.fill_strategies = fill_strategies
+        self.max_workers = max_workers or ETL_CONFIG['transform_workers']
+        self.partition_size = partition_size or ETL_CONFIG['transform_partition_size']
+        self.country_names = []
+        
+    def plan_partitions(self, countries: List[str]) -> List[List[str]]:
+        countries = sorted(countries)
+        return [countries[i:i + self.partition_size]
+                for i in range(0, len(countries), self.partition_size)]
+                
+    @staticmethod
+    def _country_column(df: pd.DataFrame) -> str:
+        return 'countryiso3code' if 'countryiso3code' in df.columns else 'country_code'
+        
+    def countries_from_raw(self, raw_data: Dict[str, pd.DataFrame]) -> List[str]:
+        countries = set()
+        for df in raw_data.values():
+            if not df.empty:
+                countries.update(pd.unique(df[self._country_column(df)].dropna()))
+        return sorted(countries)
+        
+    def catalog_from_raw(self, raw_data: Dict[str, pd.DataFrame]) -> Dict[str, List[str]]:
+        catalog = {}
+        for data_type, df in raw_data.items():
+            if df.empty:
+                continue
+            if 'countryiso3code' in df.columns:
+                observed = pd.to_numeric(df['value'], errors='coerce').notna()
+            else:
+                observed = df['metric_value'].notna()
+            catalog[data_type] = sorted(pd.unique(df.loc[observed, 'indicator_name']))
+        return catalog
+        
+    def split_raw_data(self, raw_data: Dict[str, pd.DataFrame], countries: List[str]) -> Dict[str, pd.DataFrame]:
+        return {
+            data_type: df[df[self._country_column(df)].isin(countries)] if not df.empty else df
+            for data_type, df in raw_data.items()
+        }
+        
+    def iter_partitions(self, raw_data: Dict[str, pd.DataFrame] = None) -> Iterator[Dict[str, pd.DataFrame]]:
+        if raw_data is None:
+            from src.etl.extract import DataExtractor
+            extractor = DataExtractor()
+            countries = extractor.list_countries()
+            raw_catalog = extractor.indicator_catalog()
+        else:
+            countries = self.countries_from_raw(raw_data)
+            raw_catalog = self.catalog_from_raw(raw_data)
+            
+        # Every partition pivots against the full catalog, so all of them share
+        # the same wide columns and the same row-drop threshold
+        catalog = {
+            DataTransformer.DATASET_PREFIXES[data_type]: names
+            for data_type, names in raw_catalog.items()
+            if data_type in DataTransformer.DATASET_PREFIXES and names
+        }
+        partitions = self.plan_partitions(countries)
+        logger.info(f"Transforming {len(countries)} countries as {len(partitions)} partitions "
+                    f"on {self.max_workers} processes...")
+                    
+        self.country_names = []
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            # Keep at most one partition per worker in flight and yield in plan order,
+            # so memory stays bounded and the merged output is deterministic
+            pending = deque()
+            for group in partitions:
+                group_data = self.split_raw_data(raw_data, group) if raw_data is not None else None
+                pending.append(executor.submit(transform_country_group, group, catalog,
+                                               self.fill_strategies, group_data))
+                if len(pending) >= self.max_workers:
+                    yield self._collect(pending.popleft().result())
+                    
+            while pending:
+                yield self._collect(pending.popleft().result())
+                
+    def _collect(self, result: Tuple[Dict[str, pd.DataFrame], List[Dict[str, Any]]]) -> Dict[str, pd.DataFrame]:
+        tables, stages = result
+        merge_stages(stages)
+        combined = tables.get('combined_analysis')
+        if combined is not None and not combined.empty:
+            self.country_names.append(combined[['country_code', 'country_name']].drop_duplicates())
+        return tables
+        
+    def country_index(self) -> pd.DataFrame:
+        if not self.country_names:
+            return pd.DataFrame(columns=['country_code', 'country_name'])
+        return enforce_schema(pd.concat(self.country_names, ignore_index=True).drop_duplicates())
+        
+    def merge_partitions(self, partitions: Iterator[Dict[str, pd.DataFrame]]) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        frames = {}
+        for tables in partitions:
+            for table_name, df in tables.items():
+                if df is not None and not df.empty:
+                    frames.setdefault(table_name, []).append(df)
+                    
+        sort_keys = {table_name: ['year', 'country_code'] for table_name in DataTransformer.TABLE_NAMES.values()}
+        sort_keys['combined_analysis'] = ['country_code', 'year']
+        
+        separate_tables = {}
+        for table_name, sort_by in sort_keys.items():
+            if table_name not in frames:
+                separate_tables[table_name] = pd.DataFrame()
+                continue
+            merged = pd.concat(frames.pop(table_name), ignore_index=True)
+            merged = merged.sort_values(sort_by, kind='stable').reset_index(drop=True)
+            separate_tables[table_name] = enforce_schema(merged)
+            
+        combined = separate_tables['combined_analysis']
+        logger.info(f"Merged partitions: {combined.shape}")
+        return combined, separate_tables
+        
+    def transform_all_data(self, raw_data: Dict[str, pd.DataFrame] = None) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        return self.merge_partitions(self.iter_partitions(raw_data))
+
+def main():
+    transformer = PartitionedTransformer()
+    combined_df, separate_tables = transformer.transform_all_data()
+    
+    logger.info(f"Final combined dataset: {combined_df.shape}")
+    for table_name, df in separate_tables.items():
+        logger.info(f"{table_name}: {df.shape}")
+        
+    return combined_df, separate_tables
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 import logging
 import sys
 import os
+from typing import List
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
 from src.etl.extract import DataExtractor
-from src.etl.transform import DataTransformer
+from src.etl.transform import create_transformer
 from src.etl.load import DataLoader
+from src.etl.parallel_transform import PartitionedTransformer
+from src.etl.instrumentation import profile_run
+from config.database_config import ETL_CONFIG
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,52 +18,94 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_etl_pipeline():
-    logger.info("=" * 80)
-    logger.info("STARTING ETL PIPELINE - 2 DATASETS")
-    logger.info("Dataset 1: Climate & Energy (Climate + Renewable combined)")
-    logger.info("Dataset 2: Economic Development")
-    logger.info("=" * 80)
+def run_parallel_etl_pipeline():
+    logger.info("\n[STEP 1-3/3] EXTRACT, TRANSFORM, LOAD - Country partitions on a process pool...")
+    transformer = PartitionedTransformer()
+    loader = DataLoader()
     
-    try:
-        logger.info("\n[STEP 1/3] EXTRACT - Reading data from MongoDB...")
-        extractor = DataExtractor()
-        raw_data = extractor.extract_all_raw_data()
-        
-        total_records = sum(len(df) for df in raw_data.values())
-        logger.info(f"Extracted total of {total_records} raw records")
-        
-        logger.info("\n[STEP 2/3] TRANSFORM - Cleaning and transforming data...")
-        transformer = DataTransformer()
-        combined_df, separate_tables = transformer.transform_all_data(raw_data)
-        
-        logger.info(f"Transformed data shape: {combined_df.shape}")
-        logger.info(f"Number of tables: {len(separate_tables)}")
-        
-        logger.info("\n[STEP 3/3] LOAD - Loading data to PostgreSQL...")
-        loader = DataLoader()
-        success = loader.load_to_postgres(separate_tables)
+    # Each worker extracts and transforms its own countries; partitions are
+    # loaded as they arrive and swapped in together with the countries table
+    return loader.load_partitions(transformer.iter_partitions(), country_index=transformer.country_index)
+
+def run_etl_pipeline(changed_countries: List[str] = None, parallel: bool = None):
+    with profile_run('etl_pipeline'):
+        logger.info("=" * 80)
+        logger.info("STARTING ETL PIPELINE - 2 DATASETS")
+        logger.info("Dataset 1: Climate & Energy (Climate + Renewable combined)")
+        logger.info("Dataset 2: Economic Development")
+        logger.info("=" * 80)
         
-        if success:
-            loader.create_countries_table(combined_df)
+        if parallel is None:
+            parallel = ETL_CONFIG['parallel_transform']
+            
+        try:
+            if parallel and not changed_countries:
+                if not run_parallel_etl_pipeline():
+                    raise Exception("Data loading failed")
+                record_counts = DataLoader().verify_load()
+                logger.info("ETL PIPELINE COMPLETED SUCCESSFULLY")
+                for table, count in record_counts.items():
+                    logger.info(f"  {table}: {count:,} records")
+                return
+                
+            logger.info("\n[STEP 1/3] EXTRACT - Reading data from MongoDB...")
+            extractor = DataExtractor()
+            raw_data = extractor.extract_all_raw_data(countries=changed_countries)
             
-            logger.info("\nVerifying data load...")
-            record_counts = loader.verify_load()
+            total_records = sum(len(df) for df in raw_data.values())
+            logger.info(f"Extracted total of {total_records} raw records")
             
-            logger.info("\n" + "=" * 80)
-            logger.info("ETL PIPELINE COMPLETED SUCCESSFULLY")
-            logger.info("=" * 80)
-            logger.info("\nFinal Record Counts:")
-            for table, count in record_counts.items():
-                logger.info(f"  {table}: {count:,} records")
-        else:
-            raise Exception("Data loading failed")
+            logger.info("\n[STEP 2/3] TRANSFORM - Cleaning and transforming data...")
+            transformer = create_transformer()
+            loader = DataLoader()
+            if changed_countries:
+                # Recompute only the changed countries: just their rows (and every
+                # table's columns) are read back, and the result is upserted below
+                table_types = list(transformer.TABLE_NAMES.values()) + ['combined_analysis']
+                previous_tables = loader.read_loaded_tables(table_types, countries=changed_countries)
+                combined_df, separate_tables = transformer.transform_incremental(
+                    raw_data, previous_tables, transformer.series_keys(raw_data)
+                )
+            else:
+                combined_df, separate_tables = transformer.transform_all_data(raw_data)
+                
+            logger.info(f"Transformed data shape: {combined_df.shape}")
+            logger.info(f"Number of tables: {len(separate_tables)}")
             
-    except Exception as e:
-        logger.error(f"ETL Pipeline failed: {e}")
-        sys.exit(1)
+            logger.info("\n[STEP 3/3] LOAD - Loading data to PostgreSQL...")
+            tables = {**separate_tables, 'countries': loader.countries_frame(combined_df)}
+            if changed_countries:
+                success = loader.load_to_postgres(tables, mode='upsert', countries=changed_countries)
+            else:
+                success = loader.load_to_postgres(tables)
+                
+            if success:
+                logger.info("\nVerifying data load...")
+                record_counts = loader.verify_load()
+                
+                logger.info("\n" + "=" * 80)
+                logger.info("ETL PIPELINE COMPLETED SUCCESSFULLY")
+                logger.info("=" * 80)
+                logger.info("\nFinal Record Counts:")
+                for table, count in record_counts.items():
+                    logger.info(f"  {table}: {count:,} records")
+            else:
+                raise Exception("Data loading failed")
+                
+        except Exception as e:
+            logger.error(f"ETL Pipeline failed: {e}")
+            sys.exit(1)
+
+def parse_changed_countries(argv: List[str]) -> List[str]:
+    # --changed-countries USA,CHN transforms only those countries' series
+    if '--changed-countries' not in argv:
+        return None
+    index = argv.index('--changed-countries')
+    if index + 1 >= len(argv):
+        return None
+    return [code.strip().upper() for code in argv[index + 1].split(',') if code.strip()]
 
 if __name__ == "__main__":
-    run_etl_pipeline()
+    run_etl_pipeline(parse_changed_countries(sys.argv), parallel=True if '--parallel' in sys.argv else None)
 
 
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import logging
+from typing import Dict, Any, Optional
+from sqlalchemy.types import SmallInteger, String, REAL, Double, TypeEngine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RENEWABLE_ADOPTION_LEVELS = ['Low', 'Medium', 'High', 'Very High']
+INCOME_LEVELS = ['Low Income', 'Lower Middle', 'Upper Middle', 'High Income']
+
+def _column(dtype: Any, sql_type: TypeEngine) -> Dict[str, Any]:
+    return {'dtype': dtype, 'sql_type': sql_type}
+
+# float32 keeps ~7 significant digits, which covers percentages, ratios and per-capita
+# values; national totals (kt, USD, people, kWh) stay float64
+COLUMN_SCHEMA = {
+    'year': _column(np.int16, SmallInteger()),
+    'country_code': _column('category', String(3)),
+    'country_name': _column('category', String(100)),
+    
+    'climate_co2_emissions': _column(np.float64, Double()),
+    'climate_co2_per_capita': _column(np.float32, REAL()),
+    'climate_energy_use': _column(np.float32, REAL()),
+    'climate_fossil_fuel_consumption': _column(np.float32, REAL()),
+    'climate_methane_emissions': _column(np.float64, Double()),
+    'climate_nitrous_oxide_emissions': _column(np.float64, Double()),
+    
+    'economic_gdp_current_usd': _column(np.float64, Double()),
+    'economic_gdp_per_capita': _column(np.float32, REAL()),
+    'economic_gdp_growth': _column(np.float32, REAL()),
+    'economic_population': _column(np.float64, Double()),
+    'economic_urban_population_pct': _column(np.float32, REAL()),
+    'economic_industry_value_added_pct': _column(np.float32, REAL()),
+    'economic_services_value_added_pct': _column(np.float32, REAL()),
+    'economic_exports_goods_services_pct': _column(np.float32, REAL()),
+    
+    'renewable_renewable_energy_consumption_pct': _column(np.float32, REAL()),
+    'renewable_renewable_electricity_output_pct': _column(np.float32, REAL()),
+    'renewable_alternative_nuclear_energy_pct': _column(np.float32, REAL()),
+    'renewable_electricity_production_renewable': _column(np.float64, Double()),
+    'renewable_combustible_renewables_waste_pct': _column(np.float32, REAL()),
+    'renewable_electric_power_consumption_kwh': _column(np.float32, REAL()),
+    
+    'co2_per_gdp': _column(np.float32, REAL()),
+    'climate_co2_emissions_yoy_pct': _column(np.float32, REAL()),
+    'economic_gdp_current_usd_yoy_pct': _column(np.float32, REAL()),
+    'co2_per_gdp_yoy_pct': _column(np.float32, REAL()),
+    'climate_co2_per_capita_rolling_5': _column(np.float32, REAL()),
+    'renewable_renewable_energy_consumption_pct_rolling_5': _column(np.float32, REAL()),
+    'renewable_electricity_production_renewable_per_capita': _column(np.float32, REAL()),
+    'renewable_adoption_category': _column(
+        pd.CategoricalDtype(RENEWABLE_ADOPTION_LEVELS, ordered=True), String(16)
+    ),
+    'gdp_per_capita_category': _column(
+        pd.CategoricalDtype(INCOME_LEVELS, ordered=True), String(16)
+    )
+}
+
+def column_schema(column: str) -> Optional[Dict[str, Any]]:
+    return COLUMN_SCHEMA.get(column)
+
+def enforce_schema(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return df
+        
+    casts = {}
+    for col in df.columns:
+        schema = column_schema(col)
+        if schema is not None and df[col].dtype != schema['dtype']:
+            casts[col] = schema['dtype']
+            
+    if not casts:
+        return df
+        
+    before = df.memory_usage(deep=True).sum()
+    df = df.astype(casts, copy=False)
+    logger.debug(f"Applied schema to {len(casts)} columns: {before / 1e6:.2f} MB -> "
+                 f"{df.memory_usage(deep=True).sum() / 1e6:.2f} MB")
+    return df
+
+def sql_types(df: pd.DataFrame) -> Dict[str, TypeEngine]:
+    return {col: COLUMN_SCHEMA[col]['sql_type'] for col in df.columns if col in COLUMN_SCHEMA}
@@ -1,82 +1,193 @@
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
 import logging
-from typing import Dict, Tuple
+from typing import Dict, Tuple, Any, Iterable, List, Hashable
+from src.etl.missing_values import MissingValueFiller
+from src.etl.schema import enforce_schema
+from src.etl.features import FeatureEngine
+from src.etl.instrumentation import instrumented
+from config.database_config import ETL_CONFIG
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DataTransformer:
     
-    def clean_world_bank_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        if df.empty:
-            return df
-            
-        df_clean = df.copy()
-        
-        df_clean['year'] = df_clean['date'].astype(int)
-        df_clean['country_code'] = df_clean['countryiso3code']
-        df_clean['country_name'] = df_clean['country'].apply(lambda x: x.get('value') if isinstance(x, dict) else x)
-        df_clean['indicator_id'] = df_clean['indicator'].apply(lambda x: x.get('id') if isinstance(x, dict) else None)
-        df_clean['metric_value'] = pd.to_numeric(df_clean['value'], errors='coerce')
+    DATASET_PREFIXES = {
+        'climate_raw': 'climate',
+        'economic_raw': 'economic',
+        'renewable_raw': 'renewable'
+    }
+    
+    TABLE_NAMES = {
+        'climate': 'climate_indicators',
+        'economic': 'economic_indicators',
+        'renewable': 'renewable_energy'
+    }
+    
+    KEY_COLUMNS = ['year', 'country_code', 'country_name']
+    
+    CLEAN_COLUMNS = ['year', 'country_code', 'country_name', 'indicator_name',
+                     'indicator_id', 'metric_value']
+    
+    def __init__(self, fill_strategies: Dict[str, Dict[str, Any]] = None):
+        self.filler = MissingValueFiller(fill_strategies)
+        self.fill_report = {}
+        self.feature_engine = FeatureEngine()
         
-        columns_to_keep = ['year', 'country_code', 'country_name', 'indicator_name', 
-                          'indicator_id', 'metric_value']
-        df_clean = df_clean[columns_to_keep]
+    @staticmethod
+    def _lookup_per_key(keys: pd.Series, nested: pd.Series, field: str) -> Dict:
+        # The nested dicts are identical for every row of a key, so read one row per key
+        first = ~keys.duplicated()
+        return {
+            key: value.get(field) if isinstance(value, dict) else value
+            for key, value in zip(keys[first], nested[first])
+        }
         
-        df_clean = df_clean.dropna(subset=['metric_value'])
+    @staticmethod
+    def _parse_years(dates: pd.Series) -> np.ndarray:
+        # Only a few dozen distinct year strings, so parse the uniques and scatter back
+        codes, uniques = pd.factorize(dates)
+        return np.asarray(pd.to_numeric(uniques), dtype=np.int16)[codes]
         
-        df_clean = df_clean.drop_duplicates(subset=['year', 'country_code', 'indicator_name'])
+    @staticmethod
+    def _categorical_from_lookup(keys: pd.Categorical, lookup: Dict) -> pd.Categorical:
+        mapped = [lookup.get(key) for key in keys.categories]
+        mapped_codes, mapped_categories = pd.factorize(np.array(mapped, dtype=object), sort=True)
+        codes = np.where(keys.codes >= 0, mapped_codes[keys.codes], -1)
+        return pd.Categorical.from_codes(codes, categories=mapped_categories)
         
-        logger.info(f"Cleaned data: {len(df_clean)} records remaining")
-        return df_clean
-        
-    def pivot_indicators(self, df: pd.DataFrame, prefix: str) -> pd.DataFrame:
+    @instrumented('transform.clean_world_bank_data')
+    def clean_world_bank_data(self, df: pd.DataFrame) -> pd.DataFrame:
         if df.empty:
             return df
             
-        pivot_df = df.pivot_table(
-            index=['year', 'country_code', 'country_name'],
-            columns='indicator_name',
-            values='metric_value',
-            aggfunc='first'
-        ).reset_index()
-        
-        pivot_df.columns.name = None
+        if 'countryiso3code' not in df.columns and 'metric_value' in df.columns:
+            # Already decoded from the bucketed raw layout or the columnar extractor
+            keep = df['metric_value'].notna().to_numpy()
+            df_clean = pd.DataFrame({
+                col: df[col].to_numpy()[keep] if col in ('year', 'metric_value')
+                else pd.Categorical(df[col])[keep]
+                for col in self.CLEAN_COLUMNS
+            })
+        else:
+            metric_value = pd.to_numeric(df['value'], errors='coerce')
+            keep = metric_value.notna().to_numpy()
+            
+            codes = df['countryiso3code'][keep]
+            indicator_names = df['indicator_name'][keep]
+            
+            # Extracted chunks may already be categorical, with codes only dropped rows used
+            country_code = pd.Categorical(codes).remove_unused_categories()
+            indicator_name = pd.Categorical(indicator_names).remove_unused_categories()
+            
+            df_clean = pd.DataFrame({
+                'year': self._parse_years(df['date'][keep]),
+                'country_code': country_code,
+                'country_name': self._categorical_from_lookup(
+                    country_code, self._lookup_per_key(codes, df['country'][keep], 'value')
+                ),
+                'indicator_name': indicator_name,
+                'indicator_id': self._categorical_from_lookup(
+                    indicator_name, self._lookup_per_key(indicator_names, df['indicator'][keep], 'id')
+                ),
+                'metric_value': metric_value.to_numpy()[keep]
+            })
+            
+        duplicated = df_clean.duplicated(subset=['year', 'country_code', 'indicator_name']).to_numpy()
+        if duplicated.any():
+            df_clean = df_clean[~duplicated].reset_index(drop=True)
+            
+        logger.info(f"Cleaned data: {len(df_clean)} records remaining")
+        return df_clean
         
-        indicator_cols = [col for col in pivot_df.columns 
-                         if col not in ['year', 'country_code', 'country_name']]
-        rename_dict = {col: f"{prefix}_{col}" for col in indicator_cols}
-        pivot_df = pivot_df.rename(columns=rename_dict)
+    @instrumented('transform.assemble_wide_tables')
+    def assemble_wide_tables(self, cleaned: Dict[str, pd.DataFrame],
+                             catalog: Dict[str, List[str]] = None) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        # catalog pins the indicator columns per dataset, so a partition of the
+        # countries comes out with the same wide columns as the full run
+        catalog = catalog or {}
+        parts = [(prefix, df) for prefix, df in cleaned.items() if not df.empty]
+        tables = {prefix: pd.DataFrame() for prefix in cleaned}
+        if not parts:
+            return pd.DataFrame(), tables
+            
+        columns, column_codes, dataset_columns = [], [], {}
+        for prefix, df in parts:
+            names = sorted(set(pd.unique(np.asarray(df['indicator_name'], dtype=object)))
+                           | set(catalog.get(prefix, [])))
+            offset = len(columns)
+            column_codes.append(pd.Categorical(df['indicator_name'], categories=names).codes + offset)
+            dataset_columns[prefix] = [f"{prefix}_{name}" for name in names]
+            columns += dataset_columns[prefix]
+            
+        country = union_categoricals([pd.Categorical(df['country_code']) for _, df in parts],
+                                     sort_categories=True)
+        country_name = union_categoricals([pd.Categorical(df['country_name']) for _, df in parts],
+                                          sort_categories=True)
+        years = np.concatenate([df['year'].to_numpy(dtype=np.int64) for _, df in parts])
+        values = np.concatenate([df['metric_value'].to_numpy(dtype=np.float64) for _, df in parts])
+        column_idx = np.concatenate(column_codes)
+        dataset_idx = np.repeat(np.arange(len(parts)), [len(df) for _, df in parts])
         
-        logger.info(f"Pivoted {prefix} data: {pivot_df.shape}")
-        return pivot_df
+        # One row per (country, year), already in (country_code, year) order
+        min_year = years.min()
+        span = years.max() - min_year + 1
+        row_idx, row_keys = pd.factorize(country.codes.astype(np.int64) * span + (years - min_year), sort=True)
+        row_country = (row_keys // span).astype(country.codes.dtype)
+        row_year = (row_keys % span + min_year).astype(np.int16)
         
-    def merge_datasets(self, climate_df: pd.DataFrame, economic_df: pd.DataFrame, 
-                      renewable_df: pd.DataFrame) -> pd.DataFrame:
-        merge_keys = ['year', 'country_code', 'country_name']
+        wide = np.full((len(row_keys), len(columns)), np.nan)
+        wide[row_idx, column_idx] = values
+        present = np.zeros((len(row_keys), len(parts)), dtype=bool)
+        present[row_idx, dataset_idx] = True
         
-        combined_df = climate_df.merge(economic_df, on=merge_keys, how='outer')
-        combined_df = combined_df.merge(renewable_df, on=merge_keys, how='outer')
+        codes, first_rows = np.unique(country.codes, return_index=True)
+        name_codes = np.full(len(country.categories), -1, dtype=country_name.codes.dtype)
+        name_codes[codes] = country_name.codes[first_rows]
         
-        combined_df = combined_df.sort_values(['country_code', 'year'])
+        keys = pd.DataFrame({
+            'year': row_year,
+            'country_code': pd.Categorical.from_codes(row_country, categories=country.categories),
+            'country_name': pd.Categorical.from_codes(name_codes[row_country],
+                                                      categories=country_name.categories)
+        })
+        combined = pd.concat([keys, pd.DataFrame(wide, columns=columns)], axis=1)
         
-        logger.info(f"Merged dataset: {combined_df.shape}")
-        return combined_df
+        # Datasets absent from this partition still contribute their (empty) columns
+        for prefix, names in catalog.items():
+            if prefix not in dataset_columns:
+                for name in names:
+                    combined[f"{prefix}_{name}"] = np.nan
+                    
+        for k, (prefix, _) in enumerate(parts):
+            rows = np.flatnonzero(present[:, k])
+            rows = rows[np.lexsort((row_country[rows], row_year[rows]))]
+            table = combined.iloc[rows][self.KEY_COLUMNS + dataset_columns[prefix]]
+            tables[prefix] = table.reset_index(drop=True)
+            logger.info(f"Pivoted {prefix} data: {tables[prefix].shape}")
+            
+        logger.info(f"Merged dataset: {combined.shape}")
+        return combined, tables
         
+    @instrumented('transform.handle_missing_values')
     def handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
-        df_filled = df.copy()
-        
-        numeric_cols = df_filled.select_dtypes(include=[np.number]).columns
+        numeric_cols = df.select_dtypes(include=[np.number]).columns
         
         for col in numeric_cols:
-            missing_pct = df_filled[col].isnull().sum() / len(df_filled) * 100
+            missing_pct = df[col].isnull().sum() / len(df) * 100
             if missing_pct > 0:
                 logger.info(f"{col}: {missing_pct:.2f}% missing")
+                
+        df_filled, self.fill_report = self.filler.fill(df)
         
-        df_filled = df_filled.groupby('country_code').apply(
-            lambda group: group.fillna(method='ffill').fillna(method='bfill')
-        ).reset_index(drop=True)
+        for col, stats in self.fill_report.items():
+            if stats['filled']:
+                logger.info(f"{col}: filled {stats['filled']} of {stats['missing_before']} missing "
+                            f"({stats['method']}, max_gap={stats['max_gap']})")
+                            
+        df_filled = df_filled.reset_index(drop=True)
         
         threshold = 0.5
         df_filled = df_filled.dropna(thresh=int(threshold * len(df_filled.columns)))
@@ -84,66 +195,146 @@ class DataTransformer:
         logger.info(f"After handling missing values: {df_filled.shape}")
         return df_filled
         
-    def create_derived_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        df_features = df.copy()
+    @instrumented('transform.create_derived_features')
+    def create_derived_features(self, df: pd.DataFrame, features: List[str] = None,
+                                version: Hashable = None) -> pd.DataFrame:
+        df_features = self.feature_engine.add_features(df, features, version)
         
-        if 'climate_co2_emissions' in df_features.columns and 'economic_gdp_current_usd' in df_features.columns:
-            df_features['co2_per_gdp'] = (
-                df_features['climate_co2_emissions'] / 
-                (df_features['economic_gdp_current_usd'] / 1e9)
-            )
-            
-        if 'renewable_renewable_energy_consumption_pct' in df_features.columns:
-            df_features['renewable_adoption_category'] = pd.cut(
-                df_features['renewable_renewable_energy_consumption_pct'],
-                bins=[0, 20, 40, 60, 100],
-                labels=['Low', 'Medium', 'High', 'Very High']
-            )
-            
-        if 'economic_gdp_per_capita' in df_features.columns:
-            df_features['gdp_per_capita_category'] = pd.cut(
-                df_features['economic_gdp_per_capita'],
-                bins=[0, 5000, 15000, 40000, np.inf],
-                labels=['Low Income', 'Lower Middle', 'Upper Middle', 'High Income']
-            )
-            
         logger.info(f"Created derived features: {df_features.shape}")
         return df_features
         
+    def transform_partition(self, raw_data: Dict[str, pd.DataFrame], catalog: Dict[str, List[str]] = None,
+                            countries: List[str] = None) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        cleaned = {}
+        for data_type, prefix in self.DATASET_PREFIXES.items():
+            df = self.clean_world_bank_data(raw_data.get(data_type, pd.DataFrame()))
+            if countries is not None and not df.empty:
+                df = df[df['country_code'].isin(countries)]
+                for col in ['country_code', 'country_name']:
+                    df[col] = df[col].cat.remove_unused_categories()
+            cleaned[prefix] = df
+            
+        combined, pivots = self.assemble_wide_tables(cleaned, catalog)
+        
+        if not combined.empty:
+            combined = self.handle_missing_values(combined)
+            combined = enforce_schema(self.create_derived_features(combined))
+            
+        separate_tables = {
+            table_name: enforce_schema(pivots[prefix])
+            for prefix, table_name in self.TABLE_NAMES.items()
+        }
+        separate_tables['combined_analysis'] = combined
+        return combined, separate_tables
+        
+    @instrumented('transform.transform_all_data')
     def transform_all_data(self, raw_data: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
         logger.info("Starting data transformation...")
         
-        climate_clean = self.clean_world_bank_data(raw_data.get('climate_raw', pd.DataFrame()))
-        economic_clean = self.clean_world_bank_data(raw_data.get('economic_raw', pd.DataFrame()))
-        renewable_clean = self.clean_world_bank_data(raw_data.get('renewable_raw', pd.DataFrame()))
+        combined, separate_tables = self.transform_partition(raw_data)
+        
+        logger.info("Data transformation completed successfully")
+        return combined, separate_tables
         
-        climate_pivot = self.pivot_indicators(climate_clean, 'climate')
-        economic_pivot = self.pivot_indicators(economic_clean, 'economic')
-        renewable_pivot = self.pivot_indicators(renewable_clean, 'renewable')
+    def indicator_catalog(self, tables: Dict[str, pd.DataFrame]) -> Dict[str, List[str]]:
+        catalog = {}
+        for prefix, table_name in self.TABLE_NAMES.items():
+            df = tables.get(table_name)
+            if df is None or df.empty:
+                continue
+            catalog[prefix] = [col[len(prefix) + 1:] for col in df.columns
+                               if col not in self.KEY_COLUMNS]
+        return catalog
         
-        combined = self.merge_datasets(climate_pivot, economic_pivot, renewable_pivot)
+    @staticmethod
+    def _patch_table(previous: pd.DataFrame, partition: pd.DataFrame, countries: List[str],
+                     sort_by: List[str]) -> pd.DataFrame:
+        if previous is None or previous.empty:
+            kept = []
+        else:
+            kept = [previous[~previous['country_code'].isin(countries)]]
+        frames = [df for df in kept + [partition] if df is not None and not df.empty]
+        if not frames:
+            return pd.DataFrame()
+            
+        patched = pd.concat(frames, ignore_index=True)
+        patched = patched.sort_values(sort_by, kind='stable').reset_index(drop=True)
+        return enforce_schema(patched)
         
-        combined = self.handle_missing_values(combined)
+    @staticmethod
+    def series_keys(raw_data: Dict[str, pd.DataFrame]) -> List[Tuple[str, str]]:
+        # The (indicator code, country) series in extracted raw data, as
+        # transform_incremental takes them
+        keys = set()
+        for df in raw_data.values():
+            if df is None or df.empty:
+                continue
+            if 'countryiso3code' in df.columns:
+                pairs = pd.DataFrame({'indicator': df['indicator'].str.get('id'), 'country': df['countryiso3code']})
+            else:
+                pairs = pd.DataFrame({'indicator': df['indicator_id'], 'country': df['country_code']})
+            pairs = pairs.astype(object).dropna().drop_duplicates()
+            keys.update(zip(pairs['indicator'], pairs['country']))
+        return sorted(keys)
         
-        combined = self.create_derived_features(combined)
+    @instrumented('transform.transform_incremental')
+    def transform_incremental(self, raw_data: Dict[str, pd.DataFrame], previous_tables: Dict[str, pd.DataFrame],
+                              changed_keys: Iterable[Tuple[str, str]]) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        # Fills and derived features never cross countries, so a country's rows
+        # depend only on that country's raw series. raw_data must hold every
+        # series of the affected countries, not just the changed ones. previous_tables
+        # may hold only those countries' rows (their columns give the catalog), and
+        # then so do the results
+        countries = sorted({country for _, country in changed_keys})
+        if not countries:
+            logger.info("No changed series, keeping previous tables")
+            return previous_tables.get('combined_analysis', pd.DataFrame()), dict(previous_tables)
+            
+        logger.info(f"Incremental transformation for {len(countries)} countries...")
+        
+        catalog = self.indicator_catalog(previous_tables)
+        combined, tables = self.transform_partition(raw_data, catalog, countries)
+        
+        new_columns = [
+            col for table_name, df in tables.items() if table_name in self.TABLE_NAMES.values()
+            for col in df.columns
+            if catalog and col not in self.KEY_COLUMNS
+            and col not in previous_tables.get(table_name, pd.DataFrame()).columns
+        ]
+        if new_columns:
+            logger.warning(f"Indicators not in the previous tables: {new_columns}; "
+                           f"run a full transformation to refresh every country")
         
         separate_tables = {
-            'climate_indicators': climate_pivot,
-            'economic_indicators': economic_pivot,
-            'renewable_energy': renewable_pivot,
-            'combined_analysis': combined
+            table_name: self._patch_table(previous_tables.get(table_name), tables[table_name],
+                                          countries, ['year', 'country_code'])
+            for table_name in self.TABLE_NAMES.values()
         }
+        combined = self._patch_table(previous_tables.get('combined_analysis'), combined,
+                                     countries, ['country_code', 'year'])
+        separate_tables['combined_analysis'] = combined
         
-        logger.info("Data transformation completed successfully")
+        logger.info(f"Incremental transformation completed: {combined.shape}")
         return combined, separate_tables
 
+TRANSFORM_BACKENDS = ('pandas', 'duckdb')
+
+def create_transformer(backend: str = None, fill_strategies: Dict[str, Dict[str, Any]] = None) -> DataTransformer:
+    backend = backend or ETL_CONFIG['transform_backend']
+    if backend not in TRANSFORM_BACKENDS:
+        raise ValueError(f"Unknown transform backend {backend!r}, expected one of {TRANSFORM_BACKENDS}")
+    if backend == 'duckdb':
+        from src.etl.duckdb_backend import DuckDBTransformer
+        return DuckDBTransformer(fill_strategies)
+    return DataTransformer(fill_strategies)
+
 def main():
     from src.etl.extract import DataExtractor
     
     extractor = DataExtractor()
     raw_data = extractor.extract_all_raw_data()
     
-    transformer = DataTransformer()
+    transformer = create_transformer()
     combined_df, separate_tables = transformer.transform_all_data(raw_data)
     
     logger.info(f"Final combined dataset: {combined_df.shape}")
@@ -0,0 +1,152 @@
+import pytest
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_acquisition.rate_limiter import TokenBucketRateLimiter
+from src.data_acquisition.response_cache import ResponseCache
+from src.data_acquisition.fetch_all_datasets import build_fetchers, stream_all_concurrently
+
+def test_rate_limiter_allows_burst_then_throttles():
+    limiter = TokenBucketRateLimiter(rate=1000, capacity=3)
+    assert all(limiter.try_acquire() for _ in range(3))
+    assert not limiter.try_acquire()
+    
+    time.sleep(0.01)
+    assert limiter.try_acquire()
+
+def test_rate_limiter_rejects_invalid_rate():
+    with pytest.raises(ValueError):
+        TokenBucketRateLimiter(rate=0, capacity=1)
+
+def test_stream_all_concurrently_refreshes_every_indicator(monkeypatch):
+    from src.data_acquisition import fetch_all_datasets
+    from config.database_config import MONGODB_CONFIG
+    
+    class FakeMongoHandler:
+        
+        def connect(self):
+            return True
+            
+        def disconnect(self):
+            pass
+            
+    monkeypatch.setattr(fetch_all_datasets, 'MongoDBHandler', FakeMongoHandler)
+    fetchers = build_fetchers(TokenBucketRateLimiter(rate=1000, capacity=100))
+    refreshed = []
+    
+    def refresh_indicator(mongo_handler, collection_name, name, code, countries, incremental):
+        refreshed.append((collection_name, code, tuple(countries), incremental))
+        return len(countries)
+        
+    for fetcher in fetchers.values():
+        monkeypatch.setattr(fetcher, 'ensure_raw_index', lambda mongo_handler, collection_name: None)
+        monkeypatch.setattr(fetcher, 'refresh_indicator', refresh_indicator)
+        
+    saved = stream_all_concurrently(['USA', 'CHN'], fetchers, max_concurrency=4, incremental=True)
+    
+    assert saved == {data_type: 2 * len(fetcher.INDICATORS) for data_type, fetcher in fetchers.items()}
+    assert sorted(refreshed) == sorted(
+        (MONGODB_CONFIG['collections'][data_type], code, ('USA', 'CHN'), True)
+        for data_type, fetcher in fetchers.items() for code in fetcher.INDICATORS.values()
+    )
+
+class FakeResponse:
+    
+    def __init__(self, payload, status_code=200, headers=None):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
+        
+    def raise_for_status(self):
+        pass
+        
+    def json(self):
+        return self.payload
+
+def fake_world_bank(total, per_page):
+    pages = (total + per_page - 1) // per_page
+    requested = []
+    
+    def get(url, params=None, headers=None, timeout=None):
+        page = params['page']
+        requested.append(page)
+        start = (page - 1) * per_page
+        records = [{'date': str(2000 + i % 24), 'value': i} for i in range(start, min(start + per_page, total))]
+        return FakeResponse([{'page': page, 'pages': pages, 'per_page': per_page, 'total': total}, records])
+        
+    return get, requested
+
+def test_iter_indicator_pages_follows_every_page(monkeypatch, tmp_path):
+    import src.data_acquisition.world_bank_fetcher as world_bank_fetcher
+    
+    get, requested = fake_world_bank(total=2500, per_page=1000)
+    monkeypatch.setattr(world_bank_fetcher.requests, 'get', get)
+    
+    cache = ResponseCache(str(tmp_path), default_ttl=0)
+    fetcher = build_fetchers(TokenBucketRateLimiter(rate=1000, capacity=100), cache)['climate_raw']
+    pages = list(fetcher.iter_indicator_pages('EN.ATM.CO2E.KT', ['USA'], per_page=1000))
+    
+    assert requested == [1, 2, 3]
+    assert [len(page) for page in pages] == [1000, 1000, 500]
+    assert len(fetcher.fetch_indicator_data('EN.ATM.CO2E.KT', ['USA'])) == 2500
+
+def test_iter_indicator_pages_fails_when_a_page_cannot_be_fetched(monkeypatch, tmp_path):
+    import requests
+    import src.data_acquisition.world_bank_fetcher as world_bank_fetcher
+    
+    get, requested = fake_world_bank(total=2500, per_page=1000)
+    
+    def flaky_get(url, params=None, headers=None, timeout=None):
+        if params['page'] == 2:
+            raise requests.exceptions.ConnectionError("connection reset")
+        return get(url, params, headers, timeout)
+        
+    monkeypatch.setattr(world_bank_fetcher.requests, 'get', flaky_get)
+    monkeypatch.setattr(world_bank_fetcher.time, 'sleep', lambda seconds: None)
+    
+    fetcher = build_fetchers(TokenBucketRateLimiter(rate=1000, capacity=100),
+                             ResponseCache(str(tmp_path), default_ttl=0))['climate_raw']
+    with pytest.raises(ConnectionError):
+        list(fetcher.iter_indicator_pages('EN.ATM.CO2E.KT', ['USA'], per_page=1000))
+    assert requested == [1]
+
+def test_response_cache_revalidates_and_replays_offline(monkeypatch, tmp_path):
+    import src.data_acquisition.world_bank_fetcher as world_bank_fetcher
+    
+    payload = [{'page': 1, 'pages': 1, 'total': 1}, [{'date': '2020', 'value': 1.5}]]
+    seen_headers = []
+    
+    def get(url, params=None, headers=None, timeout=None):
+        seen_headers.append(dict(headers or {}))
+        if headers and headers.get('If-None-Match') == '"v1"':
+            return FakeResponse(None, status_code=304)
+        return FakeResponse(payload, headers={'ETag': '"v1"'})
+        
+    monkeypatch.setattr(world_bank_fetcher.requests, 'get', get)
+    limiter = TokenBucketRateLimiter(rate=1000, capacity=100)
+    
+    cache = ResponseCache(str(tmp_path), default_ttl=0)
+    fetcher = build_fetchers(limiter, cache)['economic_raw']
+    fetcher.cache_ttl = lambda end_year: 0
+    
+    assert fetcher.fetch_indicator_data('SP.POP.TOTL', ['USA']) == payload[1]
+    assert fetcher.fetch_indicator_data('SP.POP.TOTL', ['USA']) == payload[1]
+    assert seen_headers == [{}, {'If-None-Match': '"v1"'}]
+    
+    monkeypatch.setattr(world_bank_fetcher.requests, 'get', None)
+    offline = build_fetchers(limiter, ResponseCache(str(tmp_path), offline=True))['economic_raw']
+    assert offline.fetch_indicator_data('SP.POP.TOTL', ['USA']) == payload[1]
+    assert offline.fetch_indicator_data('NY.GDP.MKTP.CD', ['USA']) == []
+
+def test_plan_incremental_requests_groups_countries_by_start_year(monkeypatch):
+    from config.database_config import API_CONFIG
+    monkeypatch.setitem(API_CONFIG, 'start_year', 2000)
+    
+    fetcher = build_fetchers(TokenBucketRateLimiter(rate=1000, capacity=100))['renewable_raw']
+    plan = fetcher.plan_incremental_requests(
+        {'USA': 2022, 'CHN': 2022, 'IND': 2019}, ['USA', 'CHN', 'IND', 'BRA'], lookback_years=2
+    )
+    
+    assert plan == {2000: ['BRA'], 2018: ['IND'], 2021: ['USA', 'CHN']}
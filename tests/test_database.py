@@ -0,0 +1,441 @@
+import pytest
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.bucket_layout import build_buckets, merge_bucket, decode_buckets, latest_observed_year
+
+def make_record(country, year, value):
+    return {
+        'indicator': {'id': 'EN.ATM.CO2E.KT', 'value': 'CO2 emissions (kt)'},
+        'country': {'id': country[:2], 'value': f"{country} name"},
+        'countryiso3code': country,
+        'date': str(year),
+        'value': value,
+        'unit': '',
+        'decimal': 0,
+        'indicator_name': 'co2_emissions'
+    }
+
+def test_buckets_merge_pages_and_decode_to_columns():
+    first_page = [make_record('USA', 2001, 2.0), make_record('USA', 2000, 1.0), make_record('CHN', 2000, None)]
+    second_page = [make_record('USA', 2002, 3.0), make_record('USA', 2001, 2.5)]
+    
+    stored = {key: merge_bucket(bucket) for key, bucket in build_buckets(first_page).items()}
+    for key, bucket in build_buckets(second_page).items():
+        stored[key] = merge_bucket(bucket, stored.get(key))
+        
+    usa = stored[('EN.ATM.CO2E.KT', 'USA')]
+    assert usa['years'] == [2000, 2001, 2002]
+    assert usa['values'] == [1.0, 2.5, 3.0]
+    assert latest_observed_year(usa) == 2002
+    assert latest_observed_year(stored[('EN.ATM.CO2E.KT', 'CHN')]) is None
+    
+    df = decode_buckets(list(stored.values()))
+    assert len(df) == 4
+    assert df.loc[df['country_code'] == 'USA', 'metric_value'].tolist() == [1.0, 2.5, 3.0]
+    assert np.isnan(df.loc[df['country_code'] == 'CHN', 'metric_value']).all()
+    assert set(df['indicator_name']) == {'co2_emissions'}
+
+def test_pooled_engine_is_shared_and_reset_after_fork(tmp_path):
+    from src.database import connection_pool
+    
+    uri = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = connection_pool.get_postgres_engine(uri)
+    assert connection_pool.get_postgres_engine(uri) is engine
+    
+    with connection_pool.postgres_transaction(uri) as conn:
+        conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+    with connection_pool.postgres_connection(uri) as conn:
+        assert conn.exec_driver_sql("SELECT x FROM t").scalar() == 1
+        
+    connection_pool._reset_after_fork()
+    assert connection_pool.get_postgres_engine(uri) is not engine
+    connection_pool.close_all()
+
+@pytest.fixture
+def mongo_handler(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    import src.database.mongodb_handler as mongodb_handler
+    
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongodb_handler, 'get_mongo_client', lambda uri: client)
+    # mongomock edits the projection it is given while iterating, which races when
+    # extraction threads share one; pymongo leaves it alone
+    find = mongomock.collection.Collection.find
+    monkeypatch.setattr(mongomock.collection.Collection, 'find',
+                        lambda self, filter=None, projection=None, *args, **kwargs:
+                        find(self, filter, dict(projection) if projection else projection, *args, **kwargs))
+    handler = mongodb_handler.MongoDBHandler()
+    assert handler.connect()
+    yield handler
+    handler.disconnect()
+
+def raw_record(country, year, value, indicator='co2_emissions'):
+    return {'indicator': {'id': indicator.upper(), 'value': indicator}, 'countryiso3code': country,
+            'country': {'id': country[:2], 'value': f"{country} name"}, 'date': str(year),
+            'value': value, 'indicator_name': indicator}
+
+def test_bulk_upsert_replaces_changed_rows_without_duplicates(mongo_handler):
+    key_fields = ['indicator.id', 'countryiso3code', 'date']
+    records = [raw_record(country, year, 1.0) for country in ('USA', 'CHN') for year in range(2000, 2010)]
+    assert mongo_handler.bulk_upsert('raw', records, key_fields, batch_size=3, max_workers=2) == 20
+    
+    revised = [dict(record, value=2.0) for record in records[:5]]
+    assert mongo_handler.bulk_upsert('raw', revised, key_fields, batch_size=2, max_workers=2) == 5
+    assert mongo_handler.count_documents('raw') == 20
+    assert mongo_handler.count_documents('raw', {'value': 2.0}) == 5
+    assert mongo_handler.count_documents('raw', {'countryiso3code': 'USA', 'date': '2000'}) == 1
+
+def test_bulk_upsert_reports_batch_errors(mongo_handler, caplog):
+    # A second unique index the key fields don't cover makes one document fail
+    mongo_handler.create_index('raw', 'uid', unique=True)
+    documents = [{'key': i, 'uid': i} for i in range(5)] + [{'key': 9, 'uid': 0}]
+    
+    with caplog.at_level('ERROR'):
+        written = mongo_handler.bulk_upsert('raw', documents, ['key'], batch_size=2, max_workers=2)
+    assert written == 5
+    assert mongo_handler.count_documents('raw') == 5
+    assert 'Bulk upsert into raw had 1 errors' in caplog.text
+
+def seed_raw_collection(mongo_handler, collection_name, layout):
+    from src.database.bucket_layout import build_buckets, merge_bucket
+    records = [dict(raw_record(country, year, None if country == 'IND' and year % 2 else float(year), indicator),
+                    unit='', decimal=0)
+               for indicator in ('co2_emissions', 'energy_use')
+               for country in ('USA', 'CHN', 'IND')
+               for year in range(2000, 2010)]
+    if layout == 'bucket':
+        records = [merge_bucket(bucket) for bucket in build_buckets(records).values()]
+    mongo_handler.insert_many(collection_name, records)
+
+@pytest.mark.parametrize('layout', ['document', 'bucket'])
+def test_iter_chunks_filters_projects_and_splits(mongo_handler, monkeypatch, layout):
+    import pandas as pd
+    from config.database_config import MONGODB_CONFIG
+    from src.etl.extract import DataExtractor, DOCUMENT_COLUMNS
+    from src.database.bucket_layout import DECODED_COLUMNS
+    monkeypatch.setitem(MONGODB_CONFIG, 'raw_layout', layout)
+    seed_raw_collection(mongo_handler, 'raw', layout)
+    
+    extractor = DataExtractor()
+    chunks = list(extractor.iter_chunks('raw', chunk_size=7))
+    assert sum(len(chunk) for chunk in chunks) == 60
+    
+    chunks = list(extractor.iter_chunks('raw', chunk_size=7, years=(2003, 2006), countries=['USA', 'CHN']))
+    df = pd.concat(chunks, ignore_index=True)
+    assert len(df) == 16
+    if layout == 'document':
+        assert [len(chunk) for chunk in chunks] == [7, 7, 2]
+        assert all(list(chunk.columns) == DOCUMENT_COLUMNS for chunk in chunks)
+        # Nested fields are cut down to the projected keys
+        assert {key for country in df['country'] for key in country} == {'value'}
+        assert {key for indicator in df['indicator'] for key in indicator} == {'id'}
+        assert set(df['date']) == {'2003', '2004', '2005', '2006'}
+    else:
+        assert all(list(chunk.columns) == DECODED_COLUMNS for chunk in chunks)
+        assert set(df['year']) == {2003, 2004, 2005, 2006}
+    assert set(df['country_code' if layout == 'bucket' else 'countryiso3code']) == {'USA', 'CHN'}
+    
+    only_co2 = extractor.extract_from_mongodb('raw', indicators=['co2_emissions'])
+    assert len(only_co2) == 30 and set(only_co2['indicator_name']) == {'co2_emissions'}
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_partitioned_extraction_matches_single_pass(mongo_handler, monkeypatch, columnar):
+    import pandas as pd
+    from config.database_config import MONGODB_CONFIG, ETL_CONFIG
+    from src.etl.extract import DataExtractor
+    collections = {'climate_raw': 'raw_climate', 'economic_raw': 'raw_economic'}
+    monkeypatch.setitem(MONGODB_CONFIG, 'collections', collections)
+    monkeypatch.setitem(MONGODB_CONFIG, 'raw_layout', 'document')
+    monkeypatch.setitem(MONGODB_CONFIG, 'read_batch_size', 7)
+    for collection_name in collections.values():
+        seed_raw_collection(mongo_handler, collection_name, 'document')
+        
+    def extract(threshold):
+        monkeypatch.setitem(ETL_CONFIG, 'extract_partition_threshold', threshold)
+        extractor = DataExtractor()
+        assert len(extractor.plan_partitions('raw_climate')) == (2 if threshold == 1 else 1)
+        return extractor.extract_all_raw_data(columnar=columnar, max_workers=4)
+        
+    single, partitioned = extract(10 ** 6), extract(1)
+    for data_type in collections:
+        keys = ['indicator_name', 'country_code', 'year'] if columnar else ['indicator_name', 'countryiso3code', 'date']
+        expected = single[data_type].sort_values(keys).reset_index(drop=True)
+        actual = partitioned[data_type].sort_values(keys).reset_index(drop=True)
+        assert len(actual) == 60
+        pd.testing.assert_frame_equal(actual, expected)
+
+@pytest.fixture
+def postgres_handler():
+    from src.database.postgres_handler import PostgresHandler
+    handler = PostgresHandler()
+    if handler.connect():
+        yield handler
+        handler.disconnect()
+    else:
+        pytest.skip("PostgreSQL connection not available")
+
+def test_copy_load_round_trips_nulls_and_types(postgres_handler):
+    import pandas as pd
+    from src.etl.schema import enforce_schema, sql_types
+    
+    df = enforce_schema(pd.DataFrame({
+        'year': [2000, 2001, 2002],
+        'country_code': ['USA', 'EU', ''],
+        'country_name': ['United States', '', 'China'],
+        'climate_co2_emissions': [1.5, np.nan, 1e12 / 3],
+        'co2_per_gdp': [0.1, 2.5, np.nan]
+    }))
+    
+    assert postgres_handler.create_table_from_dataframe(df, 'test_copy_load', dtype=sql_types(df),
+                                                        method='copy')
+    try:
+        loaded = enforce_schema(postgres_handler.read_table(
+            'test_copy_load', "SELECT * FROM test_copy_load ORDER BY year"
+        ))
+        pd.testing.assert_frame_equal(loaded, df, check_categorical=False)
+    finally:
+        postgres_handler.drop_table('test_copy_load')
+
+def test_upsert_updates_inserts_and_deletes_within_scope(postgres_handler):
+    import pandas as pd
+    from src.etl.schema import enforce_schema, sql_types
+    
+    def frame(rows):
+        return enforce_schema(pd.DataFrame(rows, columns=['year', 'country_code', 'country_name', 'co2_per_gdp']))
+        
+    initial = frame([(2000, 'USA', 'United States', 1.0), (2001, 'USA', 'United States', 2.0),
+                     (2000, 'CHN', 'China', 3.0), (2000, 'IND', 'India', 4.0)])
+    postgres_handler.drop_table('test_upsert')
+    assert postgres_handler.upsert_dataframe(initial, 'test_upsert', ['country_code', 'year'],
+                                             dtype=sql_types(initial))
+    try:
+        # USA 2001 disappears, USA 2000 changes, USA 2002 is new; IND is outside the scope
+        changes = frame([(2000, 'USA', 'United States', 1.5), (2002, 'USA', 'United States', 5.0),
+                         (2000, 'CHN', 'China', 3.0)])
+        assert postgres_handler.upsert_dataframe(changes, 'test_upsert', ['country_code', 'year'],
+                                                 dtype=sql_types(changes),
+                                                 scope={'country_code': ['USA', 'CHN']})
+        
+        loaded = postgres_handler.read_table(
+            'test_upsert', "SELECT country_code, year, co2_per_gdp FROM test_upsert ORDER BY country_code, year"
+        )
+        assert list(loaded.itertuples(index=False, name=None)) == [
+            ('CHN', 2000, 3.0), ('IND', 2000, 4.0), ('USA', 2000, 1.5), ('USA', 2002, 5.0)
+        ]
+        
+        # A table created earlier in the caller's transaction is merged into, not created again
+        with postgres_handler.engine.begin() as conn:
+            for rows in (initial, changes):
+                assert postgres_handler.upsert_dataframe(rows, 'test_upsert_txn', ['country_code', 'year'],
+                                                         dtype=sql_types(rows), delete_missing=False, conn=conn)
+        loaded = postgres_handler.read_table('test_upsert_txn', "SELECT count(*) AS n FROM test_upsert_txn")
+        assert loaded['n'].tolist() == [5]
+    finally:
+        postgres_handler.drop_table('test_upsert')
+        postgres_handler.drop_table('test_upsert_txn')
+
+def test_swap_keeps_previous_version_and_rolls_back(postgres_handler):
+    import pandas as pd
+    
+    def frame(value):
+        return pd.DataFrame({'year': [2000, 2001], 'country_code': ['USA', 'USA'], 'co2_per_gdp': [value, value]})
+        
+    def values():
+        return postgres_handler.read_table('test_swap', "SELECT DISTINCT co2_per_gdp FROM test_swap")['co2_per_gdp'].tolist()
+        
+    try:
+        for value in (1.0, 2.0):
+            assert postgres_handler.prepare_shadow_table(frame(value), 'test_swap', ['country_code', 'year'])
+            assert postgres_handler.swap_tables(['test_swap'])
+        assert values() == [2.0]
+        
+        with postgres_handler.engine.connect() as conn:
+            indexes = set(postgres_handler._index_names(conn, 'test_swap'))
+        assert indexes == {'test_swap_country_code_year_key'}
+        
+        assert postgres_handler.rollback_tables(['test_swap'])
+        assert values() == [1.0]
+        assert not postgres_handler.swap_tables(['test_swap'])
+    finally:
+        for name in ('test_swap', 'test_swap__previous', 'test_swap__shadow'):
+            postgres_handler.drop_table(name)
+
+def test_schema_migrations_add_keys_and_partitioned_tables_swap(postgres_handler):
+    import pandas as pd
+    from sqlalchemy import inspect
+    from src.database.schema_manager import SchemaManager
+    from src.etl.schema import enforce_schema
+    
+    tables = {'countries': 'test_schema_countries', 'combined_analysis': 'test_schema_combined'}
+    names = list(tables.values()) + [name + suffix for name in tables.values() for suffix in ('__shadow', '__previous')]
+    df = enforce_schema(pd.DataFrame({'year': [1999, 2005, 2005], 'country_code': ['USA', 'USA', 'CHN'],
+                                      'country_name': ['United States', 'United States', 'China'],
+                                      'climate_co2_emissions': [1.0, 2.0, 3.0]}))
+    try:
+        # An unmanaged table from an earlier load gets its primary key added
+        df[['country_code', 'country_name']].drop_duplicates().to_sql('test_schema_countries',
+                                                                      postgres_handler.engine, index=False)
+        manager = SchemaManager(postgres_handler, tables=tables, migrations_table='test_schema_migrations',
+                                partition_by_year=True)
+        assert manager.migrate() and manager.migrate()
+        assert manager.applied_migrations() == [version for version, _, _ in manager.migrations()]
+        assert inspect(postgres_handler.engine).get_pk_constraint('test_schema_countries')['constrained_columns'] == ['country_code']
+        
+        create_table = manager.table_creator('combined_analysis', df.columns)
+        for _ in range(2):
+            assert postgres_handler.prepare_shadow_table(df, 'test_schema_combined', ['country_code', 'year'],
+                                                         create_table=create_table)
+            assert postgres_handler.swap_tables(['test_schema_combined'])
+            
+        with postgres_handler.engine.connect() as conn:
+            partitions = postgres_handler._partition_names(conn, 'test_schema_combined')
+            indexes = set(postgres_handler._index_names(conn, 'test_schema_combined'))
+        assert 'test_schema_combined_y2000' in partitions and 'test_schema_combined_ydefault' in partitions
+        assert indexes == {'test_schema_combined_pkey', 'test_schema_combined_year_idx'}
+        assert 'test_schema_combined_y2000' not in postgres_handler.get_table_names()
+        assert len(postgres_handler.read_table('test_schema_combined')) == 3
+        # Only the frame's columns are created, with codes as VARCHAR rather than blank-padded CHAR
+        columns = {column['name']: column['type'] for column in
+                   inspect(postgres_handler.engine).get_columns('test_schema_combined')}
+        assert sorted(columns) == sorted(df.columns)
+        assert type(columns['country_code']).__name__ == 'VARCHAR'
+    finally:
+        for name in names + ['test_schema_migrations']:
+            postgres_handler.drop_table(name)
+
+@pytest.mark.parametrize('mode', ['swap', 'replace', 'upsert'])
+def test_parallel_load_commits_all_tables_or_none(postgres_handler, monkeypatch, mode):
+    import pandas as pd
+    from config.database_config import POSTGRES_CONFIG
+    from src.etl.load import DataLoader
+    
+    tables = {'countries': 'test_load_countries', 'climate_indicators': 'test_load_climate'}
+    monkeypatch.setitem(POSTGRES_CONFIG, 'tables', tables)
+    monkeypatch.setitem(POSTGRES_CONFIG, 'migrations_table', 'test_load_migrations')
+    monkeypatch.setitem(POSTGRES_CONFIG, 'load_workers', 2)
+    
+    def frames(value, broken=False):
+        climate = pd.DataFrame({'year': [2000, 2001], 'country_code': ['USA', 'USA'],
+                                'country_name': ['United States'] * 2, 'climate_co2_emissions': [value, value]})
+        countries = pd.DataFrame({'country_code': ['USA', None if broken else 'CHN'],
+                                  'country_name': ['United States', 'China']})
+        return {'climate_indicators': climate, 'countries': countries}
+        
+    try:
+        assert DataLoader().load_to_postgres(frames(1.0), mode=mode)
+        # The null country key fails the countries table, so climate must not change either
+        assert not DataLoader().load_to_postgres(frames(2.0, broken=True), mode=mode)
+        
+        postgres_handler.connect()
+        loaded = postgres_handler.read_table('test_load_climate',
+                                             "SELECT DISTINCT climate_co2_emissions FROM test_load_climate")
+        assert loaded['climate_co2_emissions'].tolist() == [1.0]
+        assert not any(name.endswith(('__shadow', '__stage')) for name in postgres_handler.get_table_names())
+        assert ('test_load_climate__previous' in postgres_handler.get_table_names()) == (mode == 'swap')
+        
+        countries = DataLoader().read_loaded_tables(['countries'], countries=['CHN'])['countries']
+        assert countries['country_code'].tolist() == ['CHN']
+    finally:
+        postgres_handler.connect()
+        for name in list(tables.values()) + ['test_load_migrations']:
+            for suffix in ('', '__shadow', '__previous', '__stage'):
+                postgres_handler.drop_table(name + suffix)
+
+def test_long_layout_requires_managed_schemas(monkeypatch):
+    from config.database_config import POSTGRES_CONFIG
+    from src.database.schema_manager import SchemaManager
+    
+    monkeypatch.setitem(POSTGRES_CONFIG, 'manage_schema', False)
+    schema_manager = SchemaManager(postgres_handler=object(), combined_layout='long')
+    assert not schema_manager.long_layout
+    assert 'combined_analysis' in schema_manager.table_types()
+    assert 'indicator_values' not in schema_manager.table_types()
+
+def test_long_combined_analysis_view_follows_loads(postgres_handler, monkeypatch):
+    import pandas as pd
+    from config.database_config import POSTGRES_CONFIG
+    from src.etl.load import DataLoader
+    from src.database.indicator_store import IndicatorStore, read_combined_analysis
+    from src.etl.schema import enforce_schema
+    
+    tables = {'countries': 'test_long_countries', 'combined_analysis': 'test_long_combined',
+              'indicators': 'test_long_indicators', 'indicator_values': 'test_long_values',
+              'combined_attributes': 'test_long_attributes'}
+    monkeypatch.setitem(POSTGRES_CONFIG, 'tables', tables)
+    monkeypatch.setitem(POSTGRES_CONFIG, 'migrations_table', 'test_long_migrations')
+    monkeypatch.setitem(POSTGRES_CONFIG, 'combined_layout', 'long')
+    
+    def combined(value, extra=False):
+        df = pd.DataFrame({'year': [2000, 2001, 2000], 'country_code': ['USA', 'USA', 'CHN'],
+                           'country_name': ['United States', 'United States', 'China'],
+                           'climate_co2_emissions': [value, None, 3.0]})
+        if extra:
+            df['economic_gdp'] = [10.0, 11.0, 12.0]
+        return df
+        
+    try:
+        assert DataLoader().load_to_postgres({'combined_analysis': combined(1.0)})
+        postgres_handler.connect()
+        view = postgres_handler.read_table('test_long_combined').sort_values(['country_code', 'year'])
+        assert view['climate_co2_emissions'].isna().tolist() == [False, False, True]
+        
+        # A changed value and a new indicator: the view is rebuilt with the new column
+        assert DataLoader().load_to_postgres({'combined_analysis': combined(2.0, extra=True)}, mode='upsert')
+        postgres_handler.connect()
+        view = postgres_handler.read_table('test_long_combined').sort_values(['country_code', 'year'])
+        assert view['economic_gdp'].tolist() == [12.0, 10.0, 11.0]
+        assert view.loc[view['country_code'] == 'USA', 'climate_co2_emissions'].iloc[0] == 2.0
+        assert 'test_long_combined' in postgres_handler.get_table_names()
+        
+        # Reloading known indicators draws no new identity values
+        assert DataLoader().load_to_postgres({'combined_analysis': combined(2.0, extra=True)}, mode='upsert')
+        postgres_handler.connect()
+        sequence = postgres_handler.read_table('test_long_indicators', (
+            "SELECT last_value FROM pg_sequences WHERE sequencename = "
+            "split_part(pg_get_serial_sequence('test_long_indicators', 'indicator_id'), '.', 2)"))
+        assert sequence['last_value'].tolist() == [2]
+        
+        subset = IndicatorStore(postgres_handler).read_indicators(['economic_gdp'], countries=['USA'], years=(2001, 2001))
+        assert list(subset.columns[:4]) == ['year', 'country_code', 'country_name', 'economic_gdp']
+        assert 'climate_co2_emissions' not in subset.columns
+        assert subset['economic_gdp'].tolist() == [11.0]
+        
+        # A swap load keeps the long tables' contents for rollback, which rebuilds the view over them
+        assert DataLoader().load_to_postgres({'combined_analysis': combined(5.0)})
+        postgres_handler.connect()
+        view = postgres_handler.read_table('test_long_combined').sort_values(['country_code', 'year'])
+        assert view['economic_gdp'].isna().all()
+        assert DataLoader().rollback(['combined_analysis'])
+        postgres_handler.connect()
+        view = postgres_handler.read_table('test_long_combined').sort_values(['country_code', 'year'])
+        assert view['economic_gdp'].tolist() == [12.0, 10.0, 11.0]
+        assert view.loc[view['country_code'] == 'USA', 'climate_co2_emissions'].iloc[0] == 2.0
+        
+        # Past view_max_indicators the view is dropped and wide reads pivot the long tables
+        monkeypatch.setitem(POSTGRES_CONFIG, 'view_max_indicators', 1)
+        assert DataLoader().load_to_postgres({'combined_analysis': combined(2.0, extra=True)}, mode='upsert')
+        postgres_handler.connect()
+        assert 'test_long_combined' not in postgres_handler.get_table_names()
+        pivoted = read_combined_analysis(postgres_handler).sort_values(['country_code', 'year'])
+        assert list(pivoted.columns) == list(view.columns)
+        pd.testing.assert_frame_equal(pivoted.reset_index(drop=True), enforce_schema(view).reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+        scoped = DataLoader().read_loaded_tables(['combined_analysis'], countries=['CHN'])['combined_analysis']
+        assert scoped['country_code'].tolist() == ['CHN'] and list(scoped.columns) == list(view.columns)
+        
+        # A configured indicator set keeps the view within bounds
+        monkeypatch.setitem(POSTGRES_CONFIG, 'view_indicators', ['economic_gdp'])
+        assert DataLoader().load_to_postgres({'combined_analysis': combined(2.0, extra=True)}, mode='upsert')
+        postgres_handler.connect()
+        view = postgres_handler.read_table('test_long_combined')
+        assert 'economic_gdp' in view.columns and 'climate_co2_emissions' not in view.columns
+    finally:
+        postgres_handler.connect()
+        for name in ['test_long_combined', 'test_long_values', 'test_long_attributes',
+                     'test_long_values__previous', 'test_long_attributes__previous',
+                     'test_long_indicators', 'test_long_countries', 'test_long_migrations']:
+            postgres_handler.drop_table(name)
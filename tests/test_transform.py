@@ -0,0 +1,308 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.etl.transform import DataTransformer
+from src.database.bucket_layout import build_buckets, merge_bucket, decode_buckets
+
+INDICATORS = {
+    'climate_raw': {'co2_emissions': 'EN.ATM.CO2E.KT', 'co2_per_capita': 'EN.ATM.CO2E.PC'},
+    'economic_raw': {'gdp_current_usd': 'NY.GDP.MKTP.CD', 'gdp_per_capita': 'NY.GDP.PCAP.CD'},
+    'renewable_raw': {'renewable_energy_consumption_pct': 'EG.FEC.RNEW.ZS'}
+}
+
+def make_raw_records(data_type, countries=('USA', 'CHN', 'IND', 'BRA'), years=range(2000, 2010), seed=0):
+    rng = np.random.default_rng(seed + len(data_type))
+    records = []
+    for name, code in INDICATORS[data_type].items():
+        for country in countries:
+            for year in years:
+                value = None if rng.random() < 0.2 else float(rng.uniform(1, 100) * 1000)
+                records.append({
+                    'indicator': {'id': code, 'value': name},
+                    'country': {'id': country[:2], 'value': f"{country} name"},
+                    'countryiso3code': country,
+                    'date': str(year),
+                    'value': value,
+                    'indicator_name': name
+                })
+    return records
+
+@pytest.fixture
+def raw_data():
+    return {data_type: pd.DataFrame(make_raw_records(data_type)) for data_type in INDICATORS}
+
+def normalized(df):
+    df = df.reset_index(drop=True).copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and col in ('country_code', 'country_name'):
+            df[col] = df[col].astype(object)
+    df['year'] = df['year'].astype('int64')
+    return df
+
+def test_columnar_input_matches_document_input(raw_data):
+    columnar = {}
+    for data_type, df in raw_data.items():
+        buckets = [merge_bucket(b) for b in build_buckets(df.to_dict('records')).values()]
+        columnar[data_type] = decode_buckets(buckets, compact=True)
+        
+    expected, _ = DataTransformer().transform_all_data(raw_data)
+    actual, _ = DataTransformer().transform_all_data(columnar)
+    
+    pd.testing.assert_frame_equal(normalized(actual), normalized(expected), check_like=True)
+
+def test_clean_world_bank_data_flattens_to_categoricals(raw_data):
+    df = raw_data['climate_raw']
+    df = pd.concat([df, df.iloc[:5]], ignore_index=True)
+    
+    clean = DataTransformer().clean_world_bank_data(df)
+    
+    assert list(clean.columns) == DataTransformer.CLEAN_COLUMNS
+    assert clean['year'].dtype == np.int16
+    for col in ['country_code', 'country_name', 'indicator_name', 'indicator_id']:
+        assert isinstance(clean[col].dtype, pd.CategoricalDtype)
+    assert clean['metric_value'].notna().all()
+    assert not clean.duplicated(subset=['year', 'country_code', 'indicator_name']).any()
+    assert len(clean) == df.drop_duplicates(subset=['date', 'countryiso3code', 'indicator_name'])['value'].notna().sum()
+    
+    usa = clean[clean['country_code'] == 'USA']
+    assert set(usa['country_name']) == {'USA name'}
+    assert set(clean['indicator_id']) == set(INDICATORS['climate_raw'].values())
+
+@pytest.fixture
+def gappy_panel():
+    return pd.DataFrame({
+        'country_code': ['A'] * 6 + ['B'] * 6,
+        'year': list(range(2000, 2006)) * 2,
+        'x': [1, np.nan, np.nan, 4, np.nan, np.nan, np.nan, 2, np.nan, np.nan, np.nan, 8.0]
+    })
+
+@pytest.mark.parametrize('strategy, expected, filled', [
+    ({'method': 'ffill_bfill', 'max_gap': None},
+     [1, 1, 1, 4, 4, 4, 2, 2, 2, 2, 2, 8], 8),
+    ({'method': 'ffill_bfill', 'max_gap': 1},
+     [1, 1, 4, 4, 4, np.nan, 2, 2, 2, np.nan, 8, 8], 6),
+    ({'method': 'linear', 'max_gap': None},
+     [1, 2, 3, 4, np.nan, np.nan, np.nan, 2, 3.5, 5, 6.5, 8], 5),
+    ({'method': 'linear', 'max_gap': 2},
+     [1, 2, 3, 4, np.nan, np.nan, np.nan, 2, np.nan, np.nan, np.nan, 8], 2),
+    ({'method': 'none'},
+     [1, np.nan, np.nan, 4, np.nan, np.nan, np.nan, 2, np.nan, np.nan, np.nan, 8], 0),
+])
+def test_missing_value_filler_strategies(gappy_panel, strategy, expected, filled):
+    from src.etl.missing_values import MissingValueFiller
+    
+    result, report = MissingValueFiller(strategies={'x': strategy}).fill(gappy_panel)
+    
+    np.testing.assert_array_equal(result['x'].to_numpy(), np.array(expected, dtype=float))
+    assert report['x']['filled'] == filled
+    assert gappy_panel['x'].isna().sum() == 8
+
+def pivot_indicators(df, prefix):
+    # The pivot_table reshape assemble_wide_tables replaced, kept as its oracle
+    pivot_df = df.pivot_table(index=['year', 'country_code', 'country_name'], columns='indicator_name',
+                              values='metric_value', aggfunc='first', observed=True).reset_index()
+    pivot_df.columns.name = None
+    return pivot_df.rename(columns={col: f"{prefix}_{col}" for col in pivot_df.columns
+                                    if col not in ('year', 'country_code', 'country_name')})
+
+def merge_datasets(*pivots):
+    merge_keys = ['year', 'country_code', 'country_name']
+    combined_df = pivots[0]
+    for pivot in pivots[1:]:
+        combined_df = combined_df.merge(pivot, on=merge_keys, how='outer')
+    return combined_df.sort_values(['country_code', 'year'])
+
+def test_assemble_wide_tables_matches_pivot_and_merge(raw_data):
+    transformer = DataTransformer()
+    cleaned = {
+        prefix: transformer.clean_world_bank_data(raw_data[data_type])
+        for data_type, prefix in DataTransformer.DATASET_PREFIXES.items()
+    }
+    
+    combined, tables = transformer.assemble_wide_tables(cleaned)
+    
+    pivots = {prefix: pivot_indicators(df, prefix) for prefix, df in cleaned.items()}
+    expected = merge_datasets(pivots['climate'], pivots['economic'], pivots['renewable'])
+    
+    pd.testing.assert_frame_equal(normalized(combined), normalized(expected))
+    for prefix, pivot in pivots.items():
+        pd.testing.assert_frame_equal(normalized(tables[prefix]), normalized(pivot))
+
+def test_enforce_schema_compacts_and_round_trips_through_sql(raw_data):
+    from sqlalchemy import create_engine
+    from src.etl.schema import enforce_schema, sql_types
+    
+    transformer = DataTransformer()
+    cleaned = {
+        prefix: transformer.clean_world_bank_data(raw_data[data_type])
+        for data_type, prefix in DataTransformer.DATASET_PREFIXES.items()
+    }
+    combined, _ = transformer.assemble_wide_tables(cleaned)
+    combined = transformer.create_derived_features(combined)
+    
+    compact = enforce_schema(combined)
+    assert compact['year'].dtype == np.int16
+    assert compact['climate_co2_per_capita'].dtype == np.float32
+    assert compact['climate_co2_emissions'].dtype == np.float64
+    assert compact['gdp_per_capita_category'].cat.ordered
+    assert compact.memory_usage(deep=True).sum() < combined.memory_usage(deep=True).sum()
+    
+    engine = create_engine('sqlite://')
+    compact.to_sql('combined_analysis', engine, index=False, dtype=sql_types(compact))
+    restored = enforce_schema(pd.read_sql_table('combined_analysis', engine))
+    pd.testing.assert_series_equal(restored['year'], compact['year'])
+    pd.testing.assert_series_equal(restored['gdp_per_capita_category'], compact['gdp_per_capita_category'])
+
+def test_transform_incremental_matches_full_rebuild(raw_data):
+    transformer = DataTransformer()
+    _, previous_tables = transformer.transform_all_data(raw_data)
+    
+    updated = {data_type: make_raw_records(data_type, seed=7) for data_type in INDICATORS}
+    changed = {'CHN', 'IND'}
+    current = {
+        data_type: pd.DataFrame([r for r in raw_data[data_type].to_dict('records')
+                                 if r['countryiso3code'] not in changed] +
+                                [r for r in updated[data_type] if r['countryiso3code'] in changed])
+        for data_type in INDICATORS
+    }
+    partition = {
+        data_type: pd.DataFrame([r for r in updated[data_type] if r['countryiso3code'] in changed])
+        for data_type in INDICATORS
+    }
+    
+    _, expected = DataTransformer().transform_all_data(current)
+    _, patched = transformer.transform_incremental(partition, previous_tables,
+                                                   [('EN.ATM.CO2E.KT', 'CHN'), ('NY.GDP.MKTP.CD', 'IND')])
+    
+    assert set(patched) == set(expected)
+    for table_name, df in expected.items():
+        pd.testing.assert_frame_equal(normalized(patched[table_name]), normalized(df))
+        
+    # Reading back only the changed countries' rows yields just their rows
+    keys = transformer.series_keys(partition)
+    assert {country for _, country in keys} == changed
+    assert ('EN.ATM.CO2E.KT', 'CHN') in keys
+    previous_changed = {table_name: df[df['country_code'].isin(changed)] for table_name, df in previous_tables.items()}
+    _, scoped = transformer.transform_incremental(partition, previous_changed, keys)
+    for table_name, df in expected.items():
+        pd.testing.assert_frame_equal(normalized(scoped[table_name]),
+                                      normalized(df[df['country_code'].isin(changed)]))
+
+def test_partitioned_transform_matches_single_process(raw_data):
+    from src.etl.parallel_transform import PartitionedTransformer
+    
+    _, expected = DataTransformer().transform_all_data(raw_data)
+    
+    partitioned = PartitionedTransformer(max_workers=2, partition_size=1)
+    _, merged = partitioned.transform_all_data(raw_data)
+    
+    assert set(merged) == set(expected)
+    for table_name, df in expected.items():
+        pd.testing.assert_frame_equal(normalized(merged[table_name]), normalized(df))
+    assert sorted(partitioned.country_index()['country_code']) == ['BRA', 'CHN', 'IND', 'USA']
+
+def test_feature_engine_resolves_dependencies_and_caches():
+    from src.etl.features import FeatureEngine
+    
+    df = pd.DataFrame({
+        'country_code': pd.Categorical(['USA'] * 4 + ['CHN'] * 2),
+        'year': np.array([2000, 2001, 2003, 2004, 2000, 2001], dtype=np.int16),
+        'climate_co2_emissions': [100.0, 110.0, 120.0, 60.0, 50.0, 75.0],
+        'economic_gdp_current_usd': [1e9, 1e9, 2e9, 2e9, 5e8, 5e8]
+    })
+    engine = FeatureEngine()
+    
+    features = engine.compute(df, ['co2_per_gdp_yoy_pct', 'climate_co2_emissions_yoy_pct'], version='v1')
+    assert list(features) == ['co2_per_gdp_yoy_pct', 'climate_co2_emissions_yoy_pct']
+    np.testing.assert_allclose(features['climate_co2_emissions_yoy_pct'].to_numpy(),
+                               [np.nan, 10.0, np.nan, -50.0, np.nan, 50.0])
+    
+    df['climate_co2_per_capita'] = [1.0, 2.0, 3.0, 4.0, 5.0, np.nan]
+    rolling = engine.compute(df, ['climate_co2_per_capita_rolling_5'])['climate_co2_per_capita_rolling_5']
+    np.testing.assert_allclose(rolling.to_numpy(), [1.0, 1.5, 2.0, 2.5, 5.0, 5.0])
+    # Missing years shorten the window instead of stretching it over older rows
+    df['climate_co2_per_capita'] = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    df['year'] = np.array([2000, 2001, 2004, 2006, 2000, 2001], dtype=np.int16)
+    rolling = engine.compute(df, ['climate_co2_per_capita_rolling_5'])['climate_co2_per_capita_rolling_5']
+    np.testing.assert_allclose(rolling.to_numpy(), [1.0, 1.5, 2.0, 3.5, 5.0, 5.5])
+    
+    cached = engine.compute(df, ['co2_per_gdp'], version='v1')
+    assert cached['co2_per_gdp'] is engine._cache['v1']['co2_per_gdp']
+    
+    assert engine.compute(df, ['renewable_adoption_category']) == {}
+    with pytest.raises(ValueError):
+        engine.compute(df, ['no_such_feature'])
+
+def test_profile_run_records_nested_stages(raw_data, tmp_path):
+    import json
+    import tracemalloc
+    from src.etl.instrumentation import profile_run
+    
+    with profile_run('test', profile_memory=True, report_dir=str(tmp_path)) as profiler:
+        combined, _ = DataTransformer().transform_all_data(raw_data)
+        
+    assert not tracemalloc.is_tracing()
+    with open(tmp_path / f"{profiler.run_id}.json") as f:
+        report = json.load(f)
+    stages = {stage['stage']: stage for stage in report['stages']}
+    
+    assert report['status'] == 'ok'
+    assert stages['transform.transform_all_data']['depth'] == 0
+    assert stages['transform.assemble_wide_tables']['depth'] == 1
+    assert stages['transform.transform_all_data']['rows_out'] == len(combined)
+    assert stages['transform.handle_missing_values']['rows_in'] >= len(combined)
+    assert all(stage['wall_seconds'] >= 0 and stage['peak_memory_mb'] is not None
+               for stage in report['stages'])
+
+def test_profile_run_records_stages_from_worker_threads(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from src.etl.instrumentation import profile_run, stage
+    
+    def write_table(name):
+        with stage(f"load.{name}", rows_in=10) as record:
+            record.rows_out = 10
+        return True
+        
+    with profile_run('test', profile_memory=True, report_dir=str(tmp_path)) as profiler:
+        with stage('load.load_to_postgres'):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                assert all(executor.map(write_table, ['a', 'b', 'c', 'd']))
+                
+    stages = {record['stage']: record for record in profiler.report()['stages']}
+    assert sorted(stages) == ['load.a', 'load.b', 'load.c', 'load.d', 'load.load_to_postgres']
+    assert stages['load.load_to_postgres']['peak_memory_mb'] is not None
+    for name in 'abcd':
+        assert stages[f"load.{name}"]['depth'] == 1
+        assert stages[f"load.{name}"]['rows_out'] == 10
+        assert stages[f"load.{name}"]['peak_memory_mb'] is None
+
+def test_profile_run_records_stages_from_worker_processes(raw_data, tmp_path):
+    from src.etl.instrumentation import profile_run, stage
+    from src.etl.parallel_transform import PartitionedTransformer
+    
+    with profile_run('test', report_dir=str(tmp_path)) as profiler:
+        with stage('transform.partitioned'):
+            PartitionedTransformer(max_workers=2, partition_size=1).transform_all_data(raw_data)
+            
+    assert not profiler.profile_memory
+    worker_stages = [record for record in profiler.report()['stages']
+                     if record['stage'] == 'transform.assemble_wide_tables']
+    assert len(worker_stages) == 4
+    assert all(record['depth'] == 1 and record['wall_seconds'] >= 0 for record in worker_stages)
+
+@pytest.mark.parametrize('fill_strategies', [None, {'climate_co2_emissions': {'method': 'linear', 'max_gap': 2}}])
+def test_duckdb_backend_matches_pandas(raw_data, fill_strategies):
+    pytest.importorskip('duckdb')
+    from src.etl.duckdb_backend import DuckDBTransformer
+    
+    _, expected = DataTransformer(fill_strategies).transform_all_data(raw_data)
+    transformer = DuckDBTransformer(fill_strategies)
+    _, result = transformer.transform_all_data(raw_data)
+    transformer.close()
+    
+    for table_name, df in expected.items():
+        pd.testing.assert_frame_equal(result[table_name], df)